@@ -1,14 +1,13 @@
-import os, shutil
+import hashlib
+import numpy as np
+import chromadb
 from langchain_chroma import Chroma
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_core.documents import Document
+from chromadb.utils.batch_utils import create_batches
+from src.pipeline.config import CHROMA_INCREMENTAL, CHROMA_COLLECTION_NAME
+from src.utils.embedding_models import get_embedding_model
 
-def save_to_chroma(chunks, model_name, db_path):
-    if os.path.exists(db_path):
-        shutil.rmtree(db_path)
-
-    embedding_model = HuggingFaceEmbeddings(model_name=model_name)
-
+def chunk_documents(chunks):
     documents = []
     for chunk in chunks:
         documents.append(
@@ -24,6 +23,101 @@ def save_to_chroma(chunks, model_name, db_path):
                 }
             )
         )
+    return documents
+
+def chunk_vector_ids(chunks):
+    """
+    Ids déterministes des chunks dans Chroma : id du fichier, page et hash du texte.
+    Un même texte répété sur une page reçoit un suffixe d'occurrence (#2, #3...).
+    """
+    ids, occurrences = [], {}
+    for chunk in chunks:
+        text_hash = hashlib.sha1(chunk["text"].encode("utf-8")).hexdigest()[:16]
+        base = f"{chunk['file_id']}:{chunk['page']}:{text_hash}"
+        occurrences[base] = occurrences.get(base, 0) + 1
+        ids.append(base if occurrences[base] == 1 else f"{base}#{occurrences[base]}")
+    return ids
+
+# Métadonnées ignorées pour décider d'une mise à jour : chunk_id est la position du chunk dans le run,
+# décalée par tout ajout ou retrait de fichier ; la comparer réécrirait tous les chunks suivants
+_VOLATILE_METADATA = ("chunk_id",)
+
+def _same_metadata(stored, metadata):
+    # Chroma ne conserve pas les valeurs None
+    def comparable(values):
+        return {key: value for key, value in values.items() if value is not None and key not in _VOLATILE_METADATA}
+    return comparable(stored) == comparable(metadata)
+
+def _open_chroma(embedding_model, db_path, reset=False):
+    """
+    Base Chroma de db_path, ouverte par le client chromadb : (client, collection, vue LangChain sur la collection).
+    Collection recréée vide si reset, ou si ses vecteurs viennent d'un autre modèle (ou backend) d'embeddings.
+    """
+    client = chromadb.PersistentClient(path=db_path)
+    metadata = {"embedding_model": embedding_model.key}
+    # Vecteurs toujours fournis par le pipeline : pas de fonction d'embedding côté chromadb (comme langchain_chroma)
+    collection = client.get_or_create_collection(CHROMA_COLLECTION_NAME, metadata=metadata, embedding_function=None)
+    if reset or (collection.metadata or {}).get("embedding_model") != embedding_model.key:
+        client.delete_collection(CHROMA_COLLECTION_NAME)
+        collection = client.create_collection(CHROMA_COLLECTION_NAME, metadata=metadata, embedding_function=None)
+    db = Chroma(client=client, collection_name=CHROMA_COLLECTION_NAME, embedding_function=embedding_model)
+    return client, collection, db
+
+def save_to_chroma(chunks, model_name, db_path, embeddings=None, embedding_model=None,
+                   incremental=CHROMA_INCREMENTAL, return_stats=False):
+    """
+    Crée ou met à jour la base vectorielle Chroma des chunks.
+    embeddings : vecteurs déjà calculés (même ordre que chunks, ex : clustering sémantique) ; ils sont stockés
+    tels quels, sans nouveau passage dans le modèle. Le modèle reste nécessaire pour encoder les requêtes.
+    embedding_model : vue du job sur le modèle partagé du processus (src.utils.embedding_models).
+    incremental : la base du run précédent est conservée ; seuls les chunks absents (nouveaux ou modifiés)
+    sont encodés et ajoutés, le thème des chunks déjà présents est mis à jour sans recalcul des vecteurs,
+    et les chunks qui ne font plus partie du corpus (fichier disparu ou modifié) sont supprimés.
+    Sinon, la base est reconstruite entièrement.
+    Renvoie la base, et le détail des opérations pour les timings si return_stats.
+    """
+    if embedding_model is None:
+        embedding_model = get_embedding_model(model_name)
+
+    documents = chunk_documents(chunks)
+    ids = chunk_vector_ids(chunks)
+    client, collection, db = _open_chroma(embedding_model, db_path, reset=not incremental)
+
+    stored = collection.get(include=["metadatas"])
+    stored = dict(zip(stored["ids"], stored["metadatas"]))
+    new = [i for i, chunk_id in enumerate(ids) if chunk_id not in stored]
+    changed = [i for i, chunk_id in enumerate(ids)
+               if chunk_id in stored and not _same_metadata(stored[chunk_id], documents[i].metadata)]
+    current = set(ids)
+    stale = [chunk_id for chunk_id in stored if chunk_id not in current]
+
+    if stale:
+        current_files = {chunk["file_id"] for chunk in chunks}
+        vanished_files = {stored[chunk_id].get("file_id") for chunk_id in stale} - current_files
+        for batch in create_batches(api=client, ids=stale):
+            collection.delete(ids=batch[0])
+
+    if new:
+        texts = [documents[i].page_content for i in new]
+        if embeddings is None:
+            vectors = embedding_model.embed_documents(texts)
+        else:
+            vectors = np.asarray(embeddings, dtype=float)[new].tolist()
+        # Découpage en lots acceptés par le client Chroma (taille maximale d'un ajout)
+        for batch in create_batches(api=client, ids=[ids[i] for i in new], embeddings=vectors,
+                                    metadatas=[documents[i].metadata for i in new], documents=texts):
+            collection.upsert(ids=batch[0], embeddings=batch[1], metadatas=batch[2], documents=batch[3])
+
+    if changed:
+        # Métadonnées seules (thème, cluster...) : les vecteurs stockés restent inchangés
+        for batch in create_batches(api=client, ids=[ids[i] for i in changed],
+                                    metadatas=[documents[i].metadata for i in changed]):
+            collection.update(ids=batch[0], metadatas=batch[2])
 
-    db = Chroma.from_documents(documents, embedding_model, persist_directory=db_path)
-    return db
+    if not return_stats:
+        return db
+    details = (f"VectorDB : {len(new)} chunks ajoutés, {len(changed)} mis à jour, "
+               f"{len(ids) - len(new) - len(changed)} inchangés, {len(stale)} supprimés")
+    if stale:
+        details += f" ({len(vanished_files)} fichiers disparus)"
+    return db, details
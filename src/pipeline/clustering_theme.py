@@ -1,60 +1,204 @@
-import fr_core_news_lg
-import spacy
 from spacy.lang.fr.stop_words import STOP_WORDS
 #from spacy.lang.fr.stop_words import STOP_WORDS as FR_STOPS
 
-import matplotlib
-matplotlib.use('Agg') # Forcer matplotlib à utiliser un backend non interactif (Agg)
-import matplotlib.pyplot as plt
-import seaborn as sns
 import pandas as pd
 import numpy as np
+import scipy.sparse as sp
+from scipy.sparse import csgraph
 import os
 
 from sklearn.decomposition import TruncatedSVD
 from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import TfidfVectorizer, TfidfTransformer
 from sklearn.metrics.pairwise import cosine_distances, cosine_similarity
 from sklearn.metrics import silhouette_score
 from sklearn.cluster import AgglomerativeClustering
+from sklearn.neighbors import NearestNeighbors
 import hdbscan
+try:
+    import faiss
+except ImportError:  # index approché optionnel : repli sur la recherche exacte de scikit-learn
+    faiss = None
 from sklearn.preprocessing import normalize
 
-from src.utils.normalizer import normalize_keywords
-from collections import Counter
+from src.utils.normalizer import normalize_keywords_batch
+from src.utils.spacy_models import get_nlp, load_model, model_version
+from src.pipeline.config import SPACY_BATCH_SIZE, SPACY_N_PROCESS, SPACY_PARALLEL_MIN_CHUNKS, SPACY_TASK_SIZE, \
+    SVD_DIM_SELECTION, SVD_INITIAL_COMPONENTS, DIAGNOSTICS_LEVEL, SILHOUETTE_SAMPLE_SIZE, THEME_LABELLING, \
+    HDBSCAN_APPROX_MIN_CHUNKS, HDBSCAN_KNN_NEIGHBORS, HDBSCAN_CORE_DIST_N_JOBS
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 import re
 
 
-nlp = spacy.load("fr_core_news_lg", disable=["parser"])
+# Modèle spaCy partagé, chargé à la première utilisation (le parser de dépendances n'est pas utilisé)
+nlp = get_nlp(["tok2vec", "morphologizer", "attribute_ruler", "lemmatizer"])
 
-def clean_chunks_strings(chunks, tfidf_threshold=0.008, high_freq_threshold=0.7):
+# Entités détectées sur le texte d'origine, non nettoyé (casse, mots d'un caractère et ponctuation compris)
+ner = get_nlp(["tok2vec", "ner"])
+
+ENTITY_LABELS = {"PER", "GPE", "LOC"}
+
+def clean_text(text):
+    """
+    Normalisation de texte avant clustering (l'analyse des entités se fait sur le texte d'origine) :
+    minuscules, sans mots d'un caractère ni ponctuation. is_punct étant un attribut lexical,
+    la ponctuation est retirée sur la seule tokenisation, sans analyse.
+    """
+    text = text.lower()
+    text = re.sub(r"\b\w\b", " ", text) # remplacement des mots d'un caractère par un espace
+    text = re.sub(r"\s+", " ", text).strip() # retrait des espaces inutiles
+    return " ".join(token.text for token in nlp.make_doc(text) if not token.is_punct) # retrait de la ponctuation
+
+def annotate_doc(doc, ner_doc):
+    """
+    Extrait tout ce qu'utilise clean_chunks_strings : du Doc du texte nettoyé (clean_text),
+    mots en minuscules, lemmes en minuscules et étiquettes POS ; du Doc du texte d'origine, entités PER/GPE/LOC.
+    """
+    return {
+        "words": [token.lower_ for token in doc],
+        "lemmas": [token.lemma_.lower() for token in doc],
+        "pos": [token.pos_ for token in doc],
+        "entities": [ent.text for ent in ner_doc.ents if ent.label_ in ENTITY_LABELS],
+    }
+
+def annotate_texts(texts, batch_size=SPACY_BATCH_SIZE):
+    """
+    Annotations des textes, dans l'ordre. Une seule analyse (tokens, lemmes, POS) par chunk, sur le texte
+    nettoyé sans ponctuation, exactement celui qu'analysait la version d'origine ; les entités viennent
+    du passage NER seul sur le texte d'origine.
+    """
+    docs = nlp.pipe((clean_text(text) for text in texts), batch_size=batch_size)
+    ner_docs = ner.pipe(texts, batch_size=batch_size)
+    for doc, ner_doc in zip(docs, ner_docs):
+        yield annotate_doc(doc, ner_doc)
+
+def annotate_batch(texts, batch_size=SPACY_BATCH_SIZE):
+    """Tâche d'un processus d'annotation : annote un lot de textes et renvoie des annotations compactes."""
+    return list(annotate_texts(texts, batch_size))
+
+def annotate_chunks_parallel(texts, n_process, task_size=SPACY_TASK_SIZE, batch_size=SPACY_BATCH_SIZE):
+    """
+    Annotation répartie sur n_process processus, par tâches de task_size textes.
+    Les processus renvoient les annotations (listes de str) et non les Doc spaCy, bien plus lourds à transférer.
+    Processus démarrés en "spawn" : un fork hériterait des verrous tenus par les threads du processus
+    (ingestion, Drive, torch/OpenMP). Chaque processus charge le modèle à son démarrage (load_model).
+    Résultats produits dans l'ordre des textes, au fil de l'eau, avec au plus 2 tâches en attente par processus.
+    """
+    tasks = (texts[i:i + task_size] for i in range(0, len(texts), task_size))
+    with ProcessPoolExecutor(max_workers=n_process, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=load_model, initargs=(nlp.model_name,)) as executor:
+        pending = deque()
+        for task in tasks:
+            pending.append(executor.submit(annotate_batch, task, batch_size))
+            if len(pending) >= 2 * n_process:
+                break
+        while pending:
+            annotations = pending.popleft().result()
+            next_task = next(tasks, None)
+            if next_task is not None:
+                pending.append(executor.submit(annotate_batch, next_task, batch_size))
+            yield from annotations
+
+def annotate_chunks(texts, batch_size=SPACY_BATCH_SIZE, n_process=SPACY_N_PROCESS, cache=None):
+    """
+    Une seule analyse spaCy par chunk : générateur des annotations, dans l'ordre des textes.
+    Au-delà de SPACY_PARALLEL_MIN_CHUNKS textes, l'annotation est répartie sur n_process processus.
+    cache : AnnotationCache optionnel, seuls les textes absents du cache sont analysés.
+    """
+    texts = list(texts)
+    if cache is None:
+        yield from _annotate_texts(texts, batch_size, n_process)
+        return
+
+    version = model_version(nlp.model_name)
+    cached = cache.get_many(texts, version)
+    missing = [text for text, annotation in zip(texts, cached) if annotation is None]
+    new_annotations = _annotate_texts(missing, batch_size, n_process)
+    to_store = []
+    for text, annotation in zip(texts, cached):
+        if annotation is None:
+            annotation = next(new_annotations)
+            to_store.append((text, annotation))
+            if len(to_store) >= SPACY_TASK_SIZE:
+                cache.put_many(to_store, version)
+                to_store = []
+        yield annotation
+    if to_store:
+        cache.put_many(to_store, version)
+
+def _annotate_texts(texts, batch_size, n_process):
+    if n_process > 1 and len(texts) >= SPACY_PARALLEL_MIN_CHUNKS:
+        yield from annotate_chunks_parallel(texts, n_process, batch_size=batch_size)
+        return
+    yield from annotate_texts(texts, batch_size)
+
+def clean_chunks_strings(chunks, tfidf_threshold=0.008, high_freq_threshold=0.7, annotation_cache=None, filters=None,
+                          return_filters=False):
     """
     Prépare les chunks pour HDBSCAN :
     - Nettoyage statistique (TF-IDF, haute fréquence, stopwords)
     - Lemmatisation linguistique
     - Filtrage POS (supprime les tokens peu informatifs)
     - Conservation des noms propres fréquents (PER, GPE, LOC)
+    Chaque chunk est analysé en un passage spaCy sur le texte nettoyé sans ponctuation (tokens, lemmes, POS)
+    et un passage NER seul sur le texte d'origine (entités), au lieu des quatre analyses complètes d'origine.
+    annotation_cache : AnnotationCache optionnel, les chunks déjà analysés lors d'un run précédent ne le sont plus.
+    filters : (stopwords combinés, noms propres) déjà calculés ; sinon appris sur ces chunks (voir fit_token_filters).
+    return_filters : renvoie (df, filters) pour réutiliser ces filtres plus tard.
     """
     df = pd.DataFrame(chunks)
-    df["string"] = df["text"].astype(str)
-    df["string"] = df["string"].fillna('').apply(lambda x: x.lower())
 
-    # Normalisation de texte avant clustering
-    df['string'] = df['string'].apply(lambda text:re.sub(r"\b\w\b", " ", text)) # remplacement des mots d'un caractère par un espace
-    df['string'] = df['string'].apply(lambda text: re.sub(r"\s+", " ", text).strip()) # retrait des espaces inutiles
-    
-    # Retrait de ponctuation
-    def remove_punctuation(text):
-        doc = nlp(text)
-        return " ".join([token.text for token in doc if not token.is_punct])
-    df['string'] = df['string'].apply(remove_punctuation) # retrait de la ponctuation
-    
-    # --- Étape 1 : stopwords simples
-    df['desc_token_temp'] = df['string'].apply(
-        lambda x: [token.lemma_ for token in nlp(x) if token.text.lower() not in STOP_WORDS]
-    )
+    # Textes d'origine : annotate_texts les nettoie (clean_text) pour les mots et y détecte les entités
+    texts = df["text"].astype(str).fillna('')
+
+    # Les colonnes sont construites au fil des annotations, sans attendre la fin de l'analyse
+    annotations, strings, desc_token_temp, all_entities = [], [], [], []
+    for annotation in annotate_chunks(texts, cache=annotation_cache):
+        annotations.append(annotation)
+        # Tokens analysés du texte en minuscules sans ponctuation
+        strings.append(" ".join(annotation["words"]))
+        # --- Étape 1 : stopwords simples
+        desc_token_temp.append(
+            [lemma for word, lemma in zip(annotation["words"], annotation["lemmas"]) if word not in STOP_WORDS]
+        )
+        all_entities.extend(annotation["entities"])
+
+    df['string'] = strings
+    df['desc_token_temp'] = desc_token_temp
     df['nlp_ready_temp'] = df['desc_token_temp'].apply(lambda x: ' '.join(x))
 
+    # --- Étapes 2 à 5 : mots écartés et noms propres conservés, appris sur ces chunks
+    # ou repris d'un clustering précédent (affectation incrémentale de nouveaux chunks)
+    if filters is None:
+        filters = fit_token_filters(df, all_entities, tfidf_threshold, high_freq_threshold)
+    combined_stopwords, proper_nouns_final = filters
+
+    # --- Étape 6 : reconstruction finale
+    df['desc_token'] = [
+        [
+            word if word in proper_nouns_final else lemma
+            for word, lemma, pos in zip(annotation["words"], annotation["lemmas"], annotation["pos"])
+            if word.isalpha()
+            and word not in combined_stopwords
+            and lemma not in combined_stopwords
+            and (pos in {"NOUN", "VERB", "ADJ"} or word in proper_nouns_final)
+        ]
+        for annotation in annotations
+    ]
+    df['nlp_ready'] = df['desc_token'].apply(lambda x: ' '.join(x))
+
+    if return_filters:
+        return df, filters
+    return df
+
+
+def fit_token_filters(df, all_entities, tfidf_threshold=0.008, high_freq_threshold=0.7):
+    """
+    Etapes 2 à 5 de clean_chunks_strings, sur la colonne nlp_ready_temp :
+    renvoie (stopwords combinés, noms propres fréquents à conserver).
+    """
     # --- Étape 2 : TF-IDF pour bas score
     vectorizer_temp = TfidfVectorizer(stop_words=list(STOP_WORDS))
     X_temp = vectorizer_temp.fit_transform(df['nlp_ready_temp'])
@@ -62,7 +206,8 @@ def clean_chunks_strings(chunks, tfidf_threshold=0.008, high_freq_threshold=0.7)
     mean_tfidf = X_temp.mean(axis=0).A1
     low_info_words = [word for word, score in zip(feature_names, mean_tfidf) if score < tfidf_threshold]
     print(f"Nombre de mots peu informatifs, avec un score TF-IDF faible : {len(low_info_words)}")
-    print(f"Mots peu informatifs, avec un score TF-IDF faible : {low_info_words}")
+    if DIAGNOSTICS_LEVEL == "debug":
+        print(f"Mots peu informatifs, avec un score TF-IDF faible : {low_info_words}")
     
     # --- Étape 3 : fréquence documentaire pour mots trop fréquents
     vec = CountVectorizer()
@@ -70,29 +215,14 @@ def clean_chunks_strings(chunks, tfidf_threshold=0.008, high_freq_threshold=0.7)
     doc_freq = np.asarray(X_count.sum(axis=0)).ravel() / X_count.shape[0]
     words_high_freq = [word for word, freq in zip(vec.get_feature_names_out(), doc_freq) if freq > high_freq_threshold]
     print(f"Nombre de mots peu informatifs, avec un TF élevé : {len(words_high_freq)}")
-    print(f"Mots peu informatifs, avec un TF élevé : {words_high_freq}")
-
-    # Fréquence globale des mots
-    text_all = " ".join(df["nlp_ready_temp"].dropna().astype(str))
-    words = text_all.split()
-    total_words = len(words)
-    freq_count = Counter(words)
-    freq_with_proportion = {word: (count, count / total_words) for word, count in freq_count.items()}
-    sorted_items = sorted(freq_with_proportion.items(), key=lambda x: x[1][0], reverse=True)  # tri sur count décroissant
-    
-    # Affichage des mots avec proportion >= 0.5% ou count >= 10
-    for word, (count, prop) in sorted_items:
-        if prop >= 0.005 or count >= 10:
-            print(f"{word}: {count} fois, {prop:.2%}")
+    if DIAGNOSTICS_LEVEL == "debug":
+        print(f"Mots peu informatifs, avec un TF élevé : {words_high_freq}")
+        print_word_frequencies(df["nlp_ready_temp"])
 
     # --- Étape 4 : stopwords combinés
     combined_stopwords = STOP_WORDS.union(set(low_info_words)).union(set(words_high_freq))
 
-    # --- Étape 5 : extraire les noms propres PER/GPE/LOC avec spaCy
-    all_entities = []
-    for doc in nlp.pipe(df['text'], batch_size=20):
-        ents = [ent.text for ent in doc.ents if ent.label_ in ["PER", "GPE", "LOC"]]
-        all_entities.extend(ents)
+    # --- Étape 5 : noms propres PER/GPE/LOC détectés par spaCy (collectés avec les annotations)
 
     def clean_entity(ent):
         text = ent.strip()
@@ -112,24 +242,36 @@ def clean_chunks_strings(chunks, tfidf_threshold=0.008, high_freq_threshold=0.7)
     #print(f"Entités nommées avec leurs occurrences : {entity_counts}")
     print(f"Liste nettoyée de noms propres: {proper_nouns_final}")
     print(f"Nombre de noms propres: {len(proper_nouns_final)}")
+
+    return combined_stopwords, proper_nouns_final
     
-    # --- Étape 6 : reconstruction finale
-    df['desc_token'] = df['string'].apply(
-        lambda x: [
-            token.text if token.text.lower() in proper_nouns_final else token.lemma_.lower()
-            for token in nlp(x)
-            if token.is_alpha
-            and token.text.lower() not in combined_stopwords
-            and token.lemma_.lower() not in combined_stopwords
-            #and token.text.lower() not in STOP_WORDS
-            #and token.lemma_.lower() not in STOP_WORDS
-            and (token.pos_ in {"NOUN", "VERB", "ADJ"} or token.text.lower() in proper_nouns_final)
-        ]
-    )
-    df['nlp_ready'] = df['desc_token'].apply(lambda x: ' '.join(x))
 
-    return df
+def print_word_frequencies(texts):
+    """Diagnostic (mode debug) : fréquence globale des mots, triée par nombre d'occurrences décroissant."""
+    text_all = " ".join(texts.dropna().astype(str))
+    words = text_all.split()
+    total_words = len(words)
+    freq_count = Counter(words)
+    freq_with_proportion = {word: (count, count / total_words) for word, count in freq_count.items()}
+    sorted_items = sorted(freq_with_proportion.items(), key=lambda x: x[1][0], reverse=True)  # tri sur count décroissant
+    
+    # Affichage des mots avec proportion >= 0.5% ou count >= 10
+    for word, (count, prop) in sorted_items:
+        if prop >= 0.005 or count >= 10:
+            print(f"{word}: {count} fois, {prop:.2%}")
 
+def silhouette_estimate(X, labels, sample_size=SILHOUETTE_SAMPLE_SIZE, random_state=42):
+    """
+    Score de silhouette (cosinus) des chunks hors bruit. Au-delà de sample_size chunks, il est estimé
+    sur un échantillon aléatoire : le calcul exact est quadratique en nombre de chunks.
+    Renvoie None s'il y a moins de 2 clusters.
+    """
+    mask = labels != -1
+    X, labels = X[mask], labels[mask]
+    if len(set(labels)) < 2 or len(labels) < 3:
+        return None
+    sample = sample_size if len(labels) > sample_size else None
+    return silhouette_score(X, labels, metric='cosine', sample_size=sample, random_state=random_state)
 
 def auto_svd_dim(X, target_var=0.7):
     
@@ -146,6 +288,83 @@ def auto_svd_dim(X, target_var=0.7):
     print(f"Variance expliquée cumulée associée au nombre de composantes k: {cumvar[k]}")
     #print(f"Variance expliquée cumulée associée à chaque nombre de composantes : {cumvar}")
     
+    plot_cumulative_variance(cumvar)
+
+    return k
+
+def _orthonormal(Y, Q):
+    """Base orthonormée de la partie de Y orthogonale aux colonnes de Q (deux passes de projection)."""
+    for _ in range(2):
+        Y = Y - Q @ (Q.T @ Y)
+        Y = np.linalg.qr(Y)[0]
+    return Y
+
+def auto_svd_dim_fast(X, target_var=0.7, initial_components=SVD_INITIAL_COMPONENTS, n_iter=5, oversampling=10,
+                      random_state=42, return_svd=False):
+    """
+    Variante rapide de auto_svd_dim : renvoie (k, lsa), lsa étant la projection de X sur les k premières composantes.
+    Une seule SVD randomisée, étendue tant que la variance cumulée n'atteint pas target_var : la base orthonormée Q
+    de l'image de X est complétée par un bloc de vecteurs orthogonaux aux précédents (taille doublée à chaque
+    extension). Seuls les produits du nouveau bloc par X X^T sont calculés pour compléter la petite matrice de Gram
+    Q^T X X^T Q, dont la diagonalisation donne valeurs singulières, variance expliquée et projection ;
+    la partie déjà trouvée n'est jamais recalculée.
+    return_svd : renvoie aussi les composantes, (k, lsa, components) avec components de taille k x n_features,
+    pour projeter de nouveaux documents.
+    """
+    rng = np.random.default_rng(random_state)
+    n_rows, n_features = X.shape
+    max_rank = max(2, min(X.shape) - 1)
+    # Variance totale des colonnes de X, dénominateur de explained_variance_ratio_ (comme TruncatedSVD)
+    mean = np.asarray(X.mean(axis=0)).ravel()
+    mean_sq = np.asarray(X.multiply(X).mean(axis=0)).ravel() if sp.issparse(X) else (X ** 2).mean(axis=0)
+    total_var = float((mean_sq - mean ** 2).sum())
+
+    Q = np.empty((n_rows, 0))
+    G = np.empty((0, 0))  # Q^T X X^T Q, complétée bloc par bloc
+    block = min(initial_components, max_rank)
+    while True:
+        size = min(block + oversampling, min(X.shape) - Q.shape[1])
+        Y = _orthonormal(X @ rng.standard_normal((n_features, size)), Q)
+        for _ in range(n_iter):  # itérations de puissance, restreintes au complément de Q
+            Y = _orthonormal(X @ (X.T @ Y), Q)
+        Z = X @ (X.T @ Y)
+        G = np.block([[G, Q.T @ Z], [Z.T @ Q, Y.T @ Z]])
+        Q = np.hstack([Q, Y])
+
+        eigvals, U_g = np.linalg.eigh(G)
+        order = np.argsort(eigvals)[::-1]
+        rank = min(len(order), max_rank)
+        sigma = np.sqrt(np.clip(eigvals[order[:rank]], 0, None))
+        lsa = Q @ (U_g[:, order[:rank]] * sigma)
+        cumvar = np.cumsum(lsa.var(axis=0) / total_var)
+        if cumvar[-1] >= target_var or Q.shape[1] >= max_rank:
+            break
+        block = min(Q.shape[1], max_rank - Q.shape[1])
+
+    k = min(int(np.searchsorted(cumvar, target_var) + 1), rank)
+    print(f"Nombre de composantes avant réduction de dimension : {X.shape[1]}")
+    print(f"Nombre de composantes après réduction de dimension : {k} (SVD de rang {rank})")
+    print(f"Variance expliquée cumulée associée au nombre de composantes k: {cumvar[k - 1]}")
+
+    plot_cumulative_variance(cumvar)
+
+    if return_svd:
+        # composantes V_k = X^T U_k / sigma_k, avec U_k sigma_k = lsa[:, :k]
+        components = np.asarray(X.T @ lsa[:, :k]).T / (sigma[:k, None] ** 2)
+        return k, lsa[:, :k], components
+    return k, lsa[:, :k]
+
+def plot_cumulative_variance(cumvar):
+    """
+    Enregistre le graphique de la variance expliquée cumulée en fonction du nombre de composantes.
+    Diagnostic réservé au mode debug : matplotlib n'est importé que dans ce cas.
+    """
+    if DIAGNOSTICS_LEVEL != "debug":
+        return
+    import matplotlib
+    matplotlib.use('Agg') # Forcer matplotlib à utiliser un backend non interactif (Agg)
+    import matplotlib.pyplot as plt
+
     # Nom complet du fichier PNG à enregistrer
     file_path = os.path.join('/app/data', 'truncatedsvd_variance_cumulee.png')
 
@@ -160,39 +379,224 @@ def auto_svd_dim(X, target_var=0.7):
     plt.savefig(file_path, dpi=300)
     plt.close()
 
-    return k
+def knn_graph(X, n_neighbors=HDBSCAN_KNN_NEIGHBORS, n_jobs=HDBSCAN_CORE_DIST_N_JOBS):
+    """
+    Matrice creuse des distances euclidiennes de chaque point à ses n_neighbors plus proches voisins,
+    symétrisée : mémoire en O(n * n_neighbors) au lieu de O(n²).
+    Voisins cherchés avec un index HNSW de FAISS s'il est installé, sinon par NearestNeighbors (exact).
+    Les composantes non reliées sont chaînées par leur distance réelle (HDBSCAN exige un graphe connexe) :
+    ces liens, plus longs que les distances entre voisins, sont les premiers coupés par la hiérarchie.
+    """
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    n = X.shape[0]
+    k = min(n_neighbors + 1, n)  # chaque point est son propre premier voisin
+    if faiss is not None:
+        index = faiss.IndexHNSWFlat(X.shape[1], 32)
+        index.hnsw.efSearch = max(64, k)
+        index.add(X)
+        distances, neighbors = index.search(X, k)
+        distances = np.sqrt(np.maximum(distances, 0))  # FAISS renvoie des distances au carré
+    else:
+        distances, neighbors = NearestNeighbors(n_neighbors=k, n_jobs=n_jobs).fit(X).kneighbors(X)
+
+    rows = np.repeat(np.arange(n), k)
+    cols = neighbors.ravel()
+    keep = (cols != rows) & (cols >= 0)  # FAISS renvoie -1 quand il manque des voisins
+    # une distance nulle (doublons) serait absente de la matrice creuse : remplacée par un epsilon
+    values = np.maximum(distances.ravel()[keep].astype(np.float64), 1e-10)
+    graph = sp.csr_matrix((values, (rows[keep], cols[keep])), shape=(n, n))
+    graph = graph.maximum(graph.T)
+
+    n_components, components = csgraph.connected_components(graph, directed=False)
+    if n_components > 1:
+        representatives = np.unique(components, return_index=True)[1]
+        a, b = representatives[:-1], representatives[1:]
+        values = np.maximum(np.linalg.norm(X[a] - X[b], axis=1).astype(np.float64), 1e-10)
+        links = sp.csr_matrix((np.r_[values, values], (np.r_[a, b], np.r_[b, a])), shape=(n, n))
+        graph = graph.maximum(links)
+    return graph.tocsr()
+
+def hdbscan_clustering(X, approx_min_chunks=HDBSCAN_APPROX_MIN_CHUNKS):
+    """
+    Labels HDBSCAN des vecteurs X (normalisés). Jusqu'à approx_min_chunks points : distances euclidiennes exactes ;
+    au-delà : graphe des plus proches voisins (knn_graph), pour borner mémoire et temps sur les gros corpus.
+    """
+    params = dict(
+        min_cluster_size=5,
+        min_samples=1,
+        cluster_selection_method='eom',
+        cluster_selection_epsilon=0.03
+    )
+    if len(X) >= approx_min_chunks:
+        print(f"HDBSCAN sur le graphe des {HDBSCAN_KNN_NEIGHBORS} plus proches voisins "
+              f"({'FAISS' if faiss is not None else 'scikit-learn'}) : {len(X)} chunks")
+        return hdbscan.HDBSCAN(metric='precomputed', **params).fit_predict(knn_graph(X))
+    clusterer = hdbscan.HDBSCAN(metric='euclidean', core_dist_n_jobs=HDBSCAN_CORE_DIST_N_JOBS, **params)
+    return clusterer.fit_predict(X)
+
+def cluster_indicator(labels):
+    """
+    Matrice indicatrice creuse (clusters x chunks) : M[i, j] = 1 si le chunk j appartient au i-ème cluster.
+    M @ A donne en une multiplication les sommes par cluster des lignes de A.
+    Renvoie (M, identifiants des clusters dans l'ordre de première apparition, comme unique()).
+    """
+    codes, cluster_ids = pd.factorize(np.asarray(labels))
+    n = len(codes)
+    M = sp.csr_matrix((np.ones(n), (codes, np.arange(n))), shape=(len(cluster_ids), n))
+    return M, np.asarray(cluster_ids)
+
+def cluster_tfidf_means(texts, labels, max_features=500):
+    """
+    Score TF-IDF moyen de chaque terme dans chaque cluster, identique à un TfidfVectorizer(max_features)
+    ajusté séparément sur les textes de chaque cluster, mais calculé en une seule passe :
+    une matrice de comptes commune, puis fréquences et nombres de documents par cluster par produit matriciel.
+    Renvoie (scores creux clusters x termes, termes, identifiants des clusters).
+    Lève ValueError si les textes ne contiennent aucun terme.
+    """
+    M, cluster_ids = cluster_indicator(labels)
+    vectorizer = CountVectorizer(dtype=np.float64)
+    C = vectorizer.fit_transform(texts)
+    n_terms = C.shape[1]
+    n_docs = np.asarray(M.sum(axis=1)).ravel()
+
+    # Fréquences et nombres de documents par (cluster, terme)
+    term_freq = (M @ C).tocsr()
+    doc_freq = (M @ (C > 0).astype(np.float64)).tocsr()
+    term_freq.sort_indices()
+    doc_freq.sort_indices()
+
+    # Vocabulaire de chaque cluster limité à ses max_features termes les plus fréquents,
+    # avec le même départage des ex aequo que CountVectorizer (tri sur les termes par ordre alphabétique)
+    kept_keys = []
+    for i in range(term_freq.shape[0]):
+        start, end = term_freq.indptr[i], term_freq.indptr[i + 1]
+        terms = term_freq.indices[start:end]
+        if max_features is not None and len(terms) > max_features:
+            terms = np.sort(terms[(-term_freq.data[start:end]).argsort()[:max_features]])
+        kept_keys.append(i * n_terms + terms.astype(np.int64))
+    kept_keys = np.concatenate(kept_keys) if kept_keys else np.empty(0, dtype=np.int64)
+
+    # Poids TF-IDF de chaque entrée non nulle, avec l'idf et le vocabulaire propres au cluster de son document
+    C = C.tocoo()
+    doc_cluster = M.tocsc().indices  # une seule entrée par colonne : le cluster de chaque document
+    keys = doc_cluster[C.row].astype(np.int64) * n_terms + C.col
+    df_keys = np.repeat(np.arange(doc_freq.shape[0], dtype=np.int64), np.diff(doc_freq.indptr)) * n_terms \
+        + doc_freq.indices
+    df_values = doc_freq.data[np.searchsorted(df_keys, keys)]
+    idf = np.log((1 + n_docs[doc_cluster[C.row]]) / (1 + df_values)) + 1
+    kept = np.isin(keys, kept_keys, assume_unique=False)
+    weights = C.data * idf * kept
+
+    # Normalisation L2 de chaque document (sur les seuls termes retenus), puis moyenne par cluster
+    norms = np.sqrt(np.bincount(C.row, weights ** 2, minlength=C.shape[0]))
+    weights = np.divide(weights, norms[C.row], out=np.zeros_like(weights), where=norms[C.row] > 0)
+    W = sp.csr_matrix((weights, (C.row, C.col)), shape=C.shape)
+    scores = sp.csr_matrix((M @ W).multiply(1 / n_docs[:, None]))
+    scores.eliminate_zeros()
+    return scores, vectorizer.get_feature_names_out(), cluster_ids
 
 def extract_top_keywords(df, cluster_col="hdb_cluster", text_col="nlp_ready", top_n=3):
     """
-    Extrait les mots-clés les plus pertinents par cluster en utilisant TF-IDF.
+    Extrait les mots-clés les plus pertinents par cluster en utilisant TF-IDF (TF-IDF propre à chaque cluster,
+    calculé pour tous les clusters à la fois par cluster_tfidf_means).
     """
     themes = {}
+    texts = df[text_col]
+    valid = texts.map(lambda t: isinstance(t, str) and bool(t.strip())).to_numpy(dtype=bool)
+    labels = df[cluster_col].to_numpy()
+
+    rows = {}
+    try:
+        scores, words, cluster_ids = cluster_tfidf_means(texts[valid].tolist(), labels[valid])
+        rows = {cluster_id: scores.getrow(i) for i, cluster_id in enumerate(cluster_ids)}
+    except ValueError:
+        pass  # aucun terme dans le corpus : tous les clusters sont vides
+
+    candidates = {}
     for cluster_id in df[cluster_col].unique():
         if cluster_id == -1:  # bruit
             themes[cluster_id] = "other"
             continue
 
-        cluster_texts = df[df[cluster_col] == cluster_id][text_col]
-        cluster_texts = [t for t in cluster_texts if isinstance(t, str) and t.strip()]
-
-        if not cluster_texts:
+        row = rows.get(cluster_id)
+        if row is None or row.nnz == 0:
             themes[cluster_id] = "(empty)"
             continue
 
-        try:
-            vectorizer = TfidfVectorizer(max_features=500)
-            X = vectorizer.fit_transform(cluster_texts)
-            scores = X.mean(axis=0).A1
-            words = vectorizer.get_feature_names_out()
-            top_words = [w for w, _ in sorted(zip(words, scores), key=lambda x: x[1], reverse=True)[:top_n]]
-            top_words_normalized = normalize_keywords(top_words)
-            themes[cluster_id] = ", ".join(sorted(top_words_normalized)) if top_words_normalized else "(empty)"
-        except ValueError:
-            themes[cluster_id] = "(empty)"
+        # Tri par score décroissant, ex aequo dans l'ordre alphabétique des termes
+        order = np.lexsort((row.indices, -row.data))[:top_n]
+        candidates[cluster_id] = [words[j] for j in row.indices[order]]
+        themes[cluster_id] = None  # rempli après la lemmatisation groupée, l'ordre des clusters est conservé
 
+    themes.update(format_themes(candidates))
+    return themes
+
+def format_themes(candidates):
+    """
+    Chaîne de thème de chaque cluster à partir de ses mots-clés candidats ({cluster: [mots]}) :
+    mots de même lemme dédoublonnés (lemmatisation groupée de tous les candidats), triés, séparés par ", ".
+    """
+    normalized = normalize_keywords_batch(list(candidates.values()))
+    return {cluster_id: ", ".join(sorted(words)) if words else "(empty)"
+            for cluster_id, words in zip(candidates, normalized)}
+
+def class_tfidf(counts, labels):
+    """
+    TF-IDF par classe (c-TF-IDF) : les documents d'un cluster sont traités comme un seul document.
+    counts : matrice creuse documents x termes (comptes) déjà calculée pour le clustering, labels : cluster de chaque ligne.
+    tf = comptes du terme dans le cluster / nombre de mots du cluster
+    idf = log(1 + nombre moyen de mots par cluster / comptes du terme dans tous les clusters)
+    Le bruit (-1) est exclu. Renvoie (scores denses clusters x termes, identifiants des clusters).
+    """
+    labels = np.asarray(labels)
+    not_noise = labels != -1
+    M, cluster_ids = cluster_indicator(labels[not_noise])
+    if len(cluster_ids) == 0:  # uniquement du bruit
+        return np.zeros((0, counts.shape[1])), cluster_ids
+    class_counts = np.asarray((M @ counts[not_noise]).todense())
+
+    words_per_class = class_counts.sum(axis=1, keepdims=True)
+    term_counts = class_counts.sum(axis=0)
+    tf = np.divide(class_counts, words_per_class, out=np.zeros_like(class_counts), where=words_per_class > 0)
+    idf = np.log(1 + words_per_class.mean() / np.maximum(term_counts, 1))
+    return tf * idf, cluster_ids
+
+def top_terms(scores, top_n=3):
+    """
+    Indices des top_n termes de meilleur score de chaque ligne (un argpartition pour toutes les lignes),
+    triés par score décroissant, ex aequo dans l'ordre des colonnes. Les scores nuls sont ignorés.
+    """
+    top_n = min(top_n, scores.shape[1])
+    if top_n == 0:
+        return [[] for _ in range(scores.shape[0])]
+    top = np.argpartition(-scores, top_n - 1, axis=1)[:, :top_n]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    # tri des seuls top_n candidats : score décroissant, puis indice de colonne croissant
+    order = np.lexsort((top, -top_scores), axis=1)
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+    return [row[row_scores > 0].tolist() for row, row_scores in zip(top, top_scores)]
+
+def label_clusters(counts, vocabulary, labels, top_n=3):
+    """
+    Thème de chaque cluster par TF-IDF par classe, même format que extract_top_keywords
+    ("mot1, mot2, mot3", "other" pour le bruit, "(empty)" sans mot-clé), dans l'ordre d'apparition des clusters.
+    counts / vocabulary : matrice documents x termes et termes du vectorizer ajusté par topic_detection.
+    """
+    labels = np.asarray(labels)
+    scores, cluster_ids = class_tfidf(counts, labels)
+    candidates = {cluster_id: [vocabulary[j] for j in terms]
+                  for cluster_id, terms in zip(cluster_ids, top_terms(scores, top_n))}
+    labelled = format_themes({cluster_id: words for cluster_id, words in candidates.items() if words})
+
+    themes = {}
+    for cluster_id in pd.unique(labels):
+        if cluster_id == -1:  # bruit
+            themes[cluster_id] = "other"
+        else:
+            themes[cluster_id] = labelled.get(cluster_id, "(empty)")
     return themes
 
-        
 def merge_close_clusters(df, embeddings, cluster_col="hdb_cluster", n_clusters=3):
     """
     Fusionne les clusters proches en utilisant la similarité cosinus de leurs centroïdes (non normalisés),
@@ -201,31 +605,18 @@ def merge_close_clusters(df, embeddings, cluster_col="hdb_cluster", n_clusters=3
     le nombre cible de clusters (target_topics)
     """
 
-	# Calculer les centroïdes des clusters HDBSCAN, hors cluster qui contient du bruit
-    centroids = []
-    cluster_ids = []
+	# Calculer les centroïdes des clusters HDBSCAN, hors cluster qui contient du bruit :
+	# sommes des embeddings par cluster en une multiplication par la matrice indicatrice, divisées par les effectifs
+    M, cluster_ids = cluster_indicator(df[cluster_col].to_numpy())
+    sizes = np.asarray(M.sum(axis=1)).ravel()
+    centroids = (M @ embeddings) / sizes[:, None]
 
-    for cluster_id in df[cluster_col].unique():
+	# Exclut le cluster contenant du bruit
+    not_noise = cluster_ids != -1
+    centroids = centroids[not_noise]
+    cluster_ids = cluster_ids[not_noise]
 
-		# Exclut le cluster contenant du bruit
-        if cluster_id == -1:
-            continue
-			
-        mask = df[cluster_col] == cluster_id
-		
-		# Exclut les clusters avec des embeddings nuls
-        if mask.sum() == 0:
-            continue
-			
-		# Coordonnées moyennes d'un cluster : Numpy array de taille égale au nb de dimensions réduites par TruncatedSVD
-        centroid_vec = embeddings[mask].mean(axis=0) 
-		
-		# Ajoute le vecteur et l'id du cluster traité aux listes de centroids et d'id
-        centroids.append(centroid_vec)
-        cluster_ids.append(cluster_id)
-		
 	# Numpy array qui empile les coordonnées moyennes de tous les clusters
-    centroids = np.vstack(centroids)
     #print(f"Centroides des clusters HDBSCAN : {centroids}")
 
 	# Calcule la matrice de distances cosine entre centroïdes 
@@ -259,41 +650,51 @@ def merge_close_clusters(df, embeddings, cluster_col="hdb_cluster", n_clusters=3
     return df
 
 
-def topic_detection(chunks, n_topics=3):
-    
+def topic_detection(chunks, n_topics=3, annotation_cache=None, embeddings=None, return_state=False):
+    """
+    Regroupe les chunks en n_topics thèmes et renvoie les chunks (hors bruit) avec leur thème.
+    embeddings : vecteurs des chunks (même ordre que chunks) pour un clustering sémantique ;
+    sinon clustering lexical sur la projection SVD de la matrice TF-IDF.
+    Dans les deux cas, les thèmes sont étiquetés à partir des mots des chunks.
+    return_state : renvoie aussi les éléments ajustés (filtres, vectorizer, projection, clusters, thèmes)
+    dont a besoin l'affectation incrémentale de nouveaux chunks (voir topic_model.TopicModel).
+    """
     # Nettoyage
-    df_chunks = clean_chunks_strings(chunks)
+    df_chunks, filters = clean_chunks_strings(chunks, annotation_cache=annotation_cache, return_filters=True)
 
-    # TF-IDF
-    vectorizer = TfidfVectorizer(stop_words=None)
-    X = vectorizer.fit_transform(df_chunks['nlp_ready'])
+    # TF-IDF (comptes conservés pour l'étiquetage des thèmes par TF-IDF par classe)
+    vectorizer = CountVectorizer(stop_words=None)
+    counts = vectorizer.fit_transform(df_chunks['nlp_ready'])
+    transformer = TfidfTransformer()
+    X = transformer.fit_transform(counts)
     print(f"Taille de la matrice TF-IDF : {X.shape}")
 
-    # SVD
-    k = auto_svd_dim(X, target_var=0.7)
-    svd_model = TruncatedSVD(n_components=k, algorithm='randomized', n_iter=100, random_state=42)
-    lsa = svd_model.fit_transform(X)
-
-    # Normalisation
-    X_norm = normalize(lsa)
+    components = None
+    if embeddings is not None:
+        # Clustering sémantique : les embeddings déjà calculés remplacent la projection SVD
+        X_norm = normalize(np.asarray(embeddings, dtype=np.float64))
+        print(f"Taille de la matrice d'embeddings : {X_norm.shape}")
+    else:
+        # SVD
+        if SVD_DIM_SELECTION == "fast":
+            k, lsa, components = auto_svd_dim_fast(X, target_var=0.7, return_svd=True)
+        else:
+            k = auto_svd_dim(X, target_var=0.7)
+            svd_model = TruncatedSVD(n_components=k, algorithm='randomized', n_iter=100, random_state=42)
+            lsa = svd_model.fit_transform(X)
+            components = svd_model.components_[:k]
+
+        # Normalisation
+        X_norm = normalize(lsa)
 
     # Clustering
-    clusterer = hdbscan.HDBSCAN(
-        min_cluster_size=5,
-        min_samples=1,
-        metric='euclidean',
-        cluster_selection_method='eom',
-        cluster_selection_epsilon=0.03
-    )
-    labels = clusterer.fit_predict(X_norm)
+    labels = hdbscan_clustering(X_norm)
     df_chunks['hdb_cluster'] = labels
     
     n_clusters_hdbscan = len(set(labels)) - (1 if -1 in labels else 0)
     print(f"Nombre de clusters créés sans le bruit : {n_clusters_hdbscan}")
-    mask = labels != -1
-    X_norm_without_noise = X_norm[mask]
-    labels_without_noise = labels[mask]
-    print(f"Score de silhouette : {silhouette_score(X_norm_without_noise, labels_without_noise, metric='cosine')}")
+    if DIAGNOSTICS_LEVEL == "debug":
+        print(f"Score de silhouette : {silhouette_estimate(X_norm, labels)}")
     print(f"Nb chunks dans le cluster outliers : {np.sum(labels == -1)}")    
     print(f"Prct d'outliers : {np.sum(labels == -1)/len(labels)*100} %")
     print(f"Nb chunks dans chaque cluster: {df_chunks['hdb_cluster'].value_counts()}")
@@ -313,8 +714,23 @@ def topic_detection(chunks, n_topics=3):
 
 
     # Extraction des thèmes
-    themes = extract_top_keywords(df_chunks, cluster_col=final_col, text_col="nlp_ready", top_n=3)
+    if THEME_LABELLING == "class_tfidf":
+        themes = label_clusters(counts, vectorizer.get_feature_names_out(), df_chunks[final_col], top_n=3)
+    else:
+        themes = extract_top_keywords(df_chunks, cluster_col=final_col, text_col="nlp_ready", top_n=3)
     df_chunks['theme'] = df_chunks[final_col].map(themes)
+    if return_state:
+        state = {
+            "backend": "lexical" if embeddings is None else "semantic",
+            "n_topics": n_topics,
+            "filters": filters,
+            "vectorizer": vectorizer,
+            "transformer": transformer,
+            "components": components,
+            "X_norm": X_norm,
+            "labels": df_chunks[final_col].to_numpy(),
+            "themes": themes,
+        }
     print("AVANT", len(df_chunks))
     df_chunks = df_chunks.loc[df_chunks['theme'] != "other"]
     print("APRES", len(df_chunks))
@@ -328,6 +744,8 @@ def topic_detection(chunks, n_topics=3):
         theme_to_json = df_chunks.drop(columns=["hdb_cluster", "nlp_ready", 
                                             "desc_token_temp", "nlp_ready_temp", "string", "desc_token"]).to_dict(orient="records")
 
+    if return_state:
+        return theme_to_json, state
     return theme_to_json
 
 
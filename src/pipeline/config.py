@@ -1,10 +1,128 @@
+import os
+
 SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
 DRIVE_FOLDER_URL = "https://drive.google.com/drive/folders/1P_v9V_eVLRps3nxCO4Fn-ui0-WdY-mmz?usp=sharing"
 FOLDER_MIME   = "application/vnd.google-apps.folder"
 SHORTCUT_MIME = "application/vnd.google-apps.shortcut"
 CHROMA_DB_PATH = "chroma_db"
+CHROMA_COLLECTION_NAME = "langchain" # collection par défaut de langchain_chroma, celle des bases déjà créées
 #EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2" # entraîné sur des textes en anglais 
 # EMBEDDING_MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2" # multilingue
 EMBEDDING_MODEL_NAME = "dangvantuan/sentence-camembert-base" # adapté au français
 #EMBEDDING_MODEL_NAME = "OrdalieTech/Solon-embeddings-large-0.1" # adapté au français
-POST_TARGET_URL = "http://api:8000/send_quiz" #If local -> replace api by localhost else replace localhost by api
\ No newline at end of file
+# Modèle d'embeddings partagé (chargé une seule fois par processus) : nombre de textes encodés par lot,
+# textes triés par longueur avant découpage en lots, comme SentenceTransformer.encode (voir bench_embedding_batches)
+EMBEDDING_BATCH_SIZE = 32
+# Exécution du modèle d'embeddings sur CPU : "torch" (fp32), "torch_int8" (quantification dynamique PyTorch),
+# "onnx" (onnxruntime) ou "onnx_int8" (ONNX quantifié, exporté une fois dans EMBEDDING_ONNX_DIR)
+# Compromis qualité / vitesse sur l'étape de récupération : voir bench_embedding_backends. "torch" tant que les
+# backends quantifiés n'ont pas été mesurés avec le modèle réel (torch, optimum et le modèle absents du banc)
+EMBEDDING_BACKEND = "torch"
+EMBEDDING_ONNX_DIR = "data/onnx_models"
+# Jeu d'instructions ciblé par la quantification ONNX : "avx2" (tout x86 récent), "avx512", "avx512_vnni", "arm64"
+EMBEDDING_ONNX_QUANTIZATION = "avx2"
+# Cache disque des embeddings (clé : modèle + sha1 du texte), partagé par get_embeddings et save_to_chroma
+EMBEDDING_CACHE = True
+EMBEDDING_CACHE_DIR = "data/embedding_cache"
+EMBEDDING_CACHE_MAX_BYTES = 500 * 1024 * 1024
+# Exécution des jobs par le serveur de pipeline :
+# - "worker" : PIPELINE_WORKERS processus durables alimentés par une file (src/pipeline/worker.py), qui gardent
+#   imports et modèles (spaCy, embeddings) chargés d'un job à l'autre (EMBEDDING_PRELOAD : chargé dès le démarrage)
+# - "subprocess" : un processus neuf par job (jobs en parallèle), qui repaie à chaque job le démarrage mesuré
+#   (1 CPU) à ~8 s d'imports du pipeline et ~5,5 s de chargement spaCy, avant le modèle d'embeddings
+PIPELINE_EXECUTION = "worker"
+PIPELINE_WORKERS = 1
+EMBEDDING_PRELOAD = True
+# Seul dossier d'où le serveur accepte un source_path (dossier ou archive déjà déposé sur le volume du conteneur)
+PIPELINE_UPLOADS_ROOT = "data/uploads"
+# Base Chroma mise à jour d'un run à l'autre (ids déterministes) : seuls les chunks nouveaux ou modifiés
+# sont encodés, ceux des fichiers disparus supprimés ; False = base reconstruite entièrement à chaque run
+CHROMA_INCREMENTAL = True
+POST_TARGET_URL = "http://api:8000/send_quiz" #If local -> replace api by localhost else replace localhost by api
+
+# Listing Drive : parcours des sous-dossiers et nombre de dossiers listés en parallèle
+DRIVE_RECURSIVE = True
+LISTING_MAX_WORKERS = 4
+
+# Ingestion : nombre max de PDFs téléchargés/lus en parallèle (1 = mode séquentiel)
+EXTRACTION_MAX_WORKERS = 8
+
+
+# Extraction multi-processus des pages d'un même PDF (réservée aux gros documents)
+EXTRACTION_PROCESS_WORKERS = os.cpu_count() or 1
+EXTRACTION_PROCESS_MIN_PAGES = 100
+
+# Au-delà de cette taille, un PDF est téléchargé dans un fichier temporaire lu via mmap plutôt qu'en RAM
+DOWNLOAD_SPILL_THRESHOLD = 50 * 1024 * 1024
+
+# RSS par fichier : intervalle (sec) de l'échantillonnage en tâche de fond pendant le téléchargement et la lecture,
+# et nombre de fichiers affichés dans les timings (None : tous les fichiers)
+RSS_SAMPLE_INTERVAL = 0.05
+RSS_REPORT_TOP = 3
+
+# Cache disque des textes extraits (clé : id Drive + md5Checksum/modifiedTime)
+EXTRACTION_CACHE_DIR = "data/extraction_cache"
+EXTRACTION_CACHE_MAX_BYTES = 500 * 1024 * 1024
+
+# Mode flux : extraction -> normalisation -> chunk page par page, seuls les chunks sont conservés en mémoire
+STREAMING_INGESTION = True
+
+# Modèle spaCy partagé (chargé une seule fois par processus, à la première utilisation)
+SPACY_MODEL_NAME = "fr_core_news_lg"
+# Nombre de textes envoyés ensemble à nlp.pipe (bench_spacy_parallel : 76 / 78 / 80 chunks/sec pour 16 / 64 / 256,
+# écart dans le bruit de mesure ; 64 garde des lots de Doc plus petits en mémoire)
+SPACY_BATCH_SIZE = 64
+
+# Annotation spaCy multi-processus des chunks (1 = un seul processus), réservée aux gros corpus.
+# Un seul processus par défaut, d'après bench_spacy_parallel (3000 chunks, 1 CPU) : 84 chunks/sec avec 1 processus,
+# 53 avec 2, 40 avec 4. Chaque processus charge son propre modèle (~5,5 s, ~600 Mo pour fr_core_news_lg) :
+# à relancer sur la machine de production avant d'augmenter SPACY_N_PROCESS (un processus par cœur au plus)
+SPACY_N_PROCESS = 1
+# Seuil du mode multi-processus : en deçà, les ~5,5 s de chargement du modèle par processus dépassent le gain
+SPACY_PARALLEL_MIN_CHUNKS = 2000
+# Nombre de chunks par tâche envoyée à un processus d'annotation (4 processus : 38 / 40 / 50 chunks/sec pour
+# 64 / 256 / 1024 ; les grandes tâches démarrent moins de processus sur un petit corpus, d'où l'écart à 1024)
+SPACY_TASK_SIZE = 256
+
+# Cache disque des annotations spaCy des chunks (clé : hash du texte + version du modèle)
+ANNOTATION_CACHE_PATH = "data/annotation_cache.sqlite"
+ANNOTATION_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+# Choix de la dimension SVD du clustering : "fast" (une seule SVD de rang croissant, réutilisée)
+# ou "full" (SVD quasi complète pour choisir k, puis seconde SVD à k composantes)
+SVD_DIM_SELECTION = "fast"
+SVD_INITIAL_COMPONENTS = 100
+
+# Niveau de diagnostic : "info" en production ; "debug" ajoute graphiques, score de silhouette
+# et listes/fréquences de mots (plus lent). Surchargeable par la variable d'environnement PIPELINE_DIAGNOSTICS
+DIAGNOSTICS_LEVEL = os.environ.get("PIPELINE_DIAGNOSTICS", "info")
+# Au-delà de ce nombre de chunks, le score de silhouette est estimé sur un échantillon
+SILHOUETTE_SAMPLE_SIZE = 5000
+
+# Clustering des chunks : "lexical" (TF-IDF + SVD) ou "semantic" (embeddings du modèle EMBEDDING_MODEL_NAME,
+# calculés une seule fois et réutilisés pour la base vectorielle Chroma)
+CLUSTERING_BACKEND = "lexical"
+
+# HDBSCAN sur gros corpus : au-delà de HDBSCAN_APPROX_MIN_CHUNKS chunks, le clustering se fait sur le graphe creux
+# des HDBSCAN_KNN_NEIGHBORS plus proches voisins (index approché FAISS s'il est installé) au lieu des distances complètes
+# (seuil tiré de bench_hdbscan_scaling : le mode approché est déjà 4x plus rapide à 20 000 chunks, à labels identiques)
+HDBSCAN_APPROX_MIN_CHUNKS = 20000
+HDBSCAN_KNN_NEIGHBORS = 30
+# Processus pour le calcul des distances au cœur de HDBSCAN (mode exact) et la recherche des voisins
+HDBSCAN_CORE_DIST_N_JOBS = os.cpu_count() or 1
+
+# Etiquetage des thèmes : "class_tfidf" (TF-IDF par classe calculé une seule fois sur la matrice documents x termes
+# du clustering, tous les clusters à la fois) ou "tfidf" (TF-IDF moyen propre à chaque cluster, historique)
+THEME_LABELLING = "class_tfidf"
+
+# Affectation incrémentale des thèmes : le clustering du run précédent d'une même source est réutilisé,
+# seuls les nouveaux chunks sont analysés et rattachés au thème le plus proche
+INCREMENTAL_TOPICS = True
+TOPIC_MODEL_DIR = "data/topic_models"
+# Rayon d'un thème : quantile des distances de ses chunks à son centroïde (au-delà, un nouveau chunk est du bruit)
+INCREMENTAL_RADIUS_QUANTILE = 0.95
+# Re-clustering complet si la part de nouveaux chunks hors de tout thème dépasse ce seuil,
+# ou si leur distance moyenne au centroïde le plus proche dépasse de plus de INCREMENTAL_MAX_DRIFT (30 %)
+# celle des chunks du clustering
+INCREMENTAL_MAX_NOISE_RATIO = 0.3
+INCREMENTAL_MAX_DRIFT = 0.3
@@ -1,5 +1,11 @@
-from sentence_transformers import SentenceTransformer
+from src.utils.embedding_models import get_embedding_model
 
-def get_embeddings(chunks, model_name):
-    model = SentenceTransformer(model_name)
-    return model.encode(chunks)
\ No newline at end of file
+def get_embeddings(chunks, model_name, embedding_model=None):
+    """
+    Embeddings des textes, avec le modèle partagé du processus (chargé une seule fois) ;
+    les textes déjà encodés sont lus dans le cache disque des embeddings.
+    embedding_model : vue du job (get_embedding_model) pour cumuler ses mesures de débit.
+    """
+    if embedding_model is None:
+        embedding_model = get_embedding_model(model_name)
+    return embedding_model.encode(chunks)
@@ -1,17 +1,22 @@
-from src.pipeline.config import CHROMA_DB_PATH, EMBEDDING_MODEL_NAME, POST_TARGET_URL
-from src.utils.drive_import import authenticate_google, get_pdfs_ids
-from src.utils.extractor import get_all_pdfs_data
-from src.pipeline.tokenizer import chunk_with_metadata
-# from src.pipeline.embedder import get_embeddings
+from src.pipeline.config import CHROMA_DB_PATH, EMBEDDING_MODEL_NAME, POST_TARGET_URL, STREAMING_INGESTION, \
+    CLUSTERING_BACKEND, INCREMENTAL_TOPICS, RSS_REPORT_TOP
+from src.utils.sources import make_source, DriveSource
+from src.utils.extraction_cache import ExtractionCache
+from src.utils.annotation_cache import AnnotationCache
+from src.utils.memory import PeakRssTracker
+from src.pipeline.tokenizer import chunk_with_metadata, iter_chunks_with_metadata
+from src.pipeline.embedder import get_embeddings
+from src.utils.embedding_models import get_embedding_model
 from src.pipeline.chroma_handler import save_to_chroma
 #from src.pipeline.clustering_latent_topics_simple import topic_detection
 #from src.pipeline.clustering_chunks_hdbscan import topic_detection, count_chunks_by_theme
 from src.pipeline.clustering_theme import topic_detection, count_chunks_by_theme
+from src.pipeline.topic_model import incremental_topic_detection
 # from src.pipeline.clustering_theme import hdbscan_clustering, count_chunks_by_theme
 #from src.pipeline.clustering_embedding import topic_detection, count_chunks_by_theme
 from src.pipeline.collect_best_chunks_to_prompt import find_best_chunk_to_prompt
 from src.pipeline.quiz_generator import generate_quiz_from_chunks
-from src.utils.normalizer import normalize_text
+from src.utils.normalizer import normalize_text, normalize_pages
 # from langchain_chroma import Chroma
 #from langchain_community.embeddings import HuggingFaceEmbeddings
 #from langchain_huggingface import HuggingFaceEmbeddings
@@ -22,78 +27,124 @@ import time
 import argparse
 
 
-def main(drive_url, difficulty="standard"):
+def main(source, difficulty="standard"):
+    """
+    source : lien/id Google Drive, chemin d'un dossier local ou d'une archive zip/tar,
+    ou directement une instance de source (voir src/utils/sources.py)
+    """
+    if isinstance(source, str):
+        source = make_source(source)
     
     timings = []
     total_start = time.time()  # début du chronomètre
     nbr_steps = 10
     
-    # 1. S'identifier au drive
+    # 1. S'identifier au drive (ou ouvrir la source locale)
     start = time.time()
 
-    notify_stage("Authentification Google Drive...")
-    service = authenticate_google()
+    notify_stage(f"{source.label}...")
+    source.connect()
 
     duration = time.time() - start
-    timings.append({"Etape": "Authentification Google", "Durée (sec)": duration})
+    timings.append({"Etape": source.label, "Durée (sec)": duration})
     print(f"Avancement : {(1/nbr_steps)*100} %")
 
     # 2. Obtenir les ids des pdf contenu dans le dossier du drive
     start = time.time()
 
     notify_stage("Récupération des PDFs...")
-    drive_ids = get_pdfs_ids(service, drive_url, pdf_only=True)
+    # En mode flux, générateur : le listing se poursuit pendant les téléchargements de l'étape suivante
+    drive_ids = source.list_files(streaming=STREAMING_INGESTION)
     #print(drive_ids)
 
     duration = time.time() - start
-    timings.append({"Etape": "Récupération des IDs des PDF", "Durée (sec)": duration})
+    if STREAMING_INGESTION:
+        # Seule la validation du dossier a eu lieu : le listing est mesuré pendant l'étape suivante (voir ses détails)
+        timings.append({"Etape": "Démarrage du listing des PDF (poursuivi à l'étape 3)", "Durée (sec)": duration,
+                        "Détails": source.stats()})
+    else:
+        timings.append({"Etape": "Récupération des IDs des PDF", "Durée (sec)": duration, "Détails": source.stats()})
     print(f"Avancement : {(2/nbr_steps)*100} %")
 
-    # 3. Récupère tous les textes de tous les pdfs en un seul texte
-    start = time.time()
+    extraction_cache = ExtractionCache()
+    rss_tracker = PeakRssTracker()
 
-    notify_stage("Lecture des textes...")
-    pdfs_data = get_all_pdfs_data(service, drive_ids)
+    if STREAMING_INGESTION:
+        # 3-5. Extraction, normalisation et chunk en flux : les pages sont libérées dès qu'elles sont découpées
+        start = time.time()
 
-    duration = time.time() - start
-    timings.append({"Etape": "Récupération de toutes les données des pdfs en un array", "Durée (sec)": duration})
-    print(f"Avancement : {(3/nbr_steps)*100} %")
+        notify_stage("Lecture et nettoyage des textes...")
+        pdfs_stream = source.iter_pdfs_data(drive_ids, cache=extraction_cache, rss_tracker=rss_tracker)
+        pages = (page for pdf in pdfs_stream for page in pdf)
+        chunks = list(iter_chunks_with_metadata(normalize_pages(pages)))
 
-    # 4. Normalise le texte
-    start = time.time()
+        duration = time.time() - start
+        timings.append({"Etape": "Extraction, normalisation et chunk des données (flux)", "Durée (sec)": duration,
+                        "Détails": ", ".join(filter(None, [extraction_cache.stats(), source.stats(), rss_tracker.stats(top=RSS_REPORT_TOP)]))})
+        print(f"Avancement : {(5/nbr_steps)*100} %")
+    else:
+        # 3. Récupère tous les textes de tous les pdfs en un seul texte
+        start = time.time()
 
-    notify_stage("Nettoyage des textes...")
-    for pdf in pdfs_data:
-        for page in pdf:
-            page["text"] = normalize_text(page['text'])
+        notify_stage("Lecture des textes...")
+        pdfs_data = list(source.iter_pdfs_data(drive_ids, cache=extraction_cache, rss_tracker=rss_tracker))
 
-    duration = time.time() - start
-    timings.append({"Etape": "Normalisation du texte", "Durée (sec)": duration})
-    print(f"Avancement : {(4/nbr_steps)*100} %")
+        duration = time.time() - start
+        timings.append({"Etape": "Récupération de toutes les données des pdfs en un array", "Durée (sec)": duration,
+                        "Détails": ", ".join(filter(None, [extraction_cache.stats(), source.stats(), rss_tracker.stats(top=RSS_REPORT_TOP)]))})
+        print(f"Avancement : {(3/nbr_steps)*100} %")
 
-    # 5. Chunker
-    start = time.time()
+        # 4. Normalise le texte
+        start = time.time()
 
-    chunks = chunk_with_metadata(pdfs_data)
+        notify_stage("Nettoyage des textes...")
+        for pdf in pdfs_data:
+            for page in pdf:
+                page["text"] = normalize_text(page['text'])
 
-    duration = time.time() - start
-    timings.append({"Etape": "Chunk des données", "Durée (sec)": duration})
-    print(f"Avancement : {(5/nbr_steps)*100} %")
+        duration = time.time() - start
+        timings.append({"Etape": "Normalisation du texte", "Durée (sec)": duration})
+        print(f"Avancement : {(4/nbr_steps)*100} %")
+
+        # 5. Chunker
+        start = time.time()
+
+        chunks = chunk_with_metadata(pdfs_data)
+
+        duration = time.time() - start
+        timings.append({"Etape": "Chunk des données", "Durée (sec)": duration})
+        print(f"Avancement : {(5/nbr_steps)*100} %")
     
     # 6. Détection des thèmes
     start = time.time()
     
     notify_stage("Analyse des thèmes...")
-    # Clustering non sémantique, qui n'utilise pas les embeddings
     target_topics = 5 # Nombre cible de topics à définir
-    themes = topic_detection(chunks, n_topics=target_topics)
-
-    # Clustering sémantique qui utilise les embeddings 
-    '''
-    all_texts = [c["text"] for c in chunks]
-    embeddings = get_embeddings(all_texts, EMBEDDING_MODEL_NAME)
-    themes = topic_detection(chunks, embeddings)
-    '''
+    annotation_cache = AnnotationCache()
+    # Modèle d'embeddings partagé par les jobs du processus : chargé au premier job seulement
+    embedding_model = get_embedding_model(EMBEDDING_MODEL_NAME)
+    embeddings = None
+    if CLUSTERING_BACKEND == "semantic" and not INCREMENTAL_TOPICS:
+        # Clustering sémantique : les embeddings sont calculés une seule fois, ici,
+        # puis réutilisés pour la base vectorielle (étape 7)
+        all_texts = [c["text"] for c in chunks]
+        embeddings = get_embeddings(all_texts, EMBEDDING_MODEL_NAME, embedding_model=embedding_model)
+        timings.append({"Etape": "Calcul des embeddings", "Durée (sec)": time.time() - start})
+        # L'étape des thèmes ne compte pas le calcul des embeddings, déjà mesuré
+        start = time.time()
+    # Sans embeddings (par défaut) : clustering non sémantique, sur la matrice TF-IDF
+    if INCREMENTAL_TOPICS:
+        # Seuls les chunks ajoutés depuis le run précédent de cette source sont analysés (et encodés en mode
+        # sémantique ; la base vectorielle relit ensuite leurs vecteurs dans le cache d'embeddings)
+        embed = None
+        if CLUSTERING_BACKEND == "semantic":
+            embed = lambda texts: get_embeddings(texts, EMBEDDING_MODEL_NAME, embedding_model=embedding_model)
+        themes, topics_details = incremental_topic_detection(chunks, source.location, n_topics=target_topics,
+                                                             annotation_cache=annotation_cache, embed=embed)
+    else:
+        themes = topic_detection(chunks, n_topics=target_topics, annotation_cache=annotation_cache, embeddings=embeddings)
+        topics_details = ""
+
     print(themes)
     counts_themes = count_chunks_by_theme(themes)
     print(counts_themes)
@@ -101,16 +152,27 @@ def main(drive_url, difficulty="standard"):
     list_themes= list(counts_themes.keys())
 
     duration = time.time() - start
-    timings.append({"Etape": "Thèmes créés", "Durée (sec)": duration})
+    timings.append({"Etape": "Thèmes créés", "Durée (sec)": duration,
+                    "Détails": ", ".join(filter(None, [annotation_cache.stats(), topics_details]))})
     print(f"Avancement : {(6/nbr_steps)*100} %")
 
     # 7. Stockage Chroma
     start = time.time()
 
-    chroma_db = save_to_chroma(themes, EMBEDDING_MODEL_NAME, CHROMA_DB_PATH)
+    themes_embeddings = None
+    if embeddings is not None:
+        # Vecteurs des chunks conservés (le bruit a été retiré par topic_detection)
+        positions = {c["chunk_id"]: i for i, c in enumerate(chunks)}
+        themes_embeddings = embeddings[[positions[t["chunk_id"]] for t in themes]]
+    chroma_db, chroma_details = save_to_chroma(themes, EMBEDDING_MODEL_NAME, CHROMA_DB_PATH,
+                                               embeddings=themes_embeddings, embedding_model=embedding_model,
+                                               return_stats=True)
+    # Dernière utilisation du cache d'embeddings du job
+    embedding_model.flush()
 
     duration = time.time() - start
-    timings.append({"Etape": "Création et stockage de la VectorDB", "Durée (sec)": duration})
+    timings.append({"Etape": "Création et stockage de la VectorDB", "Durée (sec)": duration,
+                    "Détails": ", ".join([chroma_details, embedding_model.stats()])})
     print(f"Avancement : {(7/nbr_steps)*100} %")
 
 
@@ -157,18 +219,27 @@ def main(drive_url, difficulty="standard"):
     for timing in timings:
         name = timing["Etape"]
         duration = timing["Durée (sec)"]
-        print(name, " : ", round(duration, 2), " sec")
+        details = timing.get("Détails")
+        if details:
+            print(name, " : ", round(duration, 2), " sec", f"({details})")
+        else:
+            print(name, " : ", round(duration, 2), " sec")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Lancer le pipeline à partir d'un lien Google Drive")
     parser.add_argument("--drive_link", required=False, help="Lien Google Drive du dossier à traiter")
+    parser.add_argument("--source", required=False, help="Dossier local ou archive zip/tar de PDFs (sans passer par Drive)")
     # parser.add_argument("--difficulty", default="standard", help="Niveau de difficulté du quiz")
     args = parser.parse_args()
     print("args:", args)
 
-    # Si un lien est fourni, exécution directe (utile en local)
-    if args.drive_link:
+    # Si un lien ou une source est fourni, exécution directe (utile en local)
+    if args.source:
+        print('source:', args.source)
+        main(args.source)
+    elif args.drive_link:
         print('link:', args.drive_link)
-        main(args.drive_link)
+        # Toujours une source Drive : un chemin local ne passe que par --source
+        main(DriveSource(args.drive_link))
     else:
         print("⚠️ Aucun lien fourni — le pipeline est prêt mais en attente d'appel via l'API.")
@@ -1,29 +1,76 @@
 # src/pipeline/server.py
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 import subprocess
+import os
+
+from src.pipeline.config import PIPELINE_EXECUTION, PIPELINE_UPLOADS_ROOT
+from src.pipeline.worker import start_workers, run_in_worker, shutdown_workers
+from src.utils.sources import looks_like_local_path
 
 app = FastAPI(title="Pipeline Service")
 
-def run_pipeline_task(drive_link: str):
+
+@app.on_event("startup")
+def preload_models():
+    """Mode worker : premier processus de travail démarré (et son modèle d'embeddings chargé) dès le lancement."""
+    if PIPELINE_EXECUTION == "worker":
+        start_workers()
+
+
+@app.on_event("shutdown")
+def stop_workers():
+    shutdown_workers()
+
+
+def run_pipeline_task(drive_link: str = None, source_path: str = None):
     """Fonction exécutée en arrière-plan pour lancer le vrai pipeline"""
-    print(f"🚀 Exécution du pipeline pour : {drive_link}", flush=True)
-    subprocess.run(
-        ["python", "-m", "src.pipeline.run", "--drive_link", drive_link],
-        check=True
-    )
+    if source_path:
+        print(f"🚀 Exécution du pipeline pour la source locale : {source_path}", flush=True)
+        args = ["--source", source_path]
+    else:
+        print(f"🚀 Exécution du pipeline pour : {drive_link}", flush=True)
+        args = ["--drive_link", drive_link]
+    if PIPELINE_EXECUTION == "worker":
+        run_in_worker(source_path or drive_link, drive=not source_path)
+    else:
+        subprocess.run(
+            ["python", "-m", "src.pipeline.run", *args],
+            check=True
+        )
     print("✅ Pipeline terminé", flush=True)
 
 
+def resolve_source_path(source_path: str, uploads_root: str = PIPELINE_UPLOADS_ROOT) -> str:
+    """
+    Chemin réel de source_path (relatif : pris dans uploads_root), refusé s'il sort de uploads_root
+    (.., liens symboliques) ou n'existe pas.
+    """
+    root = os.path.realpath(uploads_root)
+    path = os.path.realpath(os.path.join(root, source_path))
+    if os.path.commonpath([root, path]) != root:
+        raise HTTPException(status_code=400, detail=f"source_path hors du dossier d'upload : {source_path}")
+    if not os.path.exists(path):
+        raise HTTPException(status_code=400, detail=f"source_path introuvable : {source_path}")
+    return path
+
+
 @app.post("/execute")
 async def execute_pipeline(req: dict, background_tasks: BackgroundTasks):
     drive_link = req.get("drive_link")
-    if not drive_link:
-        raise HTTPException(status_code=400, detail="drive_link manquant")
+    # Dossier local ou archive zip/tar déjà présent dans PIPELINE_UPLOADS_ROOT (ex : /app/data/uploads/cours.zip)
+    source_path = req.get("source_path")
+    if not drive_link and not source_path:
+        raise HTTPException(status_code=400, detail="drive_link ou source_path manquant")
+    if source_path:
+        source_path = resolve_source_path(source_path)
+    elif looks_like_local_path(drive_link) or os.path.exists(drive_link):
+        # Les chemins locaux passent uniquement par source_path (restreint à PIPELINE_UPLOADS_ROOT)
+        raise HTTPException(status_code=400, detail=f"drive_link n'est pas un lien Google Drive : {drive_link}")
 
-    print(f"📩 Requête reçue pour le lien : {drive_link}", flush=True)
+    print(f"📩 Requête reçue pour : {source_path or drive_link}", flush=True)
 
     # Lancer la tâche en arrière-plan (non bloquante)
-    background_tasks.add_task(run_pipeline_task, drive_link)
+    background_tasks.add_task(run_pipeline_task, drive_link, source_path)
 
     # Répondre immédiatement à l’API
     return {"status": "ok", "message": "Pipeline démarré"}
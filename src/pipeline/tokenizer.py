@@ -10,25 +10,29 @@ def chunk_text(text: str, chunk_size=600, chunk_overlap=50):
     return splitter.split_text(text)
 
 def chunk_with_metadata(all_pdfs_data, chunk_size=600, chunk_overlap=50):
+    pages = (page for pdf in all_pdfs_data for page in pdf)
+    return list(iter_chunks_with_metadata(pages, chunk_size, chunk_overlap))
+
+def iter_chunks_with_metadata(pages, chunk_size=600, chunk_overlap=50):
+    """
+    Découpe un flux de pages en chunks avec leurs métadonnées.
+    Générateur : chaque page est consommée puis libérée, seuls les chunks produits sont conservés par l'appelant.
+    """
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap
     )
 
-    chunks_results = []
     chunk_id = 0
-    for pdf in all_pdfs_data:
-        for page in pdf:
-            chunks = splitter.split_text(page["text"])
-            for chunk in chunks: 
-                chunk_id += 1
+    for page in pages:
+        chunks = splitter.split_text(page["text"])
+        for chunk in chunks: 
+            chunk_id += 1
 
-                chunks_results.append({
-                    "chunk_id": chunk_id,
-                    "file_id": page["file_id"],
-                    "file_name": page["file_name"],
-                    "page": page["page"],
-                    "text": chunk
-                })
-    
-    return chunks_results
\ No newline at end of file
+            yield {
+                "chunk_id": chunk_id,
+                "file_id": page["file_id"],
+                "file_name": page["file_name"],
+                "page": page["page"],
+                "text": chunk
+            }
@@ -0,0 +1,177 @@
+"""
+Affectation incrémentale des thèmes d'une source (dossier Drive, dossier local, archive).
+
+Le clustering complet (topic_detection) est conservé sur disque, une fois par source : filtres de mots,
+vectorizer, projection SVD, centroïdes et thèmes des clusters, et cluster de chaque chunk (clé : hash du texte).
+Au run suivant, seuls les nouveaux chunks sont analysés puis rattachés au thème du centroïde le plus proche ;
+les thèmes existants ne changent pas. Un re-clustering complet n'a lieu que si les nouveaux chunks
+s'écartent trop des thèmes connus (part de bruit ou dérive de distance au-delà des seuils de config.py).
+"""
+import hashlib
+import os
+import tempfile
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import normalize
+
+from src.pipeline.clustering_theme import clean_chunks_strings, cluster_indicator, topic_detection
+from src.pipeline.config import TOPIC_MODEL_DIR, INCREMENTAL_MAX_NOISE_RATIO, INCREMENTAL_MAX_DRIFT, \
+    INCREMENTAL_RADIUS_QUANTILE
+
+# Version du format enregistré : un modèle d'un autre format est ignoré (re-clustering complet)
+TOPIC_MODEL_FORMAT = 1
+
+
+def chunk_key(chunk):
+    return hashlib.sha1(chunk["text"].encode("utf-8")).hexdigest()
+
+
+def model_path(source_key, model_dir=TOPIC_MODEL_DIR):
+    """Fichier du modèle de thèmes d'une source (lien Drive, chemin du dossier ou de l'archive)."""
+    return os.path.join(model_dir, f"{hashlib.sha1(source_key.encode('utf-8')).hexdigest()[:16]}.joblib")
+
+
+class TopicModel:
+    """
+    Résultat d'un clustering complet, réutilisable pour rattacher de nouveaux chunks aux thèmes existants.
+    state : éléments renvoyés par topic_detection(..., return_state=True), chunks : chunks de ce clustering.
+    """
+
+    def __init__(self, state, chunks, radius_quantile=INCREMENTAL_RADIUS_QUANTILE):
+        self.format = TOPIC_MODEL_FORMAT
+        self.backend = state["backend"]
+        self.n_topics = state["n_topics"]
+        self.filters = state["filters"]
+        self.vectorizer = state["vectorizer"]
+        self.transformer = state["transformer"]
+        self.components = state["components"]
+        self.themes = state["themes"]
+
+        # Centroïdes (normalisés) des clusters hors bruit, dans l'espace du clustering
+        labels, X = state["labels"], state["X_norm"]
+        M, cluster_ids = cluster_indicator(labels)
+        not_noise = cluster_ids != -1
+        self.cluster_ids = cluster_ids[not_noise]
+        self.centroids = normalize(np.asarray(M @ X)[not_noise])
+
+        # Distances cosinus des chunks de chaque cluster à son centroïde
+        position = {cluster_id: i for i, cluster_id in enumerate(self.cluster_ids)}
+        members = np.flatnonzero(labels != -1)
+        member_pos = np.array([position[label] for label in labels[members]], dtype=int)
+        distances = 1 - np.einsum("ij,ij->i", X[members], self.centroids[member_pos])
+        # Rayon (quantile des distances) et distance moyenne, référence de la dérive des nouveaux chunks
+        self.radii = np.zeros(len(self.cluster_ids))
+        self.mean_distances = np.zeros(len(self.cluster_ids))
+        for i in range(len(self.cluster_ids)):
+            cluster_distances = distances[member_pos == i]
+            if len(cluster_distances):
+                self.radii[i] = np.quantile(cluster_distances, radius_quantile)
+                self.mean_distances[i] = cluster_distances.mean()
+
+        self.assignments = {chunk_key(chunk): label for chunk, label in zip(chunks, labels)}
+
+    def project(self, chunks, annotation_cache=None, embeddings=None):
+        """Vecteurs normalisés des chunks dans l'espace du clustering (embeddings fournis en mode sémantique)."""
+        if self.backend == "semantic":
+            return normalize(np.asarray(embeddings, dtype=np.float64))
+        # Mêmes filtres de mots et même vocabulaire qu'au clustering : seuls ces chunks sont analysés
+        df = clean_chunks_strings(chunks, annotation_cache=annotation_cache, filters=self.filters)
+        X = self.transformer.transform(self.vectorizer.transform(df["nlp_ready"]))
+        return normalize(np.asarray(X @ self.components.T))
+
+    def assign(self, chunks, annotation_cache=None, embeddings=None):
+        """
+        Rattache chaque chunk au cluster du centroïde le plus proche, ou au bruit (-1)
+        s'il est plus loin que le rayon de ce cluster.
+        Renvoie (labels, dérive de chaque chunk : distance au centroïde le plus proche rapportée
+        à la distance moyenne des chunks de ce cluster, moins 1).
+        """
+        X = self.project(chunks, annotation_cache, embeddings)
+        similarities = X @ self.centroids.T
+        nearest = similarities.argmax(axis=1)
+        distances = 1 - similarities[np.arange(len(nearest)), nearest]
+        labels = np.where(distances <= self.radii[nearest], self.cluster_ids[nearest], -1)
+        reference = self.mean_distances[nearest]
+        drifts = np.divide(distances, reference, out=np.full_like(distances, np.inf), where=reference > 0) - 1
+        return labels, drifts
+
+    def save(self, path):
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        # Fichier temporaire propre à cet appel : deux jobs sur la même source (mode worker)
+        # ne peuvent pas écrire dans le même fichier avant le renommage
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                joblib.dump(self, f)
+            os.replace(tmp_path, path)  # écriture atomique
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def load(path):
+        """Modèle enregistré, ou None s'il est absent, illisible ou d'un autre format."""
+        try:
+            model = joblib.load(path)
+        except Exception:
+            return None
+        return model if getattr(model, "format", None) == TOPIC_MODEL_FORMAT else None
+
+
+def _full_topic_detection(chunks, path, n_topics, annotation_cache, embed, reason):
+    embeddings = embed([chunk["text"] for chunk in chunks]) if embed is not None else None
+    themes, state = topic_detection(chunks, n_topics=n_topics, annotation_cache=annotation_cache,
+                                    embeddings=embeddings, return_state=True)
+    TopicModel(state, chunks).save(path)
+    return themes, f"thèmes : clustering complet ({reason})"
+
+
+def incremental_topic_detection(chunks, source_key, n_topics=3, annotation_cache=None, embed=None,
+                                model_dir=TOPIC_MODEL_DIR):
+    """
+    Equivalent incrémental de topic_detection pour une source déjà traitée : mêmes enregistrements
+    (chunks hors bruit avec leur thème), calculés à partir du modèle du run précédent.
+    embed : fonction textes -> embeddings pour le clustering sémantique (None : clustering lexical).
+    Seuls les chunks qui en ont besoin sont encodés : les nouveaux, ou tous en cas de re-clustering complet.
+    Renvoie (enregistrements, détail du mode utilisé pour les timings).
+    """
+    path = model_path(source_key, model_dir)
+    backend = "lexical" if embed is None else "semantic"
+    model = TopicModel.load(path)
+    if model is None:
+        return _full_topic_detection(chunks, path, n_topics, annotation_cache, embed, "aucun modèle existant")
+    if model.backend != backend or model.n_topics != n_topics:
+        return _full_topic_detection(chunks, path, n_topics, annotation_cache, embed, "paramètres modifiés")
+
+    keys = [chunk_key(chunk) for chunk in chunks]
+    new = [i for i, key in enumerate(keys) if key not in model.assignments]
+    labels = pd.Series([model.assignments.get(key, -1) for key in keys], dtype=object)
+
+    details = "thèmes : inchangés (aucun nouveau chunk)"
+    if new:
+        new_embeddings = embed([chunks[i]["text"] for i in new]) if embed is not None else None
+        new_labels, drifts = model.assign([chunks[i] for i in new], annotation_cache, new_embeddings)
+        noise_ratio = float(np.mean(new_labels == -1))
+        drift = float(np.mean(drifts))
+        print(f"{len(new)} nouveaux chunks : {noise_ratio * 100:.1f} % hors thèmes, dérive {drift:.2f}")
+        if noise_ratio > INCREMENTAL_MAX_NOISE_RATIO or drift > INCREMENTAL_MAX_DRIFT:
+            return _full_topic_detection(chunks, path, n_topics, annotation_cache, embed,
+                                         f"nouveaux chunks trop éloignés des thèmes : bruit {noise_ratio:.0%}, "
+                                         f"dérive {drift:.2f}")
+        labels.iloc[new] = list(new_labels)
+        details = (f"thèmes : affectation incrémentale de {len(new)} nouveaux chunks "
+                   f"(bruit {noise_ratio:.0%}, dérive {drift:.2f})")
+
+    # Le modèle ne garde que les chunks encore présents dans la source
+    model.assignments = dict(zip(keys, labels))
+    model.save(path)
+
+    records = []
+    for chunk, label in zip(chunks, labels):
+        theme = model.themes.get(label, "other")
+        if theme != "other":
+            records.append({**chunk, "theme": theme})
+    return records, details
@@ -0,0 +1,69 @@
+"""
+Processus de travail durables du serveur de pipeline (PIPELINE_EXECUTION = "worker").
+
+Les jobs sont envoyés dans une file (ProcessPoolExecutor) à PIPELINE_WORKERS processus démarrés en "spawn",
+hors du processus uvicorn : un plantage ou un dépassement mémoire ne touche que le worker, remplacé au job
+suivant. Chaque worker charge le modèle d'embeddings à son démarrage et le garde pour tous ses jobs.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from src.pipeline.config import PIPELINE_WORKERS, EMBEDDING_PRELOAD, EMBEDDING_MODEL_NAME
+
+_executor = None
+_lock = threading.Lock()
+
+
+def _init_worker():
+    """Démarrage d'un worker : modèle d'embeddings chargé avant son premier job."""
+    if EMBEDDING_PRELOAD:
+        from src.utils.embedding_models import load_embedding_model
+        load_embedding_model(EMBEDDING_MODEL_NAME)
+
+
+def _run_job(location, drive=False):
+    from src.pipeline.run import main
+    from src.utils.sources import DriveSource
+    # Lien Drive : jamais interprété comme un chemin local (voir server.execute_pipeline)
+    main(DriveSource(location) if drive else location)
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=PIPELINE_WORKERS, initializer=_init_worker,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def start_workers():
+    """Démarre un premier worker (et son modèle) sans attendre de job."""
+    _get_executor().submit(int)
+
+
+def run_in_worker(location, drive=False):
+    """
+    Exécute un job dans un worker et attend sa fin ; un worker mort (plantage, OOM) fait remplacer le pool.
+    drive : location est un lien ou un id Google Drive, sinon un dossier ou une archive déjà validés.
+    """
+    global _executor
+    executor = _get_executor()
+    try:
+        executor.submit(_run_job, location, drive).result()
+    except BrokenProcessPool:
+        with _lock:
+            if _executor is executor:
+                _executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+
+
+def shutdown_workers():
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
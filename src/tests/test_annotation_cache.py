@@ -0,0 +1,53 @@
+"""
+Cache des annotations spaCy (AnnotationCache) : relecture, partage du fichier entre plusieurs instances
+(jobs ou processus concurrents) et éviction bornée, table de chaînes comprise.
+"""
+import sqlite3
+
+from src.utils.annotation_cache import AnnotationCache
+
+VERSION = "fr_test-1.0"
+
+
+def annotation(text):
+    words = text.lower().split()
+    return {"words": words, "lemmas": [w.rstrip("s") for w in words], "pos": ["NOUN"] * len(words),
+            "entities": [w for w in text.split() if w.istitle()]}
+
+
+def test_roundtrip(tmp_path):
+    cache = AnnotationCache(str(tmp_path / "cache.sqlite"))
+    texts = ["Le roi Louis règne", "La reine de France"]
+    assert cache.get_many(texts, VERSION) == [None, None]
+    cache.put_many([(text, annotation(text)) for text in texts], VERSION)
+    assert cache.get_many(texts, VERSION) == [annotation(text) for text in texts]
+    assert cache.get_many(texts, "autre-version") == [None, None]
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_two_writers_on_one_file(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    a, b = AnnotationCache(path), AnnotationCache(path)
+    text_a, text_b = "Les châteaux de Loire", "Les châteaux forts"
+    a.put_many([(text_a, annotation(text_a))], VERSION)
+    # b n'a jamais vu les chaînes ajoutées par a
+    assert b.get_many([text_a], VERSION) == [annotation(text_a)]
+    # chaînes en partie communes ("les", "châteaux") : pas de conflit d'unicité
+    b.put_many([(text_b, annotation(text_b))], VERSION)
+    a.put_many([("Un fort", annotation("Un fort"))], VERSION)
+    assert a.get_many([text_b], VERSION) == [annotation(text_b)]
+    assert b.get_many([text_a, "Un fort"], VERSION) == [annotation(text_a), annotation("Un fort")]
+
+
+def test_eviction_bounds_entries_and_strings(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = AnnotationCache(path, max_bytes=2000)
+    for i in range(50):
+        text = f"Texte {i} " + " ".join(f"mot{i}_{j}" for j in range(10))
+        cache.put_many([(text, annotation(text))], VERSION)
+    assert cache._size() <= 2000
+    # les chaînes des entrées évincées ont été supprimées
+    db = sqlite3.connect(path)
+    assert db.execute("SELECT COUNT(*) FROM strings WHERE value = 'mot0_0'").fetchone()[0] == 0
+    last = "Texte 49 " + " ".join(f"mot49_{j}" for j in range(10))
+    assert cache.get_many([last], VERSION) == [annotation(last)]
@@ -0,0 +1,100 @@
+"""
+Mise à jour incrémentale de la base Chroma (save_to_chroma) sur un dossier local de PDFs :
+ajout des chunks nouveaux ou modifiés, mise à jour des seules métadonnées, suppression des chunks disparus.
+"""
+import hashlib
+
+import pytest
+
+pytest.importorskip("langchain_chroma")
+pytest.importorskip("sentence_transformers")
+
+from langchain_core.embeddings import Embeddings
+
+from src.pipeline.chroma_handler import save_to_chroma, chunk_vector_ids
+from src.pipeline.tokenizer import chunk_with_metadata
+from src.utils.benchmarks.fake_drive import make_pdf_bytes, synthetic_pages
+from src.utils.sources import LocalFolderSource
+
+
+class CountingEmbeddings(Embeddings):
+    """Embeddings déterministes (hash du texte), compte les textes encodés."""
+
+    key = "test-embeddings"
+
+    def __init__(self):
+        self.encoded = 0
+
+    def _vector(self, text):
+        digest = hashlib.sha1(text.encode("utf-8")).digest()
+        return [b / 255 for b in digest[:8]]
+
+    def embed_documents(self, texts):
+        self.encoded += len(texts)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+def write_pdf(path, pages):
+    path.write_bytes(make_pdf_bytes(pages))
+
+
+def load_chunks(folder, theme_by_file):
+    source = LocalFolderSource(str(folder))
+    chunks = chunk_with_metadata(source.iter_pdfs_data(source.list_files()))
+    for chunk in chunks:
+        chunk["theme"] = theme_by_file[chunk["file_name"]]
+    return chunks
+
+
+def test_incremental_add_update_delete(tmp_path):
+    folder, db_path = tmp_path / "cours", str(tmp_path / "chroma")
+    folder.mkdir()
+    write_pdf(folder / "a.pdf", synthetic_pages(2, seed=1))
+    write_pdf(folder / "b.pdf", synthetic_pages(2, seed=2))
+    c_pages = synthetic_pages(2, seed=3)
+    write_pdf(folder / "c.pdf", c_pages)
+
+    model = CountingEmbeddings()
+    chunks = load_chunks(folder, {"a.pdf": "rois", "b.pdf": "guerres", "c.pdf": "villes"})
+    db, details = save_to_chroma(chunks, None, db_path, embedding_model=model, return_stats=True)
+    assert model.encoded == len(chunks)
+    assert details.startswith(f"VectorDB : {len(chunks)} chunks ajoutés, 0 mis à jour")
+
+    # a.pdf supprimé (décale le chunk_id de tous les autres), thème de b.pdf changé, page 2 de c.pdf modifiée
+    (folder / "a.pdf").unlink()
+    write_pdf(folder / "c.pdf", [c_pages[0], "Page modifiée\nLe traité de paix est signé à Paris."])
+    model.encoded = 0
+    new_chunks = load_chunks(folder, {"b.pdf": "batailles", "c.pdf": "villes"})
+    db, details = save_to_chroma(new_chunks, None, db_path, embedding_model=model, return_stats=True)
+
+    old_ids, new_ids = set(chunk_vector_ids(chunks)), chunk_vector_ids(new_chunks)
+    added = [i for i, chunk_id in enumerate(new_ids) if chunk_id not in old_ids]
+    assert added and all(new_chunks[i]["file_name"] == "c.pdf" and new_chunks[i]["page"] == 2 for i in added)
+    n_b = sum(chunk["file_name"] == "b.pdf" for chunk in new_chunks)
+    n_deleted = len(old_ids - set(new_ids))
+    assert model.encoded == len(added)
+    assert details == (f"VectorDB : {len(added)} chunks ajoutés, {n_b} mis à jour, "
+                       f"{len(new_ids) - len(added) - n_b} inchangés, {n_deleted} supprimés (1 fichiers disparus)")
+
+    stored = db.get(include=["metadatas"])
+    assert sorted(stored["ids"]) == sorted(new_ids)
+    themes = {metadata["file_name"]: metadata["theme"] for metadata in stored["metadatas"]}
+    assert themes == {"b.pdf": "batailles", "c.pdf": "villes"}
+
+    # Run identique : rien à encoder ni à réécrire
+    model.encoded = 0
+    _, details = save_to_chroma(new_chunks, None, db_path, embedding_model=model, return_stats=True)
+    assert model.encoded == 0
+    assert details == f"VectorDB : 0 chunks ajoutés, 0 mis à jour, {len(new_ids)} inchangés, 0 supprimés"
+
+    # La vue LangChain interroge la même collection
+    assert db.similarity_search("traité de paix signé à Paris", k=1)[0].metadata["file_name"] in ("b.pdf", "c.pdf")
+
+    # Reconstruction complète : tout est ré-encodé
+    _, details = save_to_chroma(new_chunks, None, db_path, embedding_model=model, incremental=False,
+                                return_stats=True)
+    assert model.encoded == len(new_ids)
+    assert details == f"VectorDB : {len(new_ids)} chunks ajoutés, 0 mis à jour, 0 inchangés, 0 supprimés"
@@ -0,0 +1,121 @@
+"""
+Test d'équivalence de clean_chunks_strings (une analyse par chunk sur le texte nettoyé, NER sur le texte
+d'origine) avec la version d'origine à quatre analyses spaCy complètes, recopiée ici comme référence.
+Ignoré si le modèle spaCy de config.py n'est pas installé.
+"""
+import random
+import re
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from spacy.lang.fr.stop_words import STOP_WORDS
+
+from src.pipeline.config import SPACY_MODEL_NAME
+from src.utils.spacy_models import get_nlp, load_model
+
+EDGE_CASES = [
+    "L'empereur Napoléon, à Paris ; puis à Rome... (en 1804) !",
+    "Aujourd'hui : Louis XIV — « le Roi-Soleil » — règne sur la France.",
+    "Clovis a été baptisé à Reims vers 496/499 ? Oui, d'après Grégoire de Tours.",
+    "a b c d e f",
+    "",
+    "Charlemagne.Charlemagne,Charlemagne ; l'église-abbatiale est grande.",
+]
+
+WORDS = ("roi empire guerre paix siècle bataille château église peuple révolution république commerce paysan "
+         "seigneur ville traité est sont était couronné grand petit l'église d'un à y 3 XIVe 1515 qu'il a").split()
+NAMES = ("Charlemagne", "Clovis", "Napoléon", "Louis", "France", "Paris", "Rome", "Gaule")
+
+
+def synthetic_chunks(n_chunks, seed=0):
+    """Phrases aléatoires dont la ponctuation (fin et milieu de phrase) change le contexte d'analyse."""
+    rng = random.Random(seed)
+
+    def sentence():
+        words = [rng.choice(WORDS) for _ in range(rng.randint(6, 14))]
+        if rng.random() < 0.6:
+            words.insert(rng.randint(0, len(words)), rng.choice(NAMES))
+        if rng.random() < 0.5:
+            words.insert(rng.randint(1, len(words)), rng.choice([",", ";", ":", "(", ")", "—", "«", "»"]))
+        words[0] = words[0].capitalize()
+        return " ".join(words) + rng.choice([".", ",", ";", " !", " ?", "..."])
+
+    return [" ".join(sentence() for _ in range(6)) for _ in range(n_chunks)]
+
+
+def baseline_clean_chunks_strings(chunks, tfidf_threshold=0.008, high_freq_threshold=0.7):
+    """clean_chunks_strings d'origine (sans les affichages) : quatre analyses spaCy complètes par chunk."""
+    nlp = get_nlp(["tok2vec", "morphologizer", "attribute_ruler", "lemmatizer", "ner"])
+    df = pd.DataFrame(chunks)
+    df["string"] = df["text"].astype(str)
+    df["string"] = df["string"].fillna('').apply(lambda x: x.lower())
+    df['string'] = df['string'].apply(lambda text: re.sub(r"\b\w\b", " ", text))
+    df['string'] = df['string'].apply(lambda text: re.sub(r"\s+", " ", text).strip())
+
+    def remove_punctuation(text):
+        doc = nlp(text)
+        return " ".join([token.text for token in doc if not token.is_punct])
+    df['string'] = df['string'].apply(remove_punctuation)
+
+    df['desc_token_temp'] = df['string'].apply(
+        lambda x: [token.lemma_ for token in nlp(x) if token.text.lower() not in STOP_WORDS]
+    )
+    df['nlp_ready_temp'] = df['desc_token_temp'].apply(lambda x: ' '.join(x))
+
+    vectorizer_temp = TfidfVectorizer(stop_words=list(STOP_WORDS))
+    X_temp = vectorizer_temp.fit_transform(df['nlp_ready_temp'])
+    mean_tfidf = X_temp.mean(axis=0).A1
+    low_info_words = [word for word, score in zip(vectorizer_temp.get_feature_names_out(), mean_tfidf)
+                      if score < tfidf_threshold]
+    vec = CountVectorizer()
+    X_count = vec.fit_transform(df['nlp_ready_temp'])
+    doc_freq = np.asarray(X_count.sum(axis=0)).ravel() / X_count.shape[0]
+    words_high_freq = [word for word, freq in zip(vec.get_feature_names_out(), doc_freq) if freq > high_freq_threshold]
+    combined_stopwords = STOP_WORDS.union(set(low_info_words)).union(set(words_high_freq))
+
+    all_entities = []
+    for doc in nlp.pipe(df['text'], batch_size=20):
+        all_entities.extend(ent.text for ent in doc.ents if ent.label_ in ["PER", "GPE", "LOC"])
+
+    def clean_entity(ent):
+        text = ent.strip()
+        if len(text) <= 3 or len(text.split()) >= 10:
+            return None
+        return re.sub(r"\s+", " ", text)
+
+    entity_counts = Counter(clean_entity(ent) for ent in all_entities if clean_entity(ent))
+    proper_nouns_final = {ent.lower() for ent, count in entity_counts.items() if count >= 3}
+
+    df['desc_token'] = df['string'].apply(
+        lambda x: [
+            token.text if token.text.lower() in proper_nouns_final else token.lemma_.lower()
+            for token in nlp(x)
+            if token.is_alpha
+            and token.text.lower() not in combined_stopwords
+            and token.lemma_.lower() not in combined_stopwords
+            and (token.pos_ in {"NOUN", "VERB", "ADJ"} or token.text.lower() in proper_nouns_final)
+        ]
+    )
+    df['nlp_ready'] = df['desc_token'].apply(lambda x: ' '.join(x))
+    return df
+
+
+def test_clean_chunks_strings_matches_baseline():
+    try:
+        load_model(SPACY_MODEL_NAME)
+    except OSError:
+        pytest.skip(f"modèle spaCy {SPACY_MODEL_NAME} absent")
+    from src.pipeline.clustering_theme import clean_chunks_strings
+
+    texts = EDGE_CASES + synthetic_chunks(150)
+    chunks = [{"text": text, "page": i} for i, text in enumerate(texts)]
+
+    expected = baseline_clean_chunks_strings(chunks)
+    df = clean_chunks_strings(chunks)
+    # "string" (intermédiaire, retiré de la sortie) est ici la suite des tokens analysés : seuls les textes
+    # dérivés des lemmes et POS doivent être identiques
+    assert df["nlp_ready_temp"].tolist() == expected["nlp_ready_temp"].tolist()
+    assert df["nlp_ready"].tolist() == expected["nlp_ready"].tolist()
@@ -0,0 +1,121 @@
+"""
+Agrégations par cluster via la matrice indicatrice (cluster_indicator) comparées aux boucles d'origine
+(un masque et un calcul par cluster) : centroïdes et fusion des clusters proches (merge_close_clusters),
+scores TF-IDF moyens par cluster (cluster_tfidf_means) et mots-clés qui en sont tirés (extract_top_keywords,
+normalisation spaCy des mots-clés remplacée par l'identité).
+"""
+import contextlib
+import io
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.cluster import AgglomerativeClustering
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_distances
+
+from src.pipeline import clustering_theme
+from src.pipeline.clustering_theme import merge_close_clusters, cluster_tfidf_means, extract_top_keywords
+
+
+def reference_merge(df, embeddings, cluster_col="hdb_cluster", n_clusters=3):
+    """Fusion d'origine : centroïdes calculés par une boucle de masques sur les clusters."""
+    centroids, cluster_ids = [], []
+    for cluster_id in df[cluster_col].unique():
+        if cluster_id == -1:
+            continue
+        mask = df[cluster_col] == cluster_id
+        centroids.append(embeddings[mask].mean(axis=0))
+        cluster_ids.append(cluster_id)
+    centroids = np.vstack(centroids)
+    labels = AgglomerativeClustering(n_clusters=n_clusters, metric='precomputed', linkage='average') \
+        .fit_predict(cosine_distances(centroids))
+    mapping = {cluster_id: labels[i] for i, cluster_id in enumerate(cluster_ids)}
+    return df[cluster_col].map(lambda c: mapping.get(c, -1)).tolist()
+
+
+def reference_tfidf_means(texts, labels, max_features=500):
+    """Scores d'origine : un TfidfVectorizer ajusté sur les textes de chaque cluster, moyenne des lignes."""
+    means = {}
+    for cluster_id in pd.unique(labels):
+        cluster_texts = [text for text, label in zip(texts, labels) if label == cluster_id]
+        vectorizer = TfidfVectorizer(max_features=max_features)
+        X = vectorizer.fit_transform(cluster_texts)
+        scores = X.mean(axis=0).A1
+        means[cluster_id] = {word: score for word, score in zip(vectorizer.get_feature_names_out(), scores) if score}
+    return means
+
+
+def reference_top_keywords(df, cluster_col="hdb_cluster", text_col="nlp_ready", top_n=3):
+    """Mots-clés d'origine : tri par score décroissant des termes de chaque TfidfVectorizer."""
+    themes = {}
+    for cluster_id in df[cluster_col].unique():
+        if cluster_id == -1:
+            themes[cluster_id] = "other"
+            continue
+        cluster_texts = [t for t in df[df[cluster_col] == cluster_id][text_col] if isinstance(t, str) and t.strip()]
+        try:
+            vectorizer = TfidfVectorizer(max_features=500)
+            X = vectorizer.fit_transform(cluster_texts)
+        except ValueError:
+            themes[cluster_id] = "(empty)"
+            continue
+        scores = X.mean(axis=0).A1
+        words = vectorizer.get_feature_names_out()
+        top_words = [w for w, _ in sorted(zip(words, scores), key=lambda x: x[1], reverse=True)[:top_n]]
+        themes[cluster_id] = ", ".join(sorted(top_words))
+    return themes
+
+
+def random_corpus(seed, n_docs=300, n_clusters=12):
+    rng = random.Random(seed)
+    vocab = [f"mot{i}" for i in range(800)]
+    labels = np.array([rng.randint(-1, n_clusters - 1) for _ in range(n_docs)])
+    texts = [" ".join(rng.choice(vocab[:rng.choice([20, 200, 800])]) for _ in range(rng.randint(1, 40)))
+             for _ in range(n_docs)]
+    return texts, labels
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_merge_close_clusters_matches_loop(seed):
+    _, labels = random_corpus(seed)
+    embeddings = np.random.default_rng(seed).normal(size=(len(labels), 8))
+    df = pd.DataFrame({"hdb_cluster": labels})
+
+    expected = reference_merge(df, embeddings)
+    with contextlib.redirect_stdout(io.StringIO()):
+        merged = merge_close_clusters(df.copy(), embeddings)["merged_cluster"].tolist()
+    assert merged == expected
+    assert all(label == -1 for label, cluster in zip(merged, labels) if cluster == -1)
+
+
+@pytest.mark.parametrize("seed, max_features", [(0, 500), (1, 500), (2, 15), (3, None)])
+def test_cluster_tfidf_means_matches_per_cluster_vectorizer(seed, max_features):
+    texts, labels = random_corpus(seed)
+    scores, words, cluster_ids = cluster_tfidf_means(texts, labels, max_features=max_features)
+    expected = reference_tfidf_means(texts, labels, max_features=max_features)
+
+    # clusters dans l'ordre de première apparition, comme unique()
+    assert list(cluster_ids) == list(expected)
+    for i, cluster_id in enumerate(cluster_ids):
+        row = scores.getrow(i)
+        got = {words[j]: score for j, score in zip(row.indices, row.data)}
+        assert got.keys() == expected[cluster_id].keys()
+        np.testing.assert_allclose([got[w] for w in got], [expected[cluster_id][w] for w in got], rtol=1e-10)
+
+
+def test_cluster_tfidf_means_without_terms():
+    with pytest.raises(ValueError):
+        cluster_tfidf_means(["", " "], [0, 1])
+
+
+def test_extract_top_keywords_matches_loop(monkeypatch):
+    monkeypatch.setattr(clustering_theme, "normalize_keywords_batch", lambda lists: [list(words) for words in lists])
+    texts, labels = random_corpus(4)
+    texts[:3] = ["", "  ", None]
+    df = pd.DataFrame({"hdb_cluster": np.append(labels, 99), "nlp_ready": texts + [""]})
+
+    themes = extract_top_keywords(df)
+    assert themes == reference_top_keywords(df)
+    assert themes[-1] == "other" and themes[99] == "(empty)"
@@ -0,0 +1,76 @@
+"""
+Briques numériques du clustering des thèmes (clustering_theme) :
+- graphe des plus proches voisins (knn_graph) utilisé par HDBSCAN sur les gros corpus : distances exactes
+  des voisins, symétrie, doublons conservés, composantes reliées ; mêmes clusters que HDBSCAN exact
+- choix rapide de la dimension SVD (auto_svd_dim_fast) comparé au choix exact (auto_svd_dim)
+"""
+import contextlib
+import io
+
+import numpy as np
+import pytest
+import scipy.sparse as sp
+from scipy.sparse import csgraph
+from sklearn.metrics import adjusted_rand_score
+from sklearn.preprocessing import normalize
+
+from src.pipeline.clustering_theme import knn_graph, hdbscan_clustering, auto_svd_dim, auto_svd_dim_fast
+from src.utils.benchmarks.bench_svd_dim import synthetic_tfidf, total_variance
+
+
+def blobs(n_per_blob=60, dim=8, spread=0.05, seed=0):
+    """Points normalisés autour de 3 directions orthogonales, avec leur groupe."""
+    rng = np.random.default_rng(seed)
+    X = np.vstack([np.eye(dim)[i] + rng.normal(scale=spread, size=(n_per_blob, dim)) for i in range(3)])
+    return normalize(X), np.repeat(np.arange(3), n_per_blob)
+
+
+def test_knn_graph_distances_and_symmetry():
+    X, _ = blobs()
+    graph = knn_graph(X, n_neighbors=5)
+    assert sp.issparse(graph) and graph.shape == (len(X), len(X))
+    assert (graph != graph.T).nnz == 0
+    assert graph.diagonal().max() == 0
+    # au moins n_neighbors voisins par point, mémoire bornée
+    assert np.diff(graph.indptr).min() >= 5
+    assert graph.nnz <= 2 * 5 * len(X) + 2 * len(X)
+    rows, cols = graph.nonzero()
+    np.testing.assert_allclose(graph[rows, cols].A1, np.linalg.norm(X[rows] - X[cols], axis=1), atol=1e-5)
+
+
+def test_knn_graph_keeps_duplicates_and_links_components():
+    X, groups = blobs(n_per_blob=20, spread=0.01)
+    X = np.vstack([X, X[:1]])  # doublon exact du premier point
+    graph = knn_graph(X, n_neighbors=3)
+    # distance nulle conservée (epsilon) : le doublon reste voisin de son original
+    assert 0 < graph[0, len(X) - 1] < 1e-6
+    # groupes sans voisins communs, reliés par leur distance réelle
+    assert csgraph.connected_components(graph, directed=False)[0] == 1
+    rows, cols = graph.nonzero()
+    original = (rows < len(groups)) & (cols < len(groups))
+    assert (groups[rows[original]] != groups[cols[original]]).any()
+
+
+def test_hdbscan_on_knn_graph_matches_exact():
+    X, groups = blobs()
+    exact = hdbscan_clustering(X)
+    approx = hdbscan_clustering(X, approx_min_chunks=0)
+    assert adjusted_rand_score(groups, exact) == 1
+    assert adjusted_rand_score(exact, approx) == 1
+
+
+@pytest.mark.parametrize("vocab_size, initial_components", [(400, 100), (1500, 16)])
+def test_fast_svd_dim_matches_exact(vocab_size, initial_components):
+    X = synthetic_tfidf(600, vocab_size)
+    with contextlib.redirect_stdout(io.StringIO()):
+        k_exact = auto_svd_dim(X, target_var=0.7)
+        # initial_components=16 : plusieurs extensions de la base avant d'atteindre la variance cible
+        k, lsa, components = auto_svd_dim_fast(X, target_var=0.7, initial_components=initial_components,
+                                               return_svd=True)
+    # une base approchée explique au plus autant que les k premières composantes exactes
+    assert k_exact <= k <= k_exact + max(2, k_exact // 50)
+    assert lsa.shape == (600, k) and components.shape == (k, vocab_size)
+    assert lsa.var(axis=0).sum() / total_variance(X) >= 0.7 - 1e-9
+    np.testing.assert_allclose(components @ components.T, np.eye(k), atol=1e-8)
+    # projection de nouveaux documents (TopicModel) : mêmes coordonnées sur les composantes principales
+    np.testing.assert_allclose(X @ components[:10].T, lsa[:, :10], atol=1e-3)
@@ -0,0 +1,84 @@
+"""
+Listing récursif d'un dossier Drive (iter_folder_tree / get_pdfs_ids) sur le service factice de fake_drive :
+sous-dossiers, raccourcis vers des fichiers et des dossiers, cycles de raccourcis, listing en parallèle.
+"""
+import pytest
+
+from src.utils.benchmarks.fake_drive import FakeDriveService, make_pdf_bytes
+from src.utils.drive_import import get_pdfs_ids, ListingStats, iter_complete_descriptors
+
+ROOT = "dossier_racine"
+
+
+@pytest.fixture
+def drive():
+    """
+    racine : a.pdf, notes.txt, raccourci vers d.pdf (hors arborescence), raccourci vers c.pdf, moyen_age/
+    moyen_age : b.pdf, raccourci vers la racine (cycle), croisades/
+    croisades : c.pdf
+    """
+    drive = FakeDriveService(latency=0)
+    drive.add_folder("dossier_autre", "autre")
+    drive.add_file("pdf_d", "d.pdf", make_pdf_bytes(["d"]), "dossier_autre")
+    drive.add_folder(ROOT, "cours")
+    drive.add_file("pdf_a", "a.pdf", make_pdf_bytes(["a"]), ROOT)
+    drive.add_file("fichier_notes", "notes.txt", b"notes", ROOT, mime="text/plain")
+    drive.add_shortcut("raccourci_d", "d.pdf", "pdf_d", ROOT)
+    drive.add_folder("dossier_moyen_age", "moyen_age", ROOT)
+    drive.add_file("pdf_b", "b.pdf", make_pdf_bytes(["b"]), "dossier_moyen_age")
+    drive.add_shortcut("raccourci_racine", "cours", ROOT, "dossier_moyen_age")
+    drive.add_folder("dossier_croisades", "croisades", "dossier_moyen_age")
+    drive.add_file("pdf_c", "c.pdf", make_pdf_bytes(["c"]), "dossier_croisades")
+    drive.add_shortcut("raccourci_c", "c.pdf", "pdf_c", ROOT)
+    return drive
+
+
+def test_shallow_listing(drive):
+    files = get_pdfs_ids(drive, ROOT, pdf_only=True, recursive=False)
+    # ordre du dossier ; les cibles de raccourcis ont leurs métadonnées complètes
+    assert [f["id"] for f in files] == ["pdf_a", "pdf_d", "pdf_c"]
+    meta = drive.files_meta["pdf_d"]
+    assert files[1] == {"id": "pdf_d", "name": "d.pdf", "size": int(meta["size"]), "mimeType": "application/pdf",
+                        "md5Checksum": meta["md5Checksum"], "modifiedTime": meta["modifiedTime"]}
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_recursive_listing(drive, max_workers):
+    stats = ListingStats()
+    files = get_pdfs_ids(drive, f"https://drive.google.com/drive/folders/{ROOT}", pdf_only=True, recursive=True,
+                         max_workers=max_workers, service_factory=lambda: drive, stats=stats)
+    # ordre BFS, chaque fichier une seule fois malgré les raccourcis, le cycle n'est pas suivi
+    assert [f["id"] for f in files] == ["pdf_a", "pdf_d", "pdf_c", "pdf_b"]
+    assert (stats.folders, stats.files) == (3, 4)
+    # un files.list par dossier et un batch pour les cibles de raccourcis de la racine
+    assert stats.requests == 4
+    assert stats.duration is not None
+    assert str(stats).startswith("listing : 3 dossiers, 4 fichiers, 4 requêtes")
+
+
+def test_listing_without_pdf_filter(drive):
+    files = get_pdfs_ids(drive, ROOT, recursive=True)
+    assert [f["id"] for f in files] == ["pdf_a", "fichier_notes", "pdf_d", "pdf_c", "pdf_b"]
+
+
+def test_rejects_non_folder(drive):
+    with pytest.raises(ValueError, match="n'est pas un dossier"):
+        get_pdfs_ids(drive, "fichier_notes")
+
+
+def test_duplicate_shortcuts_in_one_folder(drive):
+    drive.add_shortcut("raccourci_d_bis", "copie de d.pdf", "pdf_d", ROOT)
+    files = get_pdfs_ids(drive, ROOT, pdf_only=True)
+    assert [f["id"] for f in files] == ["pdf_a", "pdf_d", "pdf_c"]
+    assert files[1]["name"] == "d.pdf"
+
+
+def test_complete_descriptors_in_batches(drive, monkeypatch):
+    monkeypatch.setattr("src.utils.drive_import.BATCH_MAX_SIZE", 2)
+    files = ["pdf_a", {"id": "pdf_b"}, drive.metadata("pdf_c"), "pdf_d", "pdf_a"]
+    start = drive.request_count
+    completed = list(iter_complete_descriptors(drive, iter(files)))
+    assert [f["id"] for f in completed] == ["pdf_a", "pdf_b", "pdf_c", "pdf_d", "pdf_a"]
+    assert [f["name"] for f in completed] == ["a.pdf", "b.pdf", "c.pdf", "d.pdf", "a.pdf"]
+    # un batch pour (a, b), un pour (d, a) : aucune requête par fichier
+    assert drive.request_count - start == 2
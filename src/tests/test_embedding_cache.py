@@ -0,0 +1,68 @@
+"""
+Cache disque des embeddings (EmbeddingCache) : relecture, lectures sans réécriture de l'index,
+éviction LRU et partage du dossier entre plusieurs instances.
+"""
+import os
+
+import numpy as np
+
+from src.utils.embedding_cache import EmbeddingCache
+
+MODEL = "modele-test"
+
+
+def vectors(texts, dim=4):
+    return np.array([[len(text) + j for j in range(dim)] for text in texts], dtype=np.float32)
+
+
+def index_state(cache):
+    st = os.stat(cache._index_path)
+    return st.st_ino, st.st_mtime_ns
+
+
+def test_roundtrip(tmp_path):
+    cache = EmbeddingCache(MODEL, str(tmp_path))
+    texts = ["le roi", "la reine de France"]
+    assert cache.get_many(texts) == [None, None]
+    cache.put_many(texts, vectors(texts))
+    reopened = EmbeddingCache(MODEL, str(tmp_path))
+    np.testing.assert_array_equal(np.vstack(reopened.get_many(texts)), vectors(texts))
+    assert EmbeddingCache("autre-modele", str(tmp_path)).get_many(texts) == [None, None]
+
+
+def test_hits_do_not_rewrite_index(tmp_path):
+    cache = EmbeddingCache(MODEL, str(tmp_path))
+    cache.put_many(["a", "b"], vectors(["a", "b"]))
+    before = index_state(cache)
+    for _ in range(3):
+        cache.get_many(["a", "b"])
+    assert index_state(cache) == before
+    cache.flush()
+    assert index_state(cache) != before
+    # un flush sans nouvelle lecture n'écrit rien
+    after = index_state(cache)
+    cache.flush()
+    assert index_state(cache) == after
+
+
+def test_lru_eviction_keeps_recently_read(tmp_path):
+    # budget de 3 vecteurs de dimension 4 (16 octets chacun)
+    cache = EmbeddingCache(MODEL, str(tmp_path), max_bytes=48)
+    cache.put_many(["a", "bb", "ccc"], vectors(["a", "bb", "ccc"]))
+    cache.get_many(["a"])  # "a" devient le plus récent
+    cache.put_many(["dddd"], vectors(["dddd"]))
+    hits = cache.get_many(["a", "bb", "ccc", "dddd"])
+    assert [vector is not None for vector in hits] == [True, False, True, True]
+    assert os.path.getsize(cache._vectors_path) <= 48
+
+
+def test_two_instances_share_directory(tmp_path):
+    a, b = EmbeddingCache(MODEL, str(tmp_path), max_bytes=48), EmbeddingCache(MODEL, str(tmp_path), max_bytes=48)
+    a.put_many(["a", "bb"], vectors(["a", "bb"]))
+    # b relit l'index écrit par a
+    np.testing.assert_array_equal(b.get_many(["a"])[0], vectors(["a"])[0])
+    # b évince "bb" et réutilise son emplacement : a ne doit pas lire le nouveau vecteur sous l'ancienne clé
+    b.put_many(["ccc", "dddd"], vectors(["ccc", "dddd"]))
+    results = a.get_many(["a", "bb", "ccc", "dddd"])
+    assert results[1] is None
+    np.testing.assert_array_equal(np.vstack([results[0]] + results[2:]), vectors(["a", "ccc", "dddd"]))
@@ -0,0 +1,61 @@
+"""
+Cache disque du texte extrait des PDFs (ExtractionCache) : clé de version, relecture, éviction LRU
+avec taille tenue en mémoire, entrées corrompues.
+"""
+import os
+
+from src.utils.extraction_cache import ExtractionCache
+
+FILE = {"id": "abc", "name": "cours.pdf", "md5Checksum": "0f1e", "modifiedTime": "2024-01-01T00:00:00Z"}
+
+
+def test_key_depends_on_file_version():
+    key = ExtractionCache.key(FILE)
+    assert key == ExtractionCache.key(dict(FILE))
+    assert key != ExtractionCache.key({**FILE, "md5Checksum": "ffff"})
+    assert key != ExtractionCache.key({**FILE, "modifiedTime": "2024-02-01T00:00:00Z"})
+    assert ExtractionCache.key({"id": "abc"}) is None  # version inconnue (cible de raccourci)
+    assert ExtractionCache.key("abc") is None
+
+
+def test_roundtrip(tmp_path):
+    cache = ExtractionCache(str(tmp_path))
+    assert cache.get(FILE) is None and not cache.contains(FILE)
+    cache.put(FILE, "cours.pdf", ["page 1", "page 2"])
+    assert cache.contains(FILE)
+    assert cache.get(FILE) == {"file_name": "cours.pdf", "pages": ["page 1", "page 2"]}
+    assert cache.get({**FILE, "md5Checksum": "ffff"}) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_eviction_scans_only_over_budget(tmp_path, monkeypatch):
+    cache = ExtractionCache(str(tmp_path), max_bytes=1000)
+    scans = []
+    scan = cache._scan
+    monkeypatch.setattr(cache, "_scan", lambda: scans.append(1) or scan())
+    files = [{**FILE, "id": f"f{i}"} for i in range(10)]
+    for i, file in enumerate(files):
+        cache.put(file, file["id"], ["x" * 150])
+        # dates d'accès distinctes et croissantes, f0 la plus ancienne
+        os.utime(cache._path(cache.key(file)), (1000 + i, 1000 + i))
+        if i == 3:
+            cache.get(files[0])  # avant toute éviction : f0 redevient la plus récente
+    sizes = sum(os.path.getsize(os.path.join(tmp_path, name)) for name in os.listdir(tmp_path))
+    assert sizes <= 1000 and cache._total == sizes
+    # premier put + un parcours par dépassement, pas un parcours par écriture
+    assert len(scans) < len(files)
+    # f0, relu après les autres, a survécu aux plus anciennes ; la dernière entrée est présente
+    assert cache.contains(files[0]) and cache.contains(files[-1])
+    assert not cache.contains(files[1])
+
+
+def test_corrupt_entry_is_a_miss_and_removed(tmp_path):
+    cache = ExtractionCache(str(tmp_path))
+    path = cache._path(cache.key(FILE))
+    for content in ('{"file_name": "cours.pdf", "pag', '["pas", "un", "dict"]'):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        assert cache.get(FILE) is None
+        assert not os.path.exists(path)
+    cache.put(FILE, "cours.pdf", ["page 1"])
+    assert cache.get(FILE)["pages"] == ["page 1"]
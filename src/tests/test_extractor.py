@@ -0,0 +1,104 @@
+"""
+Extraction des PDFs Drive (extractor) sur le service factice de fake_drive, et extraction des pages
+d'un PDF synthétique répartie sur plusieurs processus comparée à la lecture séquentielle.
+"""
+import io
+import random
+import threading
+import time
+
+import pytest
+from pypdf import PdfReader
+
+from src.utils import extractor
+from src.utils.benchmarks.fake_drive import build_fake_drive, make_pdf_bytes, synthetic_pages
+from src.utils.extractor import get_all_pdfs_data, iter_all_pdfs_data, extract_text_pypdf_in_memory, \
+    extract_pages_text, buffer_stream
+
+
+def test_bare_ids_resolved_in_batch():
+    drive, _, file_ids = build_fake_drive(5, pages_per_file=2, latency=0)
+    start = drive.request_count
+    records = get_all_pdfs_data(drive, file_ids)
+    assert [pages[0]["file_name"] for pages in records] == [f"cours_{i:03d}.pdf" for i in range(5)]
+    assert [len(pages) for pages in records] == [2] * 5
+    # un téléchargement par fichier et un seul batch de métadonnées, sans files().get par fichier
+    assert drive.request_count - start == 5 + 1
+
+    start = drive.request_count
+    records = list(iter_all_pdfs_data(drive, iter(file_ids), max_workers=3, service_factory=lambda: drive))
+    assert [pages[0]["file_name"] for pages in records] == [f"cours_{i:03d}.pdf" for i in range(5)]
+    assert drive.request_count - start == 5 + 1
+
+
+@pytest.mark.parametrize("max_workers", [2, 4])
+def test_iter_all_pdfs_data_keeps_order_with_bounded_workers(monkeypatch, max_workers):
+    drive, _, file_ids = build_fake_drive(16, pages_per_file=1, latency=0)
+    rng = random.Random(max_workers)
+    drive.file_latency = {file_id: rng.uniform(0, 0.05) for file_id in file_ids}
+
+    lock = threading.Lock()
+    counts = {"active": 0, "max_active": 0, "started": 0, "consumed": 0, "max_ahead": 0}
+
+    def extract(*args, **kwargs):
+        with lock:
+            counts["active"] += 1
+            counts["started"] += 1
+            counts["max_active"] = max(counts["max_active"], counts["active"])
+            # PDFs lus ou en attente de consommation (hors celui en cours de traitement par le consommateur)
+            counts["max_ahead"] = max(counts["max_ahead"], counts["started"] - counts["consumed"])
+        try:
+            return extract_text_pypdf_in_memory(*args, **kwargs)
+        finally:
+            with lock:
+                counts["active"] -= 1
+
+    monkeypatch.setattr(extractor, "extract_text_pypdf_in_memory", extract)
+    names = []
+    for pages in iter_all_pdfs_data(drive, iter(file_ids), max_workers=max_workers, service_factory=lambda: drive):
+        with lock:
+            counts["consumed"] += 1
+        names.append(pages[0]["file_name"])
+        time.sleep(rng.uniform(0, 0.02))  # consommateur lent par moments
+
+    assert names == [f"cours_{i:03d}.pdf" for i in range(16)]
+    assert counts["max_active"] == max_workers
+    assert counts["max_ahead"] <= max_workers
+
+
+@pytest.fixture
+def process_extraction(monkeypatch):
+    """Extraction multiprocessus dès 4 pages avec 2 workers ; pool arrêté à la fin du test."""
+    monkeypatch.setattr(extractor, "EXTRACTION_PROCESS_WORKERS", 2)
+    monkeypatch.setattr(extractor, "EXTRACTION_PROCESS_MIN_PAGES", 4)
+    yield
+    if extractor._process_pool is not None:
+        extractor._process_pool.shutdown()
+        extractor._process_pool = None
+
+
+def serial_pages(data):
+    return [page.extract_text() or "" for page in PdfReader(io.BytesIO(data)).pages]
+
+
+@pytest.mark.parametrize("n_pages", [4, 9, 23])
+def test_multiprocess_extraction_matches_serial(process_extraction, monkeypatch, n_pages):
+    data = make_pdf_bytes(synthetic_pages(n_pages, seed=n_pages))
+    expected = serial_pages(data)
+    assert len(expected) == n_pages and len(set(expected)) == n_pages
+
+    calls = []
+    multiprocess = extractor.extract_pages_text_multiprocess
+    monkeypatch.setattr(extractor, "extract_pages_text_multiprocess",
+                        lambda *args: calls.append(args[1:]) or multiprocess(*args))
+    # BytesIO (fichier temporaire écrit pour les workers) et PDF déjà sur disque (MappedPdf)
+    assert extract_pages_text(io.BytesIO(data)) == expected
+    monkeypatch.setattr(extractor, "DOWNLOAD_SPILL_THRESHOLD", 0)
+    assert extract_pages_text(buffer_stream(io.BytesIO(data), len(data))) == expected
+    assert calls == [(n_pages, 2), (n_pages, 2)]
+
+
+def test_small_pdf_stays_serial(process_extraction, monkeypatch):
+    data = make_pdf_bytes(synthetic_pages(3))
+    monkeypatch.setattr(extractor, "extract_pages_text_multiprocess", None)
+    assert extract_pages_text(io.BytesIO(data)) == serial_pages(data)
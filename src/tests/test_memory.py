@@ -0,0 +1,28 @@
+"""
+Relevé de la RSS par fichier (PeakRssTracker) : le pic atteint au milieu du traitement d'un fichier
+(téléchargement, lecture des pages) est relevé, même s'il est libéré avant la fin du traitement.
+"""
+import time
+
+from src.utils.memory import PeakRssTracker, current_rss_mb
+
+
+def test_peak_inside_processing_is_sampled():
+    tracker = PeakRssTracker(interval=0.01)
+    baseline = current_rss_mb()
+    with tracker.track("f1", "gros.pdf"):
+        buffer = bytearray(64 * 2**20)  # buffer de téléchargement, libéré avant la fin du traitement
+        buffer[::4096] = b"x" * len(buffer[::4096])
+        time.sleep(0.2)
+        del buffer
+        time.sleep(0.05)
+    with tracker.track("f2", "petit.pdf"):
+        time.sleep(0.05)
+
+    assert tracker.peaks["f1"] >= baseline + 48
+    assert tracker.peaks["f2"] < tracker.peaks["f1"] - 32
+    # le thread d'échantillonnage s'arrête quand plus aucun fichier n'est suivi
+    time.sleep(0.05)
+    assert tracker._sampler is None
+    assert tracker.stats(top=1) == f"RSS du processus max pendant le traitement du fichier : gros.pdf {tracker.peaks['f1']:.0f} Mo"
+    assert "petit.pdf" in tracker.stats(top=None)
@@ -0,0 +1,68 @@
+"""
+Test d'équivalence du moteur de normalisation : normalize_text (motifs précompilés, table de traduction)
+doit produire exactement la même sortie que l'ancienne implémentation normalize_text_reference.
+"""
+import os
+import random
+
+import pytest
+
+from src.utils.normalizer import normalize_text, normalize_text_reference, normalize_texts
+
+SAMPLE_PDF = os.path.join(os.path.dirname(__file__), "..", "..", "notebooks", "Histoire_CM1.pdf")
+
+EDGE_CASES = [
+    "",
+    "   ",
+    "Le roi roi roi Louis XIV règne.",
+    "Voir page 12 et page3 ; Page 4 reste.",
+    "Quoi ?!! Vraiment... oui,, non;; fin::",
+    "L’église “Notre-Dame” et l‘abbaye",
+    "cœur sœur Œuvre ex æquo Æsope",
+    "ﬁn de la ﬂeur, ﬁ nal",
+    "© ® ™ ✓ § ¶ ∆ ∞ ≈ ≠ ± × ÷",
+    "Texte <b>gras</b> et <a href='x'>lien</a>",
+    "Citation [...] puis [ ... ] et [..]",
+    "/uni00E9/uni00e8 glyphes /uniZZZZ",
+    "Site http://ex.fr/a?b=1 et www.ex.fr, contact @prof !",
+    "mot coupé en fin de li-\ngne\net saut\tde ligne",
+    "[<a>...]",
+    "<x /uni0041>",
+    "emoji 🏰 et chinois 城堡 et arabe قلعة",
+    "2 2 2 siècles, le le roi",
+]
+
+FUZZ_PIECES = ["roi", "roi ", "page", "page ", " 12", "3", "<", ">", "[", "]", "...", ".", "!", "?", ",",
+               "/uni00E9", "/uni", "http", "www", "@", "œ", "æ", "’", "“", "\n", "-", "\t", " ",
+               "ﬁ", "©", "×", " ", "  ", "é", "Œ", "a", "b", "🏰"]
+
+
+def _fuzz_texts(n, seed=0):
+    rng = random.Random(seed)
+    return ["".join(rng.choice(FUZZ_PIECES) for _ in range(rng.randint(0, 40))) for _ in range(n)]
+
+
+@pytest.mark.parametrize("text", EDGE_CASES)
+def test_normalize_text_matches_reference(text):
+    assert normalize_text(text) == normalize_text_reference(text)
+
+
+def test_normalize_text_matches_reference_fuzz():
+    for text in _fuzz_texts(5000):
+        assert normalize_text(text) == normalize_text_reference(text), repr(text)
+
+
+def test_normalize_texts_batch():
+    texts = EDGE_CASES + _fuzz_texts(200, seed=1)
+    assert normalize_texts(texts) == [normalize_text_reference(text) for text in texts]
+
+
+def test_normalize_text_matches_reference_on_sample_pdf():
+    pytest.importorskip("pypdf")
+    if not os.path.exists(SAMPLE_PDF):
+        pytest.skip("PDF d'exemple absent")
+    from pypdf import PdfReader
+
+    with PdfReader(SAMPLE_PDF) as reader:
+        pages = [page.extract_text() or "" for page in reader.pages]
+    assert normalize_texts(pages) == [normalize_text_reference(page) for page in pages]
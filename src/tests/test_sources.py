@@ -0,0 +1,115 @@
+"""
+Choix de la source du pipeline (make_source), restriction des chemins acceptés par le serveur
+et lecture des archives zip/tar (mêmes pages qu'un dossier local).
+"""
+import os
+import tarfile
+import zipfile
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from src.pipeline import server
+from src.pipeline.server import resolve_source_path
+from src.utils.benchmarks.fake_drive import make_pdf_bytes, synthetic_pages
+from src.utils.extraction_cache import ExtractionCache
+from src.utils.sources import make_source, LocalFolderSource, DriveSource, ArchiveSource
+
+
+def test_make_source_local_and_drive(tmp_path):
+    assert isinstance(make_source(str(tmp_path)), LocalFolderSource)
+    assert isinstance(make_source("https://drive.google.com/drive/folders/1P_v9V_eVLRps3nxCO4Fn"), DriveSource)
+    assert isinstance(make_source("1P_v9V_eVLRps3nxCO4Fn-ui0-WdY-mmz"), DriveSource)
+
+
+@pytest.mark.parametrize("location", ["data/cours_absent/", "./cours", "cours_absent.zip"])
+def test_make_source_missing_local_path(location):
+    with pytest.raises(ValueError, match="n'existe pas"):
+        make_source(location)
+
+
+def test_resolve_source_path(tmp_path):
+    root = tmp_path / "uploads"
+    root.mkdir()
+    (root / "cours.zip").write_bytes(b"")
+    (tmp_path / "secret").mkdir()
+    os.symlink(tmp_path / "secret", root / "lien")
+
+    assert resolve_source_path("cours.zip", str(root)) == os.path.realpath(root / "cours.zip")
+    assert resolve_source_path(str(root / "cours.zip"), str(root)) == os.path.realpath(root / "cours.zip")
+    for outside in ("../secret", str(tmp_path / "secret"), "lien", "/etc"):
+        with pytest.raises(HTTPException, match="hors du dossier"):
+            resolve_source_path(outside, str(root))
+    with pytest.raises(HTTPException, match="introuvable"):
+        resolve_source_path("absent.zip", str(root))
+
+
+@pytest.mark.parametrize("drive_link", ["/app", "/etc/cours.tar", "./data", "cours.zip", "~/cours"])
+def test_execute_rejects_local_path_as_drive_link(monkeypatch, drive_link):
+    jobs = []
+    monkeypatch.setattr(server, "run_pipeline_task", lambda *args: jobs.append(args))
+    response = TestClient(server.app).post("/execute", json={"drive_link": drive_link})
+    assert response.status_code == 400
+    assert "pas un lien Google Drive" in response.json()["detail"]
+    assert jobs == []
+
+
+def test_drive_link_always_runs_as_drive_source(monkeypatch):
+    link = "https://drive.google.com/drive/folders/1P_v9V_eVLRps3nxCO4Fn"
+    jobs = []
+    monkeypatch.setattr(server, "PIPELINE_EXECUTION", "worker")
+    monkeypatch.setattr(server, "run_in_worker", lambda location, drive=False: jobs.append((location, drive)))
+    assert TestClient(server.app).post("/execute", json={"drive_link": link}).status_code == 200
+    assert jobs == [(link, True)]
+
+
+def make_course_folder(folder):
+    """Dossier de cours : PDFs à plusieurs niveaux et un fichier non PDF, ignoré."""
+    (folder / "moyen_age").mkdir(parents=True)
+    (folder / "a.pdf").write_bytes(make_pdf_bytes(synthetic_pages(2, seed=1)))
+    (folder / "moyen_age" / "b.pdf").write_bytes(make_pdf_bytes(synthetic_pages(3, seed=2)))
+    (folder / "moyen_age" / "notes.txt").write_text("pas un PDF")
+
+
+def pages(source, files, cache=None):
+    return [(r["file_name"], r["page"], r["text"]) for records in source.iter_pdfs_data(files, cache) for r in records]
+
+
+@pytest.mark.parametrize("archive_name", ["cours.zip", "cours.tar", "cours.tar.gz"])
+def test_archive_matches_local_folder(tmp_path, archive_name):
+    folder = tmp_path / "cours"
+    make_course_folder(folder)
+    local = LocalFolderSource(str(folder))
+    expected = pages(local, local.list_files())
+
+    archive_path = tmp_path / archive_name
+    if archive_name.endswith(".zip"):
+        with zipfile.ZipFile(archive_path, "w") as zf:
+            for path in sorted(folder.rglob("*")):
+                zf.write(path, path.relative_to(folder))
+    else:
+        with tarfile.open(archive_path, "w:gz" if archive_name.endswith(".gz") else "w") as tf:
+            tf.add(folder, arcname=".")
+    source = make_source(str(archive_path))
+    assert isinstance(source, ArchiveSource)
+    source.connect()
+    files = source.list_files()
+    assert sorted(f["name"] for f in files) == ["a.pdf", "b.pdf"]
+    assert all(f["id"].startswith(f"{archive_name}!") for f in files)
+    assert sorted(pages(source, files)) == sorted(expected)
+
+    # Deuxième lecture : les membres en cache ne sont pas relus, le résultat ne change pas
+    cache = ExtractionCache(str(tmp_path / "extraction"))
+    pages(source, files, cache)
+    read_members, iter_members = [], source._iter_members
+    source._iter_members = lambda wanted: read_members.extend(wanted) or iter_members(wanted)
+    assert sorted(pages(source, files, cache)) == sorted(expected)
+    assert read_members == []
+
+
+def test_archive_rejects_other_files(tmp_path):
+    path = tmp_path / "cours.zip"
+    path.write_bytes(b"ni zip ni tar")
+    with pytest.raises(ValueError, match="ni une archive zip ni une archive tar"):
+        ArchiveSource(str(path)).connect()
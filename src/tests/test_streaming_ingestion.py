@@ -0,0 +1,53 @@
+"""
+Ingestion en flux (STREAMING_INGESTION) : extraction, normalisation et chunking enchaînés par générateurs
+(normalize_pages, iter_chunks_with_metadata) comparés au mode liste (normalize_text sur toutes les pages,
+puis chunk_with_metadata), tels qu'enchaînés par run.main, sur un dossier local de PDFs synthétiques.
+"""
+import pytest
+
+from src.pipeline.tokenizer import chunk_with_metadata, iter_chunks_with_metadata
+from src.utils.benchmarks.fake_drive import make_pdf_bytes, synthetic_pages
+from src.utils.normalizer import normalize_text, normalize_pages
+from src.utils.sources import LocalFolderSource
+
+
+@pytest.fixture
+def source(tmp_path):
+    """Dossier de 4 PDFs (dont un sous-dossier, une page vide et des caractères à normaliser)."""
+    (tmp_path / "chapitre2").mkdir()
+    documents = {
+        "a_intro.pdf": synthetic_pages(3, seed=1),
+        "b_rois.pdf": synthetic_pages(6, seed=2, lines_per_page=60),
+        "chapitre2/c_guerres.pdf": synthetic_pages(2, seed=3) + [""],
+        "d_notes.pdf": ["Voir   http://exemple.fr  page 2 [...] <b>fin</b> ; cœur et æquo", "Dernière   page"],
+    }
+    for name, pages in documents.items():
+        (tmp_path / name).write_bytes(make_pdf_bytes(pages))
+    source = LocalFolderSource(str(tmp_path))
+    source.connect()
+    return source
+
+
+def streaming_chunks(source):
+    pdfs_stream = source.iter_pdfs_data(source.list_files(streaming=True))
+    pages = (page for pdf in pdfs_stream for page in pdf)
+    return list(iter_chunks_with_metadata(normalize_pages(pages)))
+
+
+def list_chunks(source):
+    pdfs_data = list(source.iter_pdfs_data(source.list_files()))
+    for pdf in pdfs_data:
+        for page in pdf:
+            page["text"] = normalize_text(page["text"])
+    return chunk_with_metadata(pdfs_data)
+
+
+def test_streaming_matches_list_mode(source):
+    expected = list_chunks(source)
+    chunks = streaming_chunks(source)
+    assert chunks == expected
+
+    assert [chunk["chunk_id"] for chunk in chunks] == list(range(1, len(chunks) + 1))
+    assert len({chunk["file_name"] for chunk in chunks}) == 4
+    # plusieurs chunks par page pour les pages longues
+    assert len(chunks) > sum(1 for _ in source.list_files()) * 3
@@ -0,0 +1,88 @@
+"""
+Etiquetage des thèmes par TF-IDF par classe (class_tfidf, top_terms, label_clusters), sans spaCy : la normalisation
+des mots-clés (normalize_keywords_batch) est remplacée par l'identité.
+"""
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+from src.pipeline import clustering_theme
+from src.pipeline.clustering_theme import class_tfidf, top_terms, label_clusters
+
+VOCABULARY = np.array(["roi", "guerre", "église", "siècle", "vide"])
+
+# documents x termes ; "siècle" est fréquent partout, les autres termes sont propres à un cluster
+COUNTS = sp.csr_matrix(np.array([
+    [3, 0, 0, 4, 0],  # cluster 0
+    [2, 0, 0, 3, 0],  # cluster 0
+    [0, 2, 0, 4, 0],  # cluster 1
+    [0, 0, 5, 5, 0],  # bruit
+    [0, 1, 0, 2, 0],  # cluster 1
+]))
+LABELS = [0, 0, 1, -1, 1]
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    """Normalisation identité ; listes de mots-clés reçues à chaque appel enregistrées."""
+    calls = []
+
+    def normalize_keywords_batch(keyword_lists):
+        calls.append([list(words) for words in keyword_lists])
+        return [list(words) for words in keyword_lists]
+
+    monkeypatch.setattr(clustering_theme, "normalize_keywords_batch", normalize_keywords_batch)
+    return calls
+
+
+def test_class_tfidf_formula_without_noise():
+    scores, cluster_ids = class_tfidf(COUNTS, LABELS)
+    assert cluster_ids.tolist() == [0, 1]
+
+    class_counts = np.array([[5, 0, 0, 7, 0], [0, 3, 0, 6, 0]], dtype=float)
+    words = class_counts.sum(axis=1, keepdims=True)
+    idf = np.log(1 + words.mean() / np.maximum(class_counts.sum(axis=0), 1))
+    np.testing.assert_allclose(scores, class_counts / words * idf)
+    # le bruit n'entre ni dans les comptes ni dans l'idf : "église" (bruit seulement) a un score nul
+    assert (scores[:, 2] == 0).all()
+
+
+def test_class_tfidf_ranks_distinctive_terms_first():
+    scores, _ = class_tfidf(COUNTS, LABELS)
+    # "siècle" est plus fréquent que "roi" et "guerre" dans leur cluster, mais présent dans tous les clusters
+    assert top_terms(scores, top_n=2) == [[0, 3], [1, 3]]
+
+
+def test_class_tfidf_only_noise():
+    scores, cluster_ids = class_tfidf(COUNTS, [-1] * 5)
+    assert scores.shape == (0, len(VOCABULARY)) and len(cluster_ids) == 0
+
+
+def test_top_terms_ties_and_zero_scores():
+    scores = np.array([
+        [0.5, 0.2, 0.5, 0.0, 0.5],  # ex aequo : ordre des colonnes
+        [0.0, 0.0, 0.3, 0.0, 0.0],  # un seul score non nul
+        [0.0, 0.0, 0.0, 0.0, 0.0],  # ligne vide
+    ])
+    assert top_terms(scores, top_n=2) == [[0, 2], [2], []]
+    assert top_terms(scores, top_n=4) == [[0, 2, 4, 1], [2], []]
+    # top_n supérieur au nombre de colonnes
+    assert top_terms(scores, top_n=10) == [[0, 2, 4, 1], [2], []]
+    assert top_terms(scores, top_n=0) == [[], [], []]
+    assert top_terms(np.zeros((2, 0)), top_n=3) == [[], []]
+
+
+def test_label_clusters(batches):
+    # cluster 2 : documents sans aucun terme ; clusters dans l'ordre de première apparition
+    counts = sp.vstack([COUNTS, sp.csr_matrix((1, len(VOCABULARY)), dtype=COUNTS.dtype)]).tocsr()
+    labels = [1, 1, 0, -1, 0, 2]
+    themes = label_clusters(counts, VOCABULARY, labels, top_n=2)
+
+    assert list(themes) == [1, 0, -1, 2]
+    assert themes == {1: "roi, siècle", 0: "guerre, siècle", -1: "other", 2: "(empty)"}
+    # une seule normalisation groupée, sans les clusters vides
+    assert len(batches) == 1 and len(batches[0]) == 2
+
+
+def test_label_clusters_only_noise(batches):
+    assert label_clusters(COUNTS, VOCABULARY, [-1] * 5) == {-1: "other"}
@@ -0,0 +1,152 @@
+"""
+Thèmes incrémentaux (topic_model) en mode sémantique, sans modèle d'embeddings ni spaCy : les embeddings
+sont des vecteurs synthétiques groupés autour de 3 directions, et le clustering complet (topic_detection)
+est remplacé par un rattachement à la direction la plus proche.
+"""
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from sklearn.preprocessing import normalize
+
+from src.pipeline import topic_model
+from src.pipeline.topic_model import TopicModel, incremental_topic_detection, model_path
+
+DIM = 16
+THEMES = {0: "rois", 1: "guerres", 2: "religion"}
+SOURCE = "data/uploads/cours.zip"
+
+
+def embedding(text):
+    """Vecteur du texte "<direction> <n>" : la direction (0 à DIM - 1) plus un bruit tiré du texte."""
+    direction = int(text.split()[0])
+    rng = np.random.default_rng(int(hashlib.sha1(text.encode()).hexdigest()[:8], 16))
+    vector = rng.normal(scale=0.1, size=DIM)
+    vector[direction] += 1
+    return vector
+
+
+def make_chunks(direction, start, count):
+    return [{"text": f"{direction} {i}", "source": "cours.pdf", "page": i} for i in range(start, start + count)]
+
+
+class RecordingEmbed:
+    """Fonction embed de incremental_topic_detection qui garde les textes encodés à chaque appel."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.vstack([embedding(text) for text in texts])
+
+
+@pytest.fixture
+def full_clustering(monkeypatch):
+    """Clustering complet factice : chaque chunk va au thème de sa direction ; appels enregistrés."""
+    calls = []
+
+    def topic_detection(chunks, n_topics=3, annotation_cache=None, embeddings=None, return_state=False):
+        calls.append(len(chunks))
+        X_norm = normalize(np.asarray(embeddings, dtype=np.float64))
+        labels = X_norm[:, :len(THEMES)].argmax(axis=1)
+        state = {"backend": "semantic", "n_topics": n_topics, "filters": None, "vectorizer": None,
+                 "transformer": None, "components": None, "X_norm": X_norm, "labels": labels, "themes": THEMES}
+        records = [{**chunk, "theme": THEMES[label]} for chunk, label in zip(chunks, labels)]
+        return records, state
+
+    monkeypatch.setattr(topic_model, "topic_detection", topic_detection)
+    return calls
+
+
+def base_chunks():
+    return make_chunks(0, 0, 20) + make_chunks(1, 0, 20) + make_chunks(2, 0, 20)
+
+
+def test_save_load_roundtrip(tmp_path, full_clustering):
+    chunks = base_chunks()
+    _, state = topic_model.topic_detection(chunks, embeddings=RecordingEmbed()([c["text"] for c in chunks]))
+    model = TopicModel(state, chunks)
+    path = model_path(SOURCE, str(tmp_path))
+    model.save(path)
+
+    loaded = TopicModel.load(path)
+    assert loaded.backend == "semantic" and loaded.themes == THEMES
+    assert loaded.assignments == model.assignments
+    np.testing.assert_allclose(loaded.centroids, model.centroids)
+    np.testing.assert_allclose(loaded.radii, model.radii)
+
+    loaded.format = topic_model.TOPIC_MODEL_FORMAT - 1
+    loaded.save(path)
+    assert TopicModel.load(path) is None
+    assert TopicModel.load(str(tmp_path / "absent.joblib")) is None
+
+
+def test_new_chunks_assigned_without_reclustering(tmp_path, full_clustering):
+    chunks = base_chunks()
+    embed = RecordingEmbed()
+    records, details = incremental_topic_detection(chunks, SOURCE, embed=embed, model_dir=str(tmp_path))
+    assert "aucun modèle existant" in details
+    assert embed.calls == [[chunk["text"] for chunk in chunks]]
+
+    new = make_chunks(0, 20, 2) + make_chunks(2, 20, 2)
+    embed = RecordingEmbed()
+    records, details = incremental_topic_detection(chunks[5:] + new, SOURCE, embed=embed, model_dir=str(tmp_path))
+    assert "affectation incrémentale de 4 nouveaux chunks" in details
+    assert full_clustering == [len(chunks)]
+    # seuls les nouveaux chunks sont encodés
+    assert embed.calls == [[chunk["text"] for chunk in new]]
+    themes = {record["text"]: record["theme"] for record in records}
+    assert [themes.get(chunk["text"]) for chunk in new] == ["rois", "rois", "religion", "religion"]
+    assert chunks[0]["text"] not in themes
+
+    # chunks déjà connus : rien à encoder, le modèle ne garde que les chunks encore présents
+    embed = RecordingEmbed()
+    _, details = incremental_topic_detection(chunks[5:] + new, SOURCE, embed=embed, model_dir=str(tmp_path))
+    assert details == "thèmes : inchangés (aucun nouveau chunk)"
+    assert embed.calls == []
+    model = TopicModel.load(model_path(SOURCE, str(tmp_path)))
+    assert len(model.assignments) == len(chunks) - 5 + len(new)
+
+
+@pytest.mark.parametrize("max_noise, max_drift, reason", [(0.3, float("inf"), "bruit 100%"),
+                                                          (1.0, 0.3, "dérive")])
+def test_far_chunks_trigger_full_reclustering(tmp_path, monkeypatch, full_clustering, max_noise, max_drift, reason):
+    monkeypatch.setattr(topic_model, "INCREMENTAL_MAX_NOISE_RATIO", max_noise)
+    monkeypatch.setattr(topic_model, "INCREMENTAL_MAX_DRIFT", max_drift)
+    chunks = base_chunks()
+    incremental_topic_detection(chunks, SOURCE, embed=RecordingEmbed(), model_dir=str(tmp_path))
+
+    # nouveaux chunks sur une direction inconnue des thèmes existants
+    new = make_chunks(5, 0, 10)
+    embed = RecordingEmbed()
+    _, details = incremental_topic_detection(chunks + new, SOURCE, embed=embed, model_dir=str(tmp_path))
+    assert "clustering complet (nouveaux chunks trop éloignés" in details and reason in details
+    assert full_clustering == [len(chunks), len(chunks) + len(new)]
+    # nouveaux chunks encodés pour l'affectation, puis tous les chunks pour le re-clustering
+    assert embed.calls == [[chunk["text"] for chunk in new], [chunk["text"] for chunk in chunks + new]]
+    model = TopicModel.load(model_path(SOURCE, str(tmp_path)))
+    assert len(model.assignments) == len(chunks) + len(new)
+
+
+def test_changed_parameters_trigger_full_reclustering(tmp_path, full_clustering):
+    chunks = base_chunks()
+    incremental_topic_detection(chunks, SOURCE, embed=RecordingEmbed(), model_dir=str(tmp_path))
+    _, details = incremental_topic_detection(chunks, SOURCE, n_topics=4, embed=RecordingEmbed(),
+                                             model_dir=str(tmp_path))
+    assert "paramètres modifiés" in details
+    assert full_clustering == [len(chunks), len(chunks)]
+
+
+def test_concurrent_saves_leave_a_complete_model(tmp_path, full_clustering):
+    chunks = base_chunks()
+    _, state = topic_model.topic_detection(chunks, embeddings=RecordingEmbed()([c["text"] for c in chunks]))
+    models = [TopicModel(state, chunks[:n]) for n in (20, 40, 60)]
+    path = model_path(SOURCE, str(tmp_path))
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        list(executor.map(lambda model: [model.save(path) for _ in range(10)], models))
+    assert len(TopicModel.load(path).assignments) in (20, 40, 60)
+    # aucun fichier temporaire laissé dans le dossier
+    assert [p.name for p in tmp_path.iterdir()] == [os.path.basename(path)]
@@ -0,0 +1,235 @@
+import os
+import time
+import hashlib
+import sqlite3
+import numpy as np
+from src.pipeline.config import ANNOTATION_CACHE_PATH, ANNOTATION_CACHE_MAX_BYTES
+
+# À incrémenter si le contenu des annotations (annotate_doc) change : les anciennes entrées deviennent invalides
+ANNOTATION_FORMAT = 3
+
+# Version du schéma SQLite (PRAGMA user_version) : une base d'un autre schéma est vidée puis recréée
+ANNOTATION_SCHEMA = 2
+
+# Nombre max de paramètres par requête SQL (limite SQLite)
+_SQL_BATCH = 500
+
+# Attente max (secondes) du verrou de la base quand un autre processus y écrit
+_BUSY_TIMEOUT = 30
+
+# L'éviction redescend à cette part du budget : elle ne se relance pas à chaque écriture
+_EVICT_TARGET = 0.9
+
+
+class AnnotationCache:
+    """
+    Cache disque des annotations spaCy des chunks (mots, lemmes, POS, entités), dans une base SQLite.
+    Clé : hash du texte du chunk + version du modèle spaCy : seuls les chunks nouveaux ou modifiés sont analysés.
+    Stockage compact : mots, lemmes et POS sont des tableaux int32 d'identifiants dans une table de chaînes
+    partagée ; les entités sont des positions (début, fin) dans le texte du chunk.
+    Eviction LRU (date de dernier accès) dès que la taille des entrées et de la table de chaînes dépasse
+    max_bytes ; les chaînes qui ne servent plus à aucune entrée sont alors supprimées.
+    Plusieurs instances (jobs, processus) peuvent partager le fichier : les identifiants de chaînes ne sont
+    jamais réutilisés (AUTOINCREMENT), les écritures les relisent dans la base et les lectures rechargent
+    la table si elles rencontrent un identifiant inconnu.
+    """
+
+    def __init__(self, path=ANNOTATION_CACHE_PATH, max_bytes=ANNOTATION_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Transactions gérées explicitement (BEGIN / COMMIT)
+        self._db = sqlite3.connect(path, timeout=_BUSY_TIMEOUT, isolation_level=None)
+        self._create_schema()
+        self._strings = {}
+        self._load_strings()
+
+    def _create_schema(self):
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != ANNOTATION_SCHEMA:
+            self._migrate()
+        if self._db.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            # Base créée par une version précédente : auto_vacuum ne s'applique qu'après un VACUUM
+            self._db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            try:
+                self._db.execute("VACUUM")
+            except sqlite3.OperationalError:
+                pass  # base occupée par un autre processus : réessayé à la prochaine ouverture
+
+    def _migrate(self):
+        """Tables du schéma ANNOTATION_SCHEMA (les entrées d'un ancien schéma sont abandonnées)."""
+        # Doit précéder la création des tables : le fichier pourra rétrécir après éviction
+        self._db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            if self._db.execute("PRAGMA user_version").fetchone()[0] != ANNOTATION_SCHEMA:
+                self._db.execute("DROP TABLE IF EXISTS annotations")
+                self._db.execute("DROP TABLE IF EXISTS strings")
+                self._db.execute(
+                    "CREATE TABLE strings (id INTEGER PRIMARY KEY AUTOINCREMENT, value TEXT UNIQUE NOT NULL)")
+                self._db.execute("""
+                    CREATE TABLE annotations (
+                        key TEXT PRIMARY KEY, words BLOB, lemmas BLOB, pos BLOB, entities BLOB,
+                        size INTEGER, last_used REAL
+                    )""")
+                self._db.execute("CREATE INDEX annotations_last_used ON annotations (last_used)")
+                self._db.execute(f"PRAGMA user_version = {ANNOTATION_SCHEMA}")
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def _load_strings(self):
+        """(Re)charge la table de chaînes : un autre processus a pu en ajouter depuis le dernier chargement."""
+        self._strings = dict(self._db.execute("SELECT id, value FROM strings"))
+
+    @staticmethod
+    def key(text, model_version):
+        return hashlib.sha1(f"{ANNOTATION_FORMAT}:{model_version}:{text}".encode()).hexdigest()
+
+    def _resolve(self, values):
+        """
+        Identifiants des chaînes (ajoutées à la table si besoin), lus dans la base et non dans la copie locale :
+        à appeler dans la transaction d'écriture qui enregistre les entrées qui les utilisent.
+        """
+        values = list(values)
+        ids = {}
+        for i in range(0, len(values), _SQL_BATCH):
+            batch = values[i:i + _SQL_BATCH]
+            self._db.executemany("INSERT OR IGNORE INTO strings (value) VALUES (?)", [(value,) for value in batch])
+            placeholders = ",".join("?" * len(batch))
+            ids.update(self._db.execute(f"SELECT value, id FROM strings WHERE value IN ({placeholders})", batch))
+        self._strings.update((i, value) for value, i in ids.items())
+        return ids
+
+    @staticmethod
+    def _ids(values, string_ids):
+        return np.asarray([string_ids[value] for value in values], dtype=np.int32).tobytes()
+
+    def _values(self, blob):
+        ids = np.frombuffer(blob, dtype=np.int32).tolist()
+        strings = self._strings
+        if any(i not in strings for i in ids):
+            self._load_strings()
+            strings = self._strings
+        return [strings[i] for i in ids]
+
+    @staticmethod
+    def _entity_spans(text, entities):
+        # Les entités sont des sous-chaînes du texte, dans l'ordre : leur position suffit à les retrouver
+        spans, pos = [], 0
+        for ent in entities:
+            start = text.find(ent, pos)
+            if start < 0:
+                start = text.find(ent)
+            spans += [start, start + len(ent)]
+            pos = start + len(ent)
+        return np.asarray(spans, dtype=np.int32).tobytes()
+
+    def get_many(self, texts, model_version):
+        """Annotations des textes (dans le même ordre), None pour ceux absents du cache."""
+        keys = [self.key(text, model_version) for text in texts]
+        rows = {}
+        results = []
+        # Lecture cohérente : une éviction concurrente ne peut pas supprimer les chaînes des entrées lues
+        self._db.execute("BEGIN")
+        try:
+            for i in range(0, len(keys), _SQL_BATCH):
+                batch = keys[i:i + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows.update((row[0], row[1:]) for row in self._db.execute(
+                    f"SELECT key, words, lemmas, pos, entities FROM annotations WHERE key IN ({placeholders})", batch))
+
+            for text, key in zip(texts, keys):
+                row = rows.get(key)
+                if row is None:
+                    results.append(None)
+                    continue
+                words, lemmas, pos, entities = row
+                spans = np.frombuffer(entities, dtype=np.int32).tolist()
+                results.append({
+                    "words": self._values(words),
+                    "lemmas": self._values(lemmas),
+                    "pos": self._values(pos),
+                    "entities": [text[spans[j]:spans[j + 1]] for j in range(0, len(spans), 2)],
+                })
+        finally:
+            self._db.execute("COMMIT")
+
+        # marque les entrées trouvées comme récemment utilisées (LRU)
+        if rows:
+            now = time.time()
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.executemany("UPDATE annotations SET last_used = ? WHERE key = ?", [(now, key) for key in rows])
+            self._db.execute("COMMIT")
+        n_hits = sum(result is not None for result in results)
+        self.hits += n_hits
+        self.misses += len(texts) - n_hits
+        return results
+
+    def put_many(self, items, model_version):
+        """Enregistre des couples (texte, annotation) puis applique l'éviction."""
+        items = list(items)
+        now = time.time()
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            string_ids = self._resolve({value for _, annotation in items
+                                        for field in ("words", "lemmas", "pos") for value in annotation[field]})
+            records = []
+            for text, annotation in items:
+                words, lemmas = self._ids(annotation["words"], string_ids), self._ids(annotation["lemmas"], string_ids)
+                pos = self._ids(annotation["pos"], string_ids)
+                entities = self._entity_spans(text, annotation["entities"])
+                size = len(words) + len(lemmas) + len(pos) + len(entities)
+                records.append((self.key(text, model_version), words, lemmas, pos, entities, size, now))
+            self._db.executemany("INSERT OR REPLACE INTO annotations VALUES (?, ?, ?, ?, ?, ?, ?)", records)
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self.evict()
+
+    def _size(self):
+        """Taille comptée dans le budget : tableaux des entrées + octets des chaînes."""
+        entries = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM annotations").fetchone()[0]
+        strings = self._db.execute("SELECT COALESCE(SUM(LENGTH(CAST(value AS BLOB))), 0) FROM strings").fetchone()[0]
+        return entries + strings
+
+    def evict(self):
+        """
+        Au-delà de max_bytes, supprime les entrées les moins récemment utilisées jusqu'à _EVICT_TARGET du budget,
+        puis les chaînes qui ne servent plus à aucune entrée.
+        """
+        if self._size() <= self.max_bytes:
+            return
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            total = self._size()  # relue sous verrou : un autre processus a pu évincer entre-temps
+            target = int(self.max_bytes * _EVICT_TARGET)
+            to_delete = []
+            for key, size in self._db.execute("SELECT key, size FROM annotations ORDER BY last_used"):
+                if total <= target:
+                    break
+                to_delete.append((key,))
+                total -= size
+            self._db.executemany("DELETE FROM annotations WHERE key = ?", to_delete)
+
+            referenced = [np.frombuffer(blob, dtype=np.int32)
+                          for row in self._db.execute("SELECT words, lemmas, pos FROM annotations") for blob in row]
+            referenced = set(np.unique(np.concatenate(referenced)).tolist()) if referenced else set()
+            unused = [(i,) for (i,) in self._db.execute("SELECT id FROM strings") if i not in referenced]
+            self._db.executemany("DELETE FROM strings WHERE id = ?", unused)
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        for (i,) in unused:
+            self._strings.pop(i, None)
+        self._db.execute("PRAGMA incremental_vacuum")
+
+    def close(self):
+        self._db.close()
+
+    def stats(self):
+        return f"cache annotations hits : {self.hits}, misses : {self.misses}"
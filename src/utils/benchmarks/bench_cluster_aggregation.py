@@ -0,0 +1,100 @@
+"""
+Agrégations par cluster de topic_detection à l'échelle : boucle par cluster (masque booléen sur le DataFrame,
+un TfidfVectorizer ajusté par cluster) vs matrice indicatrice creuse (une multiplication pour tous les clusters).
+Mesure séparément les centroïdes de merge_close_clusters et les scores TF-IDF de extract_top_keywords,
+sans la lemmatisation des mots-clés (normalize_keywords), identique dans les deux versions.
+
+Lancement : python -m src.utils.benchmarks.bench_cluster_aggregation [--chunks 100000] [--clusters 500]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from src.pipeline.clustering_theme import cluster_indicator, cluster_tfidf_means
+
+
+def synthetic_clusters(n_chunks, n_clusters, vocab_size=20000, doc_len=40, dim=150, seed=0):
+    """DataFrame (hdb_cluster, nlp_ready) et embeddings : ~10 % de bruit (-1), vocabulaire propre à chaque cluster."""
+    rng = np.random.default_rng(seed)
+    labels = rng.integers(-1, n_clusters, size=n_chunks)
+    labels[rng.random(n_chunks) < 0.1] = -1
+    vocab = np.array([f"terme{i}" for i in range(vocab_size)])
+    # chaque cluster tire ses termes dans une fenêtre du vocabulaire, selon une loi de Zipf
+    offsets = rng.integers(0, vocab_size, size=n_clusters + 1)
+    ranks = np.minimum(rng.zipf(1.3, size=(n_chunks, doc_len)), 2000)
+    terms = (offsets[labels + 1][:, None] + ranks) % vocab_size
+    texts = [" ".join(row) for row in vocab[terms]]
+    embeddings = rng.normal(size=(n_chunks, dim))
+    return pd.DataFrame({"hdb_cluster": labels, "nlp_ready": texts}), embeddings
+
+
+def centroids_loop(df, embeddings):
+    centroids = []
+    for cluster_id in df["hdb_cluster"].unique():
+        if cluster_id == -1:
+            continue
+        mask = df["hdb_cluster"] == cluster_id
+        centroids.append(embeddings[mask].mean(axis=0))
+    return np.vstack(centroids)
+
+
+def centroids_indicator(df, embeddings):
+    M, cluster_ids = cluster_indicator(df["hdb_cluster"].to_numpy())
+    centroids = (M @ embeddings) / np.asarray(M.sum(axis=1)).ravel()[:, None]
+    return centroids[cluster_ids != -1]
+
+
+def keywords_loop(df, top_n=3):
+    top = {}
+    for cluster_id in df["hdb_cluster"].unique():
+        texts = df.loc[df["hdb_cluster"] == cluster_id, "nlp_ready"]
+        vectorizer = TfidfVectorizer(max_features=500)
+        scores = vectorizer.fit_transform(texts).mean(axis=0).A1
+        words = vectorizer.get_feature_names_out()
+        top[cluster_id] = [words[i] for i in scores.argsort()[-top_n:][::-1]]
+    return top
+
+
+def keywords_indicator(df, top_n=3):
+    scores, words, cluster_ids = cluster_tfidf_means(df["nlp_ready"].tolist(), df["hdb_cluster"].to_numpy())
+    top = {}
+    for i, cluster_id in enumerate(cluster_ids):
+        row = scores.getrow(i)
+        order = np.lexsort((row.indices, -row.data))[:top_n]
+        top[cluster_id] = [words[j] for j in row.indices[order]]
+    return top
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agrégations par cluster : boucle vs matrice indicatrice")
+    parser.add_argument("--chunks", type=int, nargs="+", default=[10000, 50000, 100000], help="Nombre de chunks")
+    parser.add_argument("--clusters", type=int, default=500, help="Nombre de clusters HDBSCAN")
+    args = parser.parse_args()
+
+    print(f"{'chunks':>7} | {'étape':>10} | {'boucle (s)':>10} | {'indicatrice (s)':>15} | {'gain':>5}")
+    for n_chunks in args.chunks:
+        df, embeddings = synthetic_clusters(n_chunks, args.clusters)
+
+        t_loop, c_loop = timed(centroids_loop, df, embeddings)
+        t_ind, c_ind = timed(centroids_indicator, df, embeddings)
+        assert np.allclose(c_loop, c_ind), "Les centroïdes doivent être identiques"
+        print(f"{n_chunks:>7} | {'centroïdes':>10} | {t_loop:>10.2f} | {t_ind:>15.2f} | {t_loop / t_ind:>4.1f}x")
+
+        t_loop, k_loop = timed(keywords_loop, df)
+        t_ind, k_ind = timed(keywords_indicator, df)
+        # argsort de la boucle ne départage pas les ex aequo : on compare les ensembles de mots-clés
+        same = sum(set(k_loop[c]) == set(k_ind[c]) for c in k_loop) / len(k_loop)
+        print(f"{n_chunks:>7} | {'mots-clés':>10} | {t_loop:>10.2f} | {t_ind:>15.2f} | {t_loop / t_ind:>4.1f}x"
+              f"  (mots-clés identiques : {same:.0%})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Backends de clustering de topic_detection sur un corpus réel (dossier local ou archive de PDFs) :
+- "lexical" : TF-IDF + SVD, puis calcul des embeddings pour la base vectorielle (chemin historique)
+- "semantic" : embeddings calculés une seule fois, clusterisés puis réutilisés pour la base vectorielle
+Durée mesurée : clustering + embeddings, soit tout ce qui précède l'écriture dans Chroma.
+
+Qualité des thèmes, comparée sur les mêmes chunks :
+- part de bruit (chunks écartés car sans thème)
+- NMI entre thèmes et fichier d'origine (si le corpus compte plusieurs fichiers, un cours ~ un thème)
+- silhouette des thèmes dans l'espace des embeddings (cohérence sémantique des chunks d'un même thème)
+
+Lancement : python -m src.utils.benchmarks.bench_clustering_backend --source dossier_ou_archive [--topics 5]
+"""
+import argparse
+import contextlib
+import io
+import time
+
+import numpy as np
+from sklearn.metrics import normalized_mutual_info_score
+
+from src.pipeline.clustering_theme import topic_detection, silhouette_estimate
+from src.pipeline.config import EMBEDDING_MODEL_NAME
+from src.pipeline.embedder import get_embeddings
+from src.pipeline.tokenizer import iter_chunks_with_metadata
+from src.utils.normalizer import normalize_pages
+from src.utils.sources import make_source
+
+
+def load_chunks(location):
+    source = make_source(location)
+    source.connect()
+    with contextlib.redirect_stdout(io.StringIO()):
+        pages = (page for pdf in source.iter_pdfs_data(source.list_files()) for page in pdf)
+        return list(iter_chunks_with_metadata(normalize_pages(pages)))
+
+
+def lexical_backend(chunks, n_topics, model_name):
+    themes = topic_detection(chunks, n_topics=n_topics)
+    embeddings = get_embeddings([c["text"] for c in chunks], model_name)
+    return themes, embeddings
+
+
+def semantic_backend(chunks, n_topics, model_name):
+    embeddings = get_embeddings([c["text"] for c in chunks], model_name)
+    themes = topic_detection(chunks, n_topics=n_topics, embeddings=embeddings)
+    return themes, embeddings
+
+
+def quality(chunks, themes, embeddings):
+    """(part de bruit, NMI thème / fichier, silhouette dans l'espace des embeddings)"""
+    theme_by_chunk = {t["chunk_id"]: t["theme"] for t in themes}
+    kept = [i for i, c in enumerate(chunks) if c["chunk_id"] in theme_by_chunk]
+    labels = [theme_by_chunk[chunks[i]["chunk_id"]] for i in kept]
+    files = [chunks[i]["file_id"] for i in kept]
+    nmi = normalized_mutual_info_score(files, labels) if len(set(files)) > 1 else float("nan")
+    _, codes = np.unique(labels, return_inverse=True)
+    silhouette = silhouette_estimate(np.asarray(embeddings)[kept], codes) if kept else None
+    return 1 - len(kept) / len(chunks), nmi, silhouette
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clustering lexical (TF-IDF/SVD) vs sémantique (embeddings)")
+    parser.add_argument("--source", default="notebooks", help="Dossier local ou archive zip/tar de PDFs")
+    parser.add_argument("--topics", type=int, default=5, help="Nombre cible de thèmes")
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME, help="Modèle d'embeddings")
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.source)
+    print(f"Corpus : {len(chunks)} chunks, {len({c['file_id'] for c in chunks})} fichiers")
+    get_embeddings(["préchauffage"], args.model)  # téléchargement du modèle hors mesure
+
+    results = {}
+    for name, backend in (("lexical", lexical_backend), ("semantic", semantic_backend)):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            themes, embeddings = backend(chunks, args.topics, args.model)
+        results[name] = (time.perf_counter() - start, themes, embeddings)
+
+    # la qualité des deux backends est mesurée dans le même espace (embeddings du backend sémantique)
+    reference = results["semantic"][2]
+    print(f"{'backend':>8} | {'durée (s)':>9} | {'thèmes':>6} | {'bruit':>6} | {'NMI fichier':>11} | {'silhouette':>10}")
+    for name, (duration, themes, _) in results.items():
+        noise, nmi, silhouette = quality(chunks, themes, reference)
+        n_themes = len({t["theme"] for t in themes})
+        silhouette = f"{silhouette:.3f}" if silhouette is not None else "-"
+        print(f"{name:>8} | {duration:>9.1f} | {n_themes:>6} | {noise:>6.1%} | {nmi:>11.3f} | {silhouette:>10}")
+    for name, (_, themes, _) in results.items():
+        print(f"Thèmes {name} : {sorted({t['theme'] for t in themes})}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Backends d'exécution du modèle d'embeddings sur CPU (EMBEDDING_BACKEND) : qualité vs vitesse,
+mesurées sur l'étape de récupération des chunks (find_best_chunk_to_prompt).
+- vitesse : chargement du modèle et débit d'encodage des chunks (EmbeddingModel, cache désactivé)
+- fidélité : similarité cosinus moyenne / minimale entre les vecteurs du backend et ceux du modèle fp32 ("torch")
+- récupération par thème, comme le pipeline : requête = libellé du thème, recherche des k plus proches chunks
+  de ce thème (distance L2, celle de la collection Chroma) ; recouvrement des k chunks avec ceux du fp32
+- auto-récupération : requête = première phrase d'un chunk, recherchée dans tout le corpus ;
+  part des requêtes qui retrouvent leur chunk en tête (top-1) et rang réciproque moyen (MRR)
+
+Dépendances : torch_int8 utilise torch seul ; onnx et onnx_int8 demandent l'extra sentence-transformers[onnx]
+(onnxruntime, optimum, voir requirements/pipeline.txt). Un backend indisponible (dépendance manquante, modèle
+non téléchargeable) est signalé puis ignoré.
+
+Lancement : python -m src.utils.benchmarks.bench_embedding_backends --source dossier_ou_archive
+            [--backends torch torch_int8 onnx onnx_int8] [--k 10] [--queries 200]
+
+Mesures (1 CPU, 360 chunks de 18 PDFs, 3 thèmes, 200 requêtes) : relevées sur un environnement sans torch ni
+optimum, avec un modèle de substitution (sacs de mots hachés) à la place de sentence-camembert-base.
+Seule la ligne de référence est donc disponible, elle ne valide que la chaîne de mesure ; les colonnes
+vitesse et qualité des backends quantifiés restent à relever avec le modèle réel.
+   backend | chargement (s) | textes/sec | accélération | cosinus moy/min | recouvrement@10 |  top-1 |    MRR
+     torch |            0.0 |    14633.6 |        1.00x |  1.0000/1.0000  |          100.0% |   4.5% |  0.069
+Nouvelle tentative sur les quatre backends (même environnement, Hugging Face et l'index PyTorch inaccessibles,
+onnxruntime installé) : torch_int8 indisponible (No module named 'torch'), onnx et onnx_int8 indisponibles
+(module optimum manquant). EMBEDDING_BACKEND reste donc "torch", seul backend dont la qualité de récupération
+ne dépend d'aucune mesure : un backend quantifié ne devient le défaut qu'avec ses colonnes relevées ici.
+"""
+import argparse
+import contextlib
+import io
+import time
+
+import numpy as np
+
+from src.pipeline.clustering_theme import topic_detection
+from src.pipeline.config import EMBEDDING_MODEL_NAME, EMBEDDING_BATCH_SIZE
+from src.utils.benchmarks.bench_clustering_backend import load_chunks
+from src.utils.embedding_models import EmbeddingModel, EMBEDDING_BACKENDS
+
+
+def nearest(queries, vectors, k):
+    """Indices des k vecteurs les plus proches de chaque requête (distance L2), du plus proche au plus lointain."""
+    distances = (queries ** 2).sum(axis=1)[:, None] - 2 * queries @ vectors.T + (vectors ** 2).sum(axis=1)[None, :]
+    k = min(k, vectors.shape[0])
+    top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(top, np.argsort(np.take_along_axis(distances, top, axis=1), axis=1), axis=1)
+
+
+def first_sentence(text):
+    sentence = text.split(". ")[0]
+    return sentence if len(sentence) >= 20 else text[:200]
+
+
+def theme_retrieval(embedding_model, vectors, themes, k):
+    """Pour chaque thème : indices des k chunks du thème les plus proches du libellé (comme le retriever filtré)."""
+    results = {}
+    for theme, members in themes.items():
+        query = np.asarray([embedding_model.embed_query(theme)])
+        results[theme] = set(members[nearest(query, vectors[members], k)[0]])
+    return results
+
+
+def self_retrieval(embedding_model, vectors, queries):
+    """(part des requêtes dont le chunk d'origine arrive en tête, MRR) sur tout le corpus."""
+    positions, texts = zip(*queries)
+    query_vectors = embedding_model.encode(list(texts))
+    ranking = nearest(query_vectors, vectors, vectors.shape[0])
+    ranks = np.array([np.flatnonzero(row == position)[0] + 1 for row, position in zip(ranking, positions)])
+    return float(np.mean(ranks == 1)), float(np.mean(1 / ranks))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backends d'embeddings CPU : qualité de récupération vs vitesse")
+    parser.add_argument("--source", default="notebooks", help="Dossier local ou archive zip/tar de PDFs")
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME, help="Modèle d'embeddings")
+    parser.add_argument("--backends", nargs="+", default=list(EMBEDDING_BACKENDS), choices=EMBEDDING_BACKENDS,
+                        help="Backends comparés (le premier sert de référence, torch conseillé)")
+    parser.add_argument("--batch-size", type=int, default=EMBEDDING_BATCH_SIZE, help="Taille des lots d'encodage")
+    parser.add_argument("--k", type=int, default=10, help="Nombre de chunks récupérés par thème")
+    parser.add_argument("--queries", type=int, default=200, help="Nombre de requêtes d'auto-récupération")
+    parser.add_argument("--topics", type=int, default=5, help="Nombre cible de thèmes")
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.source)
+    texts = [chunk["text"] for chunk in chunks]
+    with contextlib.redirect_stdout(io.StringIO()):
+        records = topic_detection(chunks, n_topics=args.topics)
+    positions = {chunk["chunk_id"]: i for i, chunk in enumerate(chunks)}
+    themes = {}
+    for record in records:
+        themes.setdefault(record["theme"], []).append(positions[record["chunk_id"]])
+    themes = {theme: np.array(members) for theme, members in themes.items()}
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(chunks), size=min(args.queries, len(chunks)), replace=False)
+    queries = [(i, first_sentence(texts[i])) for i in sample]
+    print(f"Corpus : {len(chunks)} chunks, {len(themes)} thèmes, {len(queries)} requêtes d'auto-récupération")
+
+    results = {}
+    for backend in args.backends:
+        embedding_model = EmbeddingModel(args.model, args.batch_size, cache=None, backend=backend)
+        start = time.perf_counter()
+        try:
+            embedding_model.model
+        except (ImportError, OSError) as e:  # dépendance manquante ou modèle non téléchargeable
+            print(f"{backend} : indisponible ({e})")
+            continue
+        load = time.perf_counter() - start
+        embedding_model.encode(texts[:8])  # préchauffage hors mesure
+        start = time.perf_counter()
+        vectors = np.asarray(embedding_model.encode(texts), dtype=np.float32)
+        duration = time.perf_counter() - start
+        results[backend] = {
+            "load": load, "rate": len(texts) / duration, "vectors": vectors,
+            "themes": theme_retrieval(embedding_model, vectors, themes, args.k),
+            "self": self_retrieval(embedding_model, vectors, queries),
+        }
+
+    if not results:
+        return
+    reference_name = next(iter(results))
+    reference = results[reference_name]
+    normed_reference = reference["vectors"] / np.linalg.norm(reference["vectors"], axis=1, keepdims=True)
+    print(f"Référence : {reference_name}")
+    print(f"{'backend':>10} | {'chargement (s)':>14} | {'textes/sec':>10} | {'accélération':>12} | "
+          f"{'cosinus moy/min':>15} | {f'recouvrement@{args.k}':>15} | {'top-1':>6} | {'MRR':>6}")
+    for backend, result in results.items():
+        normed = result["vectors"] / np.linalg.norm(result["vectors"], axis=1, keepdims=True)
+        cosines = np.einsum("ij,ij->i", normed, normed_reference)
+        overlap = np.mean([len(result["themes"][theme] & reference["themes"][theme]) / len(reference["themes"][theme])
+                           for theme in themes])
+        top1, mrr = result["self"]
+        print(f"{backend:>10} | {result['load']:>14.1f} | {result['rate']:>10.1f} | "
+              f"{result['rate'] / reference['rate']:>11.2f}x | {cosines.mean():>7.4f}/{cosines.min():<7.4f} | "
+              f"{overlap:>15.1%} | {top1:>6.1%} | {mrr:>6.3f}")
+
+
+if __name__ == "__main__":
+    main()
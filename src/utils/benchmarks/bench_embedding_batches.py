@@ -0,0 +1,86 @@
+"""
+Débit CPU de l'encodage des chunks par le modèle d'embeddings (EmbeddingModel, cache désactivé) :
+- "appel unique" : tous les textes dans un seul model.encode (chemin de HuggingFaceEmbeddings, utilisé
+  par Chroma.from_documents avant le registre de modèles)
+- "ordre d'arrivée" : un model.encode par lot de batch_size textes, dans l'ordre des chunks (sans tri global)
+- "EmbeddingModel" : textes triés par longueur en caractères (comme SentenceTransformer.encode) avant le
+  découpage en lots, ordre d'origine restitué
+Remplissage : tokens utiles / tokens traités (chaque lot est complété jusqu'à son texte le plus long) ;
+la tokenisation n'est faite que pour cette mesure, EmbeddingModel trie sans tokeniser.
+L'écart max avec l'appel unique vérifie que chaque vecteur revient à la position de son texte.
+
+Lancement : python -m src.utils.benchmarks.bench_embedding_batches --source dossier_ou_archive
+            [--batch-sizes 16 32 64 128] [--limit 2000] [--backend onnx_int8]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from src.pipeline.config import EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND
+from src.utils.benchmarks.bench_clustering_backend import load_chunks
+from src.utils.embedding_models import EmbeddingModel, EMBEDDING_BACKENDS, load_embedding_model
+
+
+def token_lengths(model, texts):
+    """Longueur en tokens de chaque texte, tronquée comme à l'encodage (en caractères sans tokenizer)."""
+    tokenizer = getattr(model, "tokenizer", None)
+    if tokenizer is None:
+        return np.array([len(text) for text in texts], dtype=int)
+    max_length = getattr(model, "max_seq_length", None)
+    input_ids = tokenizer(texts, add_special_tokens=False, truncation=max_length is not None,
+                          max_length=max_length)["input_ids"]
+    return np.array([len(ids) for ids in input_ids], dtype=int)
+
+
+def arrival_order(model, texts, batch_size):
+    """Un appel à model.encode par lot, dans l'ordre des textes."""
+    return np.vstack([model.encode(texts[i:i + batch_size], batch_size=batch_size, show_progress_bar=False,
+                                   convert_to_numpy=True) for i in range(0, len(texts), batch_size)])
+
+
+def padding_efficiency(lengths, order, batch_size):
+    """Part des tokens traités qui sont de vrais tokens (1 = aucun padding)."""
+    lengths = np.asarray(lengths)[order] + 2  # + tokens spéciaux de début et de fin
+    padded = sum(len(batch) * batch.max() for batch in np.split(lengths, range(batch_size, len(lengths), batch_size)))
+    return lengths.sum() / padded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Débit de l'encodage : lots triés par longueur vs ordre d'arrivée")
+    parser.add_argument("--source", default="notebooks", help="Dossier local ou archive zip/tar de PDFs")
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME, help="Modèle d'embeddings")
+    parser.add_argument("--backend", default=EMBEDDING_BACKEND, choices=EMBEDDING_BACKENDS,
+                        help="Exécution du modèle (voir bench_embedding_backends)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 32, 64, 128], help="Tailles de lot testées")
+    parser.add_argument("--limit", type=int, default=None, help="Nombre max de chunks encodés")
+    args = parser.parse_args()
+
+    texts = [chunk["text"] for chunk in load_chunks(args.source)][:args.limit]
+    model = load_embedding_model(args.model, args.backend)  # chargement hors mesure
+    model.encode(texts[:8], show_progress_bar=False)
+    lengths = token_lengths(model, texts)
+    print(f"Corpus : {len(texts)} chunks, longueur en tokens : médiane {np.median(lengths):.0f}, "
+          f"min {lengths.min()}, max {lengths.max()}")
+
+    start = time.perf_counter()
+    reference = model.encode(texts, show_progress_bar=False, convert_to_numpy=True)
+    duration = time.perf_counter() - start
+    print(f"{'chemin':>16} | {'lot':>4} | {'durée (s)':>9} | {'textes/sec':>10} | {'remplissage':>11} | {'écart max':>9}")
+    print(f"{'appel unique':>16} | {'-':>4} | {duration:>9.2f} | {len(texts) / duration:>10.1f} | {'-':>11} | {'-':>9}")
+
+    sorted_order = np.argsort([-len(text) for text in texts], kind="stable")
+    for batch_size in args.batch_sizes:
+        embedding_model = EmbeddingModel(args.model, batch_size, cache=None, backend=args.backend)
+        paths = (("ordre d'arrivée", lambda: arrival_order(model, texts, batch_size), np.arange(len(texts))),
+                 ("EmbeddingModel", lambda: embedding_model.encode(texts), sorted_order))
+        for name, encode, order in paths:
+            start = time.perf_counter()
+            vectors = encode()
+            duration = time.perf_counter() - start
+            print(f"{name:>16} | {batch_size:>4} | {duration:>9.2f} | {len(texts) / duration:>10.1f} | "
+                  f"{padding_efficiency(lengths, order, batch_size):>11.1%} | {np.abs(vectors - reference).max():>9.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Courbe de passage à l'échelle du clustering HDBSCAN de topic_detection (hdbscan_clustering) :
+mode exact (distances euclidiennes complètes) vs mode approché (graphe des plus proches voisins, knn_graph),
+sur des vecteurs normalisés synthétiques de la dimension d'une projection SVD (thèmes gaussiens bruités).
+Chaque mesure tourne dans un processus neuf : le pic de RSS rapporté est celui du seul clustering.
+L'ARI mesure l'accord entre les labels des deux modes. Trace durée et pic mémoire selon le nombre de chunks (PNG).
+
+Mesure de référence (1 CPU, dimension 100, 200 thèmes, repli scikit-learn sans FAISS) :
+ chunks | exact (s) | exact (Mo) | approché (s) | approché (Mo) |  ARI
+   5000 |       3.7 |        277 |          1.9 |           297 | 1.00
+  10000 |      13.4 |        283 |          4.5 |           345 | 1.00
+  20000 |      54.0 |        300 |         12.0 |           449 | 1.00
+  50000 |         - |          - |         39.5 |           765 |    -
+ 100000 |         - |          - |        117.2 |          1300 |    -
+Le mode exact croît en O(n²) (~4x par doublement du corpus) ; le mode approché ~3x par doublement ici,
+porté par la recherche exacte des voisins de scikit-learn (sous-quadratique avec l'index HNSW de FAISS).
+Son pic mémoire vient du graphe creux (copie en LIL par hdbscan), environ 13 Ko par chunk.
+
+Lancement : python -m src.utils.benchmarks.bench_hdbscan_scaling [--chunks 5000 10000 20000 50000 100000]
+            [--exact-max 20000]
+"""
+import argparse
+import multiprocessing
+import resource
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+from sklearn.metrics import adjusted_rand_score
+from sklearn.preprocessing import normalize
+
+
+def synthetic_vectors(n_chunks, dim=100, n_topics=200, noise=0.35, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_topics, dim))
+    return normalize(centers[rng.integers(0, n_topics, n_chunks)] + noise * rng.normal(size=(n_chunks, dim)))
+
+
+def run_clustering(args):
+    """Exécuté dans un processus dédié : (durée, labels, pic RSS en Mo)."""
+    n_chunks, dim, approx = args
+    from src.pipeline.clustering_theme import hdbscan_clustering
+    X = synthetic_vectors(n_chunks, dim)
+    start = time.perf_counter()
+    labels = hdbscan_clustering(X, approx_min_chunks=0 if approx else len(X) + 1)
+    duration = time.perf_counter() - start
+    return duration, labels, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(n_chunks, dim, approx):
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(1, maxtasksperchild=1) as pool:
+        return pool.apply(run_clustering, ((n_chunks, dim, approx),))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Passage à l'échelle de HDBSCAN : exact vs graphe des voisins")
+    parser.add_argument("--chunks", type=int, nargs="+", default=[5000, 10000, 20000, 50000, 100000],
+                        help="Nombres de chunks testés")
+    parser.add_argument("--dim", type=int, default=100, help="Dimension des vecteurs (composantes SVD)")
+    parser.add_argument("--exact-max", type=int, default=20000, help="Mode exact mesuré jusqu'à ce nombre de chunks")
+    parser.add_argument("--output", default="bench_hdbscan_scaling.png", help="Graphique durée/mémoire vs chunks")
+    args = parser.parse_args()
+
+    print(f"{'chunks':>7} | {'exact (s)':>9} | {'exact (Mo)':>10} | {'approché (s)':>12} | {'approché (Mo)':>13} | {'ARI':>5}")
+    curves = {"exact": [], "approché": []}
+    for n_chunks in args.chunks:
+        approx_time, approx_labels, approx_rss = measure(n_chunks, args.dim, approx=True)
+        curves["approché"].append((n_chunks, approx_time, approx_rss))
+        exact = "-"
+        if n_chunks <= args.exact_max:
+            exact_time, exact_labels, exact_rss = measure(n_chunks, args.dim, approx=False)
+            curves["exact"].append((n_chunks, exact_time, exact_rss))
+            exact = (f"{exact_time:>9.1f} | {exact_rss:>10.0f} | {approx_time:>12.1f} | {approx_rss:>13.0f} | "
+                     f"{adjusted_rand_score(exact_labels, approx_labels):>5.2f}")
+            print(f"{n_chunks:>7} | {exact}")
+        else:
+            print(f"{n_chunks:>7} | {exact:>9} | {exact:>10} | {approx_time:>12.1f} | {approx_rss:>13.0f} | {exact:>5}")
+
+    fig, (ax_time, ax_rss) = plt.subplots(1, 2, figsize=(11, 4))
+    for name, points in curves.items():
+        if points:
+            n, durations, rss = zip(*points)
+            ax_time.plot(n, durations, marker="o", label=name)
+            ax_rss.plot(n, rss, marker="o", label=name)
+    ax_time.set(xlabel="Nombre de chunks", ylabel="Durée (s)", title="Durée de HDBSCAN")
+    ax_rss.set(xlabel="Nombre de chunks", ylabel="Pic RSS (Mo)", title="Mémoire de HDBSCAN")
+    for ax in (ax_time, ax_rss):
+        ax.grid(True)
+        ax.legend()
+    fig.tight_layout()
+    fig.savefig(args.output, dpi=150)
+    plt.close(fig)
+    print(f"\nGraphique : {args.output}")
+
+
+if __name__ == "__main__":
+    main()
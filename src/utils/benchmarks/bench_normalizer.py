@@ -0,0 +1,49 @@
+"""
+Micro-benchmark de la normalisation : normalize_text (motifs précompilés, table de traduction)
+vs normalize_text_reference (une vingtaine de passes re.sub), sur le texte du PDF d'exemple.
+
+Lancement : python -m src.utils.benchmarks.bench_normalizer [--pdf notebooks/Histoire_CM1.pdf] [--repeat 20]
+"""
+import argparse
+import io
+import time
+
+from src.utils.extractor import extract_pages_text
+from src.utils.normalizer import normalize_text_reference, normalize_texts
+
+
+def best_time(func, pages, repeat):
+    """Meilleur temps sur repeat passes complètes (le minimum écarte le bruit de la machine)."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(pages)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark de normalize_text")
+    parser.add_argument("--pdf", default="notebooks/Histoire_CM1.pdf", help="PDF dont le texte est normalisé")
+    parser.add_argument("--repeat", type=int, default=20, help="Nombre de passes mesurées")
+    args = parser.parse_args()
+
+    with open(args.pdf, "rb") as f:
+        pages = extract_pages_text(io.BytesIO(f.read()))
+    n_chars = sum(len(page) for page in pages)
+
+    reference = [normalize_text_reference(page) for page in pages]
+    assert normalize_texts(pages) == reference, "Le moteur doit produire la même sortie que la référence"
+
+    t_ref = best_time(lambda p: [normalize_text_reference(page) for page in p], pages, args.repeat)
+    t_new = best_time(normalize_texts, pages, args.repeat)
+
+    print(f"Texte : {len(pages)} pages, {n_chars} caractères")
+    print(f"{'version':>10} | {'durée (ms)':>10} | {'Mo/s':>6}")
+    for name, duration in (("référence", t_ref), ("moteur", t_new)):
+        print(f"{name:>10} | {duration * 1e3:>10.2f} | {n_chars / duration / 1e6:>6.1f}")
+    print(f"speedup : {t_ref / t_new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Benchmark de l'extraction du texte des pages d'un gros PDF :
+page.extract_text() séquentiel vs pool de processus partageant le PDF par mmap.
+
+Lancement : python -m src.utils.benchmarks.bench_page_extraction [--pages 400] [--workers 1 2 4]
+"""
+import argparse
+import io
+import time
+
+from pypdf import PdfReader
+
+from src.utils.benchmarks.fake_drive import make_pdf_bytes, synthetic_pages
+from src.utils.extractor import extract_pages_text_multiprocess, get_process_pool
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de l'extraction multi-processus des pages")
+    parser.add_argument("--pages", type=int, default=400, help="Nombre de pages du PDF synthétique")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4], help="Tailles de pool testées")
+    parser.add_argument("--pdf", default=None, help="Chemin d'un vrai PDF à utiliser à la place du PDF synthétique")
+    args = parser.parse_args()
+
+    if args.pdf:
+        with open(args.pdf, "rb") as f:
+            pdf_buf = io.BytesIO(f.read())
+    else:
+        pdf_buf = io.BytesIO(make_pdf_bytes(synthetic_pages(args.pages)))
+    reader = PdfReader(pdf_buf)
+    n_pages = len(reader.pages)
+
+    start = time.perf_counter()
+    texts_serial = [page.extract_text() or "" for page in reader.pages]
+    t_serial = time.perf_counter() - start
+    print(f"{n_pages} pages | séquentiel : {t_serial:.2f} s")
+
+    for workers in args.workers:
+        # Démarrage du pool hors chronomètre : en production il est partagé entre les PDFs
+        get_process_pool(workers).submit(int).result()
+        start = time.perf_counter()
+        texts = extract_pages_text_multiprocess(pdf_buf, n_pages, max_workers=workers)
+        t_proc = time.perf_counter() - start
+        assert texts == texts_serial, "Les pages doivent être identiques et dans le même ordre"
+        print(f"{n_pages} pages | {workers} processus : {t_proc:.2f} s ({t_serial / t_proc:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Débit de l'annotation spaCy des chunks (annotate_chunks de clustering_theme) selon le nombre de processus,
+sur un corpus synthétique de chunks. Trace chunks/sec en fonction du nombre de processus (PNG),
+puis l'effet de la taille des tâches envoyées aux processus et de la taille des lots de nlp.pipe.
+
+Lancement : python -m src.utils.benchmarks.bench_spacy_parallel [--chunks 20000] [--workers 1 2 4 8]
+            [--task-sizes 64 256 1024] [--batch-sizes 16 64 256]
+
+Mesures (3000 chunks, 1 CPU, modèle de substitution construit localement sous le nom fr_core_news_lg faute
+d'accès au modèle publié, chargement du modèle de chaque processus inclus), reprises dans config.py :
+processus 1 / 2 / 4 : 84 / 53 / 40 chunks/sec ; tâches de 64 / 256 / 1024 (4 processus) : 38 / 40 / 50 ;
+lots de 16 / 64 / 256 (1 processus) : 76 / 78 / 80.
+"""
+import argparse
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+from src.utils.benchmarks.fake_drive import synthetic_pages
+from src.pipeline import clustering_theme
+from src.pipeline.clustering_theme import annotate_chunks, annotate_chunks_parallel
+
+
+def synthetic_chunks(n_chunks, lines_per_chunk=6):
+    """Chunks d'environ 600 caractères, découpés dans des pages synthétiques."""
+    pages = synthetic_pages(n_chunks // 5 + 1, lines_per_page=5 * lines_per_chunk)
+    chunks = []
+    for page in pages:
+        lines = page.split("\n")[1:]
+        for i in range(0, len(lines), lines_per_chunk):
+            chunks.append(" ".join(lines[i:i + lines_per_chunk]).capitalize())
+    return chunks[:n_chunks]
+
+
+def throughput(texts, n_process, task_size, batch_size=clustering_theme.SPACY_BATCH_SIZE):
+    start = time.perf_counter()
+    if n_process == 1:
+        n = sum(1 for _ in annotate_chunks(texts, batch_size=batch_size, n_process=1))
+    else:
+        n = sum(1 for _ in annotate_chunks_parallel(texts, n_process, task_size=task_size, batch_size=batch_size))
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Débit de l'annotation spaCy selon le nombre de processus")
+    parser.add_argument("--chunks", type=int, default=20000, help="Taille du corpus synthétique")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="Nombres de processus testés")
+    parser.add_argument("--task-sizes", type=int, nargs="+", default=[64, 256, 1024],
+                        help="Tailles de tâche testées avec le plus grand nombre de processus")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 64, 256],
+                        help="Tailles de lot de nlp.pipe testées avec un seul processus")
+    parser.add_argument("--output", default="bench_spacy_parallel.png", help="Graphique chunks/sec vs processus")
+    args = parser.parse_args()
+
+    texts = synthetic_chunks(args.chunks)
+    clustering_theme.nlp("préchauffage")  # le chargement du modèle n'entre pas dans les mesures
+
+    print(f"Corpus : {len(texts)} chunks")
+    print(f"{'processus':>9} | {'chunks/sec':>10}")
+    rates = []
+    for n_process in args.workers:
+        rates.append(throughput(texts, n_process, clustering_theme.SPACY_TASK_SIZE))
+        print(f"{n_process:>9} | {rates[-1]:>10.0f}")
+
+    max_workers = max(args.workers)
+    if max_workers > 1:
+        print(f"\nTaille des tâches ({max_workers} processus)")
+        print(f"{'tâche':>9} | {'chunks/sec':>10}")
+        for task_size in args.task_sizes:
+            print(f"{task_size:>9} | {throughput(texts, max_workers, task_size):>10.0f}")
+
+    print("\nTaille des lots de nlp.pipe (1 processus)")
+    print(f"{'lot':>9} | {'chunks/sec':>10}")
+    for batch_size in args.batch_sizes:
+        print(f"{batch_size:>9} | {throughput(texts, 1, None, batch_size):>10.0f}")
+
+    plt.plot(args.workers, rates, marker="o")
+    plt.xlabel("Nombre de processus")
+    plt.ylabel("Chunks annotés par seconde")
+    plt.title(f"Annotation spaCy de {len(texts)} chunks")
+    plt.grid(True)
+    plt.savefig(args.output, dpi=150)
+    plt.close()
+    print(f"\nGraphique : {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Coût d'import des modules qui utilisent spaCy (normalizer, clustering_theme) et mémoire résidente,
+avant / après le registre de modèles partagé :
+- "avant" importe les mêmes modules puis exécute les deux spacy.load que l'ancien code faisait à l'import
+  (modèle complet pour normalizer, sans parser pour clustering_theme) ;
+- "registre" importe les modules actuels (aucun chargement), puis mesure la première analyse des deux modules.
+Chaque scénario tourne dans un processus neuf pour que les mesures ne se contaminent pas.
+
+Lancement : python -m src.utils.benchmarks.bench_spacy_registry
+"""
+import json
+import subprocess
+import sys
+
+from src.pipeline.config import SPACY_MODEL_NAME
+
+_PRELUDE = """
+import json, time
+from src.utils.memory import current_rss_mb
+start = time.perf_counter()
+"""
+
+EAGER = _PRELUDE + """
+import spacy
+import src.pipeline.tokenizer
+import src.utils.normalizer
+import src.pipeline.clustering_theme
+nlp_normalizer = spacy.load({model!r})
+nlp_clustering = spacy.load({model!r}, disable=["parser"])
+import_s, rss_import = time.perf_counter() - start, current_rss_mb()
+start = time.perf_counter()
+nlp_normalizer("château")
+list(nlp_clustering.pipe(["Charlemagne est couronné empereur à Rome en 800."]))
+print(json.dumps([import_s, rss_import, time.perf_counter() - start, current_rss_mb()]))
+"""
+
+REGISTRY = _PRELUDE + """
+import src.pipeline.tokenizer
+from src.utils.normalizer import normalize_keywords
+from src.pipeline.clustering_theme import nlp as nlp_clustering
+import_s, rss_import = time.perf_counter() - start, current_rss_mb()
+start = time.perf_counter()
+normalize_keywords(["château"])
+list(nlp_clustering.pipe(["Charlemagne est couronné empereur à Rome en 800."]))
+print(json.dumps([import_s, rss_import, time.perf_counter() - start, current_rss_mb()]))
+"""
+
+
+def run_scenario(code):
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    print(f"Modèle : {SPACY_MODEL_NAME}")
+    print(f"{'scénario':>9} | {'import (s)':>10} | {'RSS import (Mo)':>15} | {'1re analyse (s)':>15} | {'RSS final (Mo)':>14}")
+    for name, code in (("avant", EAGER.format(model=SPACY_MODEL_NAME)), ("registre", REGISTRY)):
+        import_s, rss_import, first_use_s, rss_final = run_scenario(code)
+        print(f"{name:>9} | {import_s:>10.2f} | {rss_import:>15.0f} | {first_use_s:>15.2f} | {rss_final:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark mémoire des étapes extraction -> normalisation -> chunk :
+mode liste (pdfs_data complet, normalisé en place, puis chunks) vs mode flux (générateurs).
+Le pic mémoire est mesuré avec tracemalloc sur un corpus synthétique servi par le Drive factice.
+
+Lancement : python -m src.utils.benchmarks.bench_streaming_memory [--files 100] [--pages 50]
+"""
+import argparse
+import contextlib
+import gc
+import io
+import time
+import tracemalloc
+
+from src.utils.benchmarks.fake_drive import build_fake_drive
+from src.utils.drive_import import get_pdfs_ids
+from src.utils.extractor import get_all_pdfs_data, iter_all_pdfs_data
+from src.utils.normalizer import normalize_text, normalize_pages
+from src.pipeline.tokenizer import chunk_with_metadata, iter_chunks_with_metadata
+
+
+def list_mode(service, files, max_workers):
+    pdfs_data = get_all_pdfs_data(service, files, max_workers=max_workers, service_factory=lambda: service)
+    for pdf in pdfs_data:
+        for page in pdf:
+            page["text"] = normalize_text(page["text"])
+    return chunk_with_metadata(pdfs_data)
+
+
+def streaming_mode(service, files, max_workers):
+    pdfs_stream = iter_all_pdfs_data(service, files, max_workers=max_workers, service_factory=lambda: service)
+    pages = (page for pdf in pdfs_stream for page in pdf)
+    return list(iter_chunks_with_metadata(normalize_pages(pages)))
+
+
+def measure(mode, service, files, max_workers):
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        chunks = mode(service, files, max_workers)
+    duration = time.perf_counter() - start
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return chunks, duration, peak, retained
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pic mémoire du mode liste vs mode flux")
+    parser.add_argument("--files", type=int, default=100, help="Nombre de PDFs du corpus")
+    parser.add_argument("--pages", type=int, default=50, help="Pages par PDF (5 000 pages au total par défaut)")
+    parser.add_argument("--workers", type=int, default=4, help="Threads d'ingestion")
+    args = parser.parse_args()
+
+    service, folder_id, _ = build_fake_drive(args.files, args.pages, latency=0, bandwidth=1e12)
+    files = get_pdfs_ids(service, folder_id, pdf_only=True)
+
+    chunks_list, t_list, peak_list, kept_list = measure(list_mode, service, files, args.workers)
+    chunks_stream, t_stream, peak_stream, kept_stream = measure(streaming_mode, service, files, args.workers)
+    assert chunks_list == chunks_stream, "Les deux modes doivent produire les mêmes chunks"
+
+    # surcoût = pic - mémoire encore occupée par les chunks renvoyés : ce que l'étape garde en plus du résultat
+    print(f"Corpus : {args.files * args.pages} pages, {len(chunks_list)} chunks")
+    print(f"{'mode':>6} | {'pic (Mo)':>8} | {'chunks (Mo)':>11} | {'surcoût (Mo)':>12} | {'durée (s)':>9}")
+    for name, peak, kept, duration in (("liste", peak_list, kept_list, t_list), ("flux", peak_stream, kept_stream, t_stream)):
+        print(f"{name:>6} | {peak / 1e6:>8.1f} | {kept / 1e6:>11.1f} | {(peak - kept) / 1e6:>12.1f} | {duration:>9.1f}")
+
+if __name__ == "__main__":
+    main()
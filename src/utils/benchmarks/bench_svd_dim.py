@@ -0,0 +1,87 @@
+"""
+Choix de la dimension SVD du clustering selon la taille du vocabulaire :
+auto_svd_dim + seconde SVD (mode "full") vs auto_svd_dim_fast (mode "fast", une seule SVD randomisée étendue par blocs),
+sur des matrices TF-IDF synthétiques (documents tirés de thèmes à distribution de Zipf).
+
+Lancement : python -m src.utils.benchmarks.bench_svd_dim [--vocab 1000 5000 10000 20000 50000] [--docs 3000]
+"""
+import argparse
+import contextlib
+import io
+import time
+from unittest import mock
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import TfidfTransformer
+
+from src.pipeline import clustering_theme
+
+
+def synthetic_tfidf(n_docs, vocab_size, n_topics=20, doc_len=80, seed=0):
+    """Matrice TF-IDF (n_docs x vocab_size) : chaque document tire ses termes d'un thème (Zipf permuté)."""
+    rng = np.random.default_rng(seed)
+    zipf = 1.0 / np.arange(1, vocab_size + 1)
+    topics = [rng.permutation(zipf) for _ in range(n_topics)]
+    topics = [t / t.sum() for t in topics]
+    rows, cols = [], []
+    for d in range(n_docs):
+        terms = rng.choice(vocab_size, size=doc_len, p=topics[rng.integers(n_topics)])
+        rows.append(np.full(doc_len, d))
+        cols.append(terms)
+    counts = sp.csr_matrix((np.ones(n_docs * doc_len), (np.concatenate(rows), np.concatenate(cols))),
+                           shape=(n_docs, vocab_size))
+    counts.sum_duplicates()
+    return TfidfTransformer().fit_transform(counts)
+
+
+def total_variance(X):
+    mean = np.asarray(X.mean(axis=0)).ravel()
+    mean_sq = np.asarray(X.multiply(X).mean(axis=0)).ravel()
+    return float((mean_sq - mean ** 2).sum())
+
+
+def full_mode(X):
+    k = clustering_theme.auto_svd_dim(X, target_var=0.7)
+    return k, TruncatedSVD(n_components=k, algorithm='randomized', n_iter=100, random_state=42).fit_transform(X)
+
+
+def fast_mode(X):
+    return clustering_theme.auto_svd_dim_fast(X, target_var=0.7)
+
+
+def timed(mode, X):
+    start = time.perf_counter()
+    # les graphiques et affichages ne font pas partie de la mesure
+    with mock.patch.object(clustering_theme, "plot_cumulative_variance"), contextlib.redirect_stdout(io.StringIO()):
+        k, lsa = mode(X)
+    duration = time.perf_counter() - start
+    return duration, k, lsa.var(axis=0).sum() / total_variance(X)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du choix de dimension SVD")
+    parser.add_argument("--vocab", type=int, nargs="+", default=[1000, 5000, 10000, 20000, 50000],
+                        help="Tailles de vocabulaire testées")
+    parser.add_argument("--docs", type=int, default=3000, help="Nombre de chunks (lignes de la matrice)")
+    parser.add_argument("--full-max-vocab", type=int, default=10000,
+                        help="Au-delà, le mode full n'est pas lancé (SVD quasi complète trop coûteuse en mémoire)")
+    args = parser.parse_args()
+
+    print(f"{'vocab':>6} | {'full (s)':>8} | {'k full':>6} | {'var full':>8} | "
+          f"{'fast (s)':>8} | {'k fast':>6} | {'var fast':>8} | {'speedup':>7}")
+    for vocab_size in args.vocab:
+        X = synthetic_tfidf(args.docs, vocab_size)
+        t_fast, k_fast, var_fast = timed(fast_mode, X)
+        if vocab_size <= args.full_max_vocab:
+            t_full, k_full, var_full = timed(full_mode, X)
+            full_cols = f"{t_full:>8.1f} | {k_full:>6} | {var_full:>8.3f}"
+            speedup = f"{t_full / t_fast:>6.1f}x"
+        else:
+            full_cols, speedup = f"{'-':>8} | {'-':>6} | {'-':>8}", f"{'-':>7}"
+        print(f"{vocab_size:>6} | {full_cols} | {t_fast:>8.1f} | {k_fast:>6} | {var_fast:>8.3f} | {speedup}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Etiquetage des thèmes de topic_detection : TF-IDF moyen propre à chaque cluster (extract_top_keywords, mode "tfidf")
+vs TF-IDF par classe sur la matrice de comptes déjà calculée pour le clustering (label_clusters, mode "class_tfidf").
+La lemmatisation des mots-clés est incluse dans la mesure ; les deux modes ne choisissent pas forcément
+les mêmes mots, le recouvrement moyen des mots-clés est affiché à titre indicatif.
+
+Lancement : python -m src.utils.benchmarks.bench_theme_labelling [--chunks 100000] [--clusters 3 50 500]
+"""
+import argparse
+import time
+
+from sklearn.feature_extraction.text import CountVectorizer
+
+from src.pipeline.clustering_theme import extract_top_keywords, label_clusters
+from src.utils.benchmarks.bench_cluster_aggregation import synthetic_clusters
+from src.utils.normalizer import nlp
+
+
+def overlap(themes_a, themes_b):
+    """Part moyenne de mots-clés communs entre deux étiquetages, hors bruit."""
+    shared = [len(set(themes_a[c].split(", ")) & set(themes_b[c].split(", "))) / len(themes_a[c].split(", "))
+              for c in themes_a if themes_a[c] != "other"]
+    return sum(shared) / len(shared)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Etiquetage des thèmes : TF-IDF par cluster vs TF-IDF par classe")
+    parser.add_argument("--chunks", type=int, default=100000, help="Nombre de chunks")
+    parser.add_argument("--clusters", type=int, nargs="+", default=[3, 50, 500], help="Nombre de clusters étiquetés")
+    args = parser.parse_args()
+
+    nlp("chargement")  # le chargement du modèle spaCy ne fait pas partie de la mesure
+    print(f"{'clusters':>8} | {'tfidf (s)':>9} | {'class_tfidf (s)':>15} | {'gain':>6} | {'mots communs':>12}")
+    for n_clusters in args.clusters:
+        df, _ = synthetic_clusters(args.chunks, n_clusters)
+        # matrice de comptes : calculée de toute façon par topic_detection pour le clustering
+        vectorizer = CountVectorizer()
+        counts = vectorizer.fit_transform(df["nlp_ready"])
+
+        start = time.perf_counter()
+        themes_tfidf = extract_top_keywords(df)
+        t_tfidf = time.perf_counter() - start
+
+        start = time.perf_counter()
+        themes_class = label_clusters(counts, vectorizer.get_feature_names_out(), df["hdb_cluster"])
+        t_class = time.perf_counter() - start
+
+        assert list(themes_tfidf) == list(themes_class), "Les deux modes doivent étiqueter les mêmes clusters"
+        print(f"{n_clusters:>8} | {t_tfidf:>9.2f} | {t_class:>15.2f} | {t_tfidf / t_class:>5.1f}x"
+              f" | {overlap(themes_tfidf, themes_class):>12.0%}")
+
+if __name__ == "__main__":
+    main()
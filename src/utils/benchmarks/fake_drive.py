@@ -0,0 +1,214 @@
+"""
+Service Google Drive factice pour les benchmarks hors ligne.
+
+Reproduit le sous-ensemble de l'API Drive v3 utilisé par drive_import et extractor
+(files().list / files().get / files().get_media) avec une latence réseau simulée
+par time.sleep, qui relâche le GIL comme le ferait une vraie attente réseau.
+"""
+import hashlib
+import threading
+import time
+from collections import defaultdict
+
+PDF_MIME = "application/pdf"
+FOLDER_MIME = "application/vnd.google-apps.folder"
+SHORTCUT_MIME = "application/vnd.google-apps.shortcut"
+
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf_bytes(pages):
+    """
+    Construit un PDF minimal (police Helvetica) dont chaque page contient le texte fourni.
+    Input : pages (liste de str, une entrée par page, lignes séparées par \\n)
+    Output : bytes du PDF
+    """
+    n_pages = len(pages)
+    # 1 : catalogue, 2 : arbre des pages, 3 : police, puis (page, contenu) par page
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    }
+    kids = []
+    for i, text in enumerate(pages):
+        page_obj, content_obj = 4 + 2 * i, 5 + 2 * i
+        kids.append(f"{page_obj} 0 R")
+        lines = [f"({_pdf_escape(line)}) Tj T*" for line in text.split("\n")]
+        stream = ("BT /F1 11 Tf 14 TL 50 800 Td " + " ".join(lines) + " ET").encode("latin-1", "replace")
+        objects[page_obj] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_obj} 0 R >>"
+        ).encode()
+        objects[content_obj] = b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {n_pages} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for num in sorted(objects):
+        offsets[num] = len(out)
+        out += b"%d 0 obj\n" % num + objects[num] + b"\nendobj\n"
+    xref_pos = len(out)
+    size = max(objects) + 1
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % size
+    for num in range(1, size):
+        out += b"%010d 00000 n \n" % offsets[num]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, xref_pos)
+    return bytes(out)
+
+
+def synthetic_pages(n_pages, seed=0, lines_per_page=30):
+    """Génère n_pages pages de texte pseudo-pédagogique, déterministes pour un seed donné."""
+    words = ("roi", "empire", "guerre", "paix", "siècle", "bataille", "château", "église", "peuple",
+             "révolution", "république", "commerce", "paysan", "seigneur", "ville", "traité",
+             "Charlemagne", "Clovis", "Napoléon", "Louis", "France", "Paris", "Rome", "Gaule")
+    pages = []
+    for p in range(n_pages):
+        lines = []
+        for l in range(lines_per_page):
+            k = (seed * 7919 + p * 131 + l * 17)
+            lines.append(" ".join(words[(k + j * j) % len(words)] for j in range(12)) + ".")
+        pages.append(f"Page {p + 1}\n" + "\n".join(lines))
+    return pages
+
+
+class _FakeResponse(dict):
+    def __init__(self, status, headers):
+        super().__init__(headers)
+        self.status = status
+
+
+class _FakeHttp:
+    """Transport minimal compatible avec MediaIoBaseDownload (requêtes Range)."""
+
+    def __init__(self, drive):
+        self.drive = drive
+
+    def request(self, uri, method="GET", headers=None, **kwargs):
+        file_id = uri.rsplit("/", 1)[-1]
+        data = self.drive.content[file_id]
+        start, end = 0, len(data) - 1
+        if headers and "range" in headers:
+            start, end = (int(x) for x in headers["range"].split("=")[1].split("-"))
+        chunk = data[start:end + 1]
+        self.drive.simulate_request(len(chunk), file_id)
+        end = start + len(chunk) - 1
+        return _FakeResponse(206, {"content-range": f"bytes {start}-{end}/{len(data)}"}), chunk
+
+
+class _FakeRequest:
+    def __init__(self, drive, result=None, uri=None):
+        self.drive = drive
+        self.result = result
+        self.uri = uri
+        self.headers = {}
+        self.http = _FakeHttp(drive)
+
+    def execute(self):
+        self.drive.simulate_request(0)
+        return self.result
+
+
+class _FakeBatch:
+    """Equivalent de BatchHttpRequest : toutes les sous-requêtes partent en une seule requête HTTP."""
+
+    def __init__(self, drive, callback):
+        self.drive = drive
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id=None):
+        # Comme BatchHttpRequest.add : un id de requête ne peut apparaître qu'une fois par batch
+        if any(request_id == existing for existing, _ in self.requests):
+            raise KeyError(f"A request with this ID already exists: {request_id}")
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        self.drive.simulate_request(0)
+        for request_id, request in self.requests:
+            self.callback(request_id, request.result, None)
+
+
+class _FakeFiles:
+    def __init__(self, drive):
+        self.drive = drive
+
+    def get_media(self, fileId, **kwargs):
+        return _FakeRequest(self.drive, uri=f"fake://drive/files/{fileId}")
+
+    def get(self, fileId, fields=None, **kwargs):
+        return _FakeRequest(self.drive, result=self.drive.metadata(fileId, fields))
+
+    def list(self, q, fields=None, pageSize=1000, pageToken=None, **kwargs):
+        parent = q.split("'")[1]
+        start = int(pageToken or 0)
+        children = self.drive.children[parent][start:start + pageSize]
+        resp = {"files": [self.drive.metadata(file_id) for file_id in children]}
+        if start + pageSize < len(self.drive.children[parent]):
+            resp["nextPageToken"] = str(start + pageSize)
+        return _FakeRequest(self.drive, result=resp)
+
+
+class FakeDriveService:
+    """
+    Stand-in local du service retourné par build_drive_service().
+    latency : délai fixe par requête HTTP (sec), bandwidth : débit simulé (octets/sec).
+    file_latency : délai supplémentaire par fichier ({file_id: sec}), ajouté à chaque requête de téléchargement.
+    """
+
+    def __init__(self, latency=0.05, bandwidth=20e6):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.file_latency = {}
+        self.files_meta = {}
+        self.content = {}
+        self.children = defaultdict(list)
+        self.request_count = 0
+        self._lock = threading.Lock()
+
+    def simulate_request(self, n_bytes, file_id=None):
+        with self._lock:
+            self.request_count += 1
+        time.sleep(self.latency + self.file_latency.get(file_id, 0) + n_bytes / self.bandwidth)
+
+    def add_folder(self, folder_id, name, parent=None):
+        self.files_meta[folder_id] = {"id": folder_id, "name": name, "mimeType": FOLDER_MIME}
+        if parent:
+            self.children[parent].append(folder_id)
+
+    def add_shortcut(self, shortcut_id, name, target_id, parent):
+        self.files_meta[shortcut_id] = {
+            "id": shortcut_id, "name": name, "mimeType": SHORTCUT_MIME,
+            "shortcutDetails": {"targetId": target_id, "targetMimeType": self.files_meta[target_id]["mimeType"]},
+        }
+        self.children[parent].append(shortcut_id)
+
+    def add_file(self, file_id, name, data, parent, mime=PDF_MIME):
+        self.files_meta[file_id] = {
+            "id": file_id, "name": name, "mimeType": mime, "size": str(len(data)),
+            "md5Checksum": hashlib.md5(data).hexdigest(), "modifiedTime": "2025-09-01T08:00:00.000Z",
+        }
+        self.content[file_id] = data
+        self.children[parent].append(file_id)
+
+    def metadata(self, file_id, fields=None):
+        return dict(self.files_meta[file_id])
+
+    def files(self):
+        return _FakeFiles(self)
+
+    def new_batch_http_request(self, callback=None):
+        return _FakeBatch(self, callback)
+
+
+def build_fake_drive(n_files, pages_per_file=5, folder_id="fakefolder0000", latency=0.05, bandwidth=20e6):
+    """Crée un dossier factice contenant n_files PDFs synthétiques. Retourne (service, folder_id, file_ids)."""
+    drive = FakeDriveService(latency=latency, bandwidth=bandwidth)
+    drive.add_folder(folder_id, "cours")
+    file_ids = []
+    for i in range(n_files):
+        file_id = f"fakepdf{i:06d}"
+        drive.add_file(file_id, f"cours_{i:03d}.pdf", make_pdf_bytes(synthetic_pages(pages_per_file, seed=i)), folder_id)
+        file_ids.append(file_id)
+    return drive, folder_id, file_ids
@@ -1,17 +1,73 @@
-from src.pipeline.config import DRIVE_FOLDER_URL, SCOPES, SHORTCUT_MIME, FOLDER_MIME 
+from src.pipeline.config import DRIVE_FOLDER_URL, SCOPES, SHORTCUT_MIME, FOLDER_MIME, LISTING_MAX_WORKERS
 import pickle, os, io
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaIoBaseDownload
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
+import httplib2
 from typing import List, Dict, Optional
 import re
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse, parse_qs
 from googleapiclient.errors import HttpError
 import json
 
-def authenticate_google():
+class RequestCounter:
+    """Compteur thread-safe des requêtes HTTP envoyées à l'API Drive (affiché dans les timings du pipeline)."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def add(self, n: int = 1):
+        with self._lock:
+            self.count += n
+
+drive_requests = RequestCounter()
+# Requêtes du seul listing (files.list, métadonnées des cibles de raccourcis), aussi comptées dans drive_requests
+listing_requests = RequestCounter()
+
+
+class ListingStats:
+    """
+    Mesures d'un listing, relevées par iter_folder_tree lui-même : en mode flux, le listing se poursuit
+    pendant les téléchargements, sa durée n'est connue qu'à la production du dernier fichier.
+    """
+
+    def __init__(self):
+        self.start = time.time()
+        self.duration = None  # None tant que le listing n'est pas terminé
+        self.folders = 0
+        self.files = 0
+        self._requests_start = listing_requests.count
+
+    @property
+    def requests(self) -> int:
+        return listing_requests.count - self._requests_start
+
+    def finish(self):
+        self.duration = time.time() - self.start
+
+    def __str__(self):
+        if self.duration is None:
+            return f"listing en cours : {self.folders} dossiers, {self.files} fichiers"
+        return (f"listing : {self.folders} dossiers, {self.files} fichiers, {self.requests} requêtes "
+                f"en {self.duration:.1f} sec")
+
+# Champs décrivant un fichier : demandés dans le listing, pour ne plus avoir à rappeler files().get par fichier
+FILE_FIELDS = "id,name,mimeType,size,md5Checksum,modifiedTime"
+BATCH_MAX_SIZE = 100  # limite de l'endpoint batch de l'API Drive
+
+def get_drive_credentials():
+    """
+    Identifiants Google (fichier token, rafraîchi ou recréé si besoin).
+    À appeler une seule fois par run : les services des threads partagent ensuite ces identifiants.
+    """
     creds = None
     if os.path.exists("token"):
         with open("token", "rb") as token:
@@ -30,7 +86,18 @@ def authenticate_google():
         with open("token", "wb") as token:
             pickle.dump(creds, token)
 
-    return build("drive", "v3", credentials=creds)
+    return creds
+
+def build_drive_service(creds):
+    """Service Drive sur son propre client httplib2 (non thread-safe), avec des identifiants partagés."""
+    return build("drive", "v3", http=AuthorizedHttp(creds, http=httplib2.Http()))
+
+def drive_service_factory(creds):
+    """Fabrique de services Drive, un par thread, sans nouvelle authentification ni écriture du token."""
+    return lambda: build_drive_service(creds)
+
+def authenticate_google():
+    return build_drive_service(get_drive_credentials())
 
 id_re = re.compile(r"[A-Za-z0-9_-]{10,}")
 
@@ -58,6 +125,7 @@ def get_folder_drive_id(folder_url):
 
 # Vérifie que l'id soit bien un id de dossier drive et qu'il soit accessible
 def get_folder_meta(service, folder_id: str) -> dict:
+    drive_requests.add()
     meta = service.files().get(
         fileId=folder_id,
         fields="id,name,mimeType,driveId,trashed,shortcutDetails,webViewLink",
@@ -85,9 +153,11 @@ def get_folder_meta(service, folder_id: str) -> dict:
 def iter_children(service, folder_id: str):
     page_token = None
     while True:
+        drive_requests.add()
+        listing_requests.add()
         resp = service.files().list(
             q=f"'{folder_id}' in parents and trashed=false",
-            fields="nextPageToken, files(id,name,mimeType,shortcutDetails)",
+            fields=f"nextPageToken, files({FILE_FIELDS},shortcutDetails)",
             pageSize=1000,
             spaces="drive",
             corpora="allDrives",
@@ -103,12 +173,11 @@ def iter_children(service, folder_id: str):
 
 # Vérifie les lien ét les métadatas
 def documents_in_folder(service, folder_meta, recursive=False):
-    drive_id = folder_meta.get("driveId")  # None si My Drive
-
-    out, queue = [], [folder_meta["id"]]
+    out, seen = [], set()
+    queue, visited = deque([folder_meta["id"]]), {folder_meta["id"]}
     while queue:
-        current = queue.pop(0)
-        for item in iter_children(service, current, drive_id):
+        current = queue.popleft()
+        for item in iter_children(service, current):
             mt = item.get("mimeType")
             # suivre les raccourcis
             if mt == SHORTCUT_MIME:
@@ -116,13 +185,15 @@ def documents_in_folder(service, folder_meta, recursive=False):
                 item = {"id": det.get("targetId"), "mimeType": det.get("targetMimeType")}
 
             if item["mimeType"] == FOLDER_MIME:
-                if recursive:
+                # visited : un raccourci peut pointer vers un dossier parent (cycle)
+                if recursive and item["id"] not in visited:
+                    visited.add(item["id"])
                     queue.append(item["id"])
-            else:
+            elif item["id"] not in seen:
+                seen.add(item["id"])
                 out.append(item["id"])
     return out
 
-
 FOLDER_MIME   = "application/vnd.google-apps.folder"
 SHORTCUT_MIME = "application/vnd.google-apps.shortcut"
 PDF_MIME      = "application/pdf"  # si tu veux filtrer plus tard
@@ -153,11 +224,75 @@ def list_document_ids_shallow(service, folder_id: str, pdf_only: bool = False) -
         ids.append(item["id"])
     return ids
 
-# Fonction globale pour obtenir les ids de tous les enfants pdfs de mon folder drive
-def get_pdfs_ids(service, drive_folder_url: str, pdf_only: bool = False) -> list[str]:
-    ids = []
-    folder_id = get_folder_drive_id(drive_folder_url)
-    get_folder_meta(service, folder_id)
+# Descripteur d'un fichier à traiter : tout ce dont l'extracteur et le cache ont besoin, sans requête supplémentaire
+def file_descriptor(item: dict) -> dict:
+    return {
+        "id": item["id"],
+        "name": item.get("name"),
+        "size": int(item["size"]) if item.get("size") else None,
+        "mimeType": item.get("mimeType"),
+        "md5Checksum": item.get("md5Checksum"),
+        "modifiedTime": item.get("modifiedTime"),
+    }
+
+def get_files_metadata(service, file_ids: list[str]) -> dict:
+    """
+    Récupère les métadonnées de plusieurs fichiers via l'endpoint batch de l'API Drive
+    (une requête HTTP pour BATCH_MAX_SIZE fichiers au lieu d'une par fichier).
+    Renvoie {file_id: descripteur}, les fichiers inaccessibles sont absents.
+    """
+    metas = {}
+    # Un id en double (deux raccourcis vers le même fichier) ferait lever KeyError à BatchHttpRequest.add
+    file_ids = list(dict.fromkeys(file_ids))
+
+    def callback(request_id, response, exception):
+        if exception is None:
+            metas[request_id] = file_descriptor(response)
+        else:
+            print(f"⚠️ Métadonnées indisponibles pour {request_id} : {exception}")
+
+    for start in range(0, len(file_ids), BATCH_MAX_SIZE):
+        batch = service.new_batch_http_request(callback=callback)
+        for file_id in file_ids[start:start + BATCH_MAX_SIZE]:
+            batch.add(service.files().get(fileId=file_id, fields=FILE_FIELDS, supportsAllDrives=True), request_id=file_id)
+        drive_requests.add()
+        listing_requests.add()
+        batch.execute()
+    return metas
+
+def iter_complete_descriptors(service, files):
+    """
+    Descripteurs des fichiers, dans l'ordre, complétés si besoin : un id seul ou un descripteur sans nom
+    (cible de raccourci dont les métadonnées manquaient) est complété par get_files_metadata,
+    par lots de BATCH_MAX_SIZE, au lieu d'une requête files().get par fichier.
+    files : liste ou générateur d'ids ou de descripteurs.
+    """
+    pending = []
+
+    def flush():
+        metas = get_files_metadata(service, [f["id"] for f in pending])
+        completed = [metas.get(f["id"], f) for f in pending]
+        pending.clear()
+        return completed
+
+    for f in files:
+        f = {"id": f} if isinstance(f, str) else f
+        if f.get("name") is None:
+            pending.append(f)
+            if len(pending) >= BATCH_MAX_SIZE:
+                yield from flush()
+            continue
+        # Ordre conservé : les descripteurs incomplets qui précèdent sont complétés d'abord
+        if pending:
+            yield from flush()
+        yield f
+    if pending:
+        yield from flush()
+
+# Liste un seul dossier : descripteurs des fichiers retenus et ids des sous-dossiers (raccourcis compris)
+def list_folder_level(service, folder_id: str, pdf_only: bool = False) -> tuple[list[dict], list[str]]:
+    files, subfolders = [], []
+    shortcut_targets = []
 
     for item in iter_children(service, folder_id):
         mt = item.get("mimeType")
@@ -167,18 +302,89 @@ def get_pdfs_ids(service, drive_folder_url: str, pdf_only: bool = False) -> list
             tgt_id   = det.get("targetId")
             tgt_mime = det.get("targetMimeType")
             if tgt_mime == FOLDER_MIME:
-                continue  # ici on ne descend pas, c'est la version "shallow"
+                if tgt_id:
+                    subfolders.append(tgt_id)
+                continue
             if pdf_only and tgt_mime != PDF_MIME:
                 continue
             if tgt_id:
-                ids.append(tgt_id)
+                # Les métadonnées de la cible ne sont pas dans le listing : complétées en batch plus bas
+                files.append({"id": tgt_id})
+                shortcut_targets.append(tgt_id)
             continue
 
         if mt == FOLDER_MIME:
+            subfolders.append(item["id"])
             continue
 
         if pdf_only and mt != PDF_MIME:
             continue
-        ids.append(item["id"])
+        files.append(file_descriptor(item))
+
+    if shortcut_targets:
+        metas = get_files_metadata(service, shortcut_targets)
+        files = [metas.get(f["id"], f) for f in files]
+
+    return files, subfolders
+
+def iter_folder_tree(service, root_id: str, pdf_only: bool = False, recursive: bool = True,
+                     max_workers: int = LISTING_MAX_WORKERS, service_factory=None, stats: ListingStats = None):
+    """
+    Parcours en largeur (BFS) de l'arborescence Drive, les dossiers étant listés en parallèle
+    par un pool borné de max_workers threads.
+    Générateur : les descripteurs de fichiers sont produits au fil de l'exploration, dans l'ordre BFS,
+    pour que les téléchargements démarrent avant la fin du listing.
+    Un fichier atteint plusieurs fois (raccourcis) n'est produit qu'une fois, un dossier n'est listé
+    qu'une fois (protection contre les cycles de raccourcis).
+    service_factory : fonction qui crée un service Drive par thread (httplib2 n'est pas thread-safe).
+    Sans factory, le service unique n'est pas partagé entre threads : les dossiers sont listés un par un.
+    stats : ListingStats optionnel, mis à jour au fil du parcours (durée relevée après le dernier dossier).
+    """
+    local = threading.local()
+    if service_factory is None:
+        max_workers = 1
+
+    def list_folder(folder_id):
+        if service_factory is None:
+            worker_service = service
+        else:
+            if not hasattr(local, "service"):
+                local.service = service_factory()
+            worker_service = local.service
+        return list_folder_level(worker_service, folder_id, pdf_only)
+
+    visited, seen_files = {root_id}, set()
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        pending = deque([executor.submit(list_folder, root_id)])
+        while pending:
+            # Consommation dans l'ordre de soumission : résultat déterministe, les autres dossiers
+            # continuent d'être listés en arrière-plan
+            files, subfolders = pending.popleft().result()
+            if stats is not None:
+                stats.folders += 1
+            if recursive:
+                for folder_id in subfolders:
+                    if folder_id not in visited:
+                        visited.add(folder_id)
+                        pending.append(executor.submit(list_folder, folder_id))
+            for f in files:
+                if f["id"] not in seen_files:
+                    seen_files.add(f["id"])
+                    if stats is not None:
+                        stats.files += 1
+                    yield f
+    if stats is not None:
+        stats.finish()
+
+# Valide le dossier puis renvoie le générateur de descripteurs (id, name, size, mimeType, md5Checksum, modifiedTime)
+def iter_pdfs_ids(service, drive_folder_url: str, pdf_only: bool = False, recursive: bool = False,
+                  max_workers: int = LISTING_MAX_WORKERS, service_factory=None, stats: ListingStats = None):
+    folder_id = get_folder_drive_id(drive_folder_url)
+    folder_meta = get_folder_meta(service, folder_id)  # lève une erreur dès l'appel si le dossier est invalide
+    return iter_folder_tree(service, folder_meta["id"], pdf_only, recursive, max_workers, service_factory, stats)
 
-    return ids
\ No newline at end of file
+# Fonction globale pour obtenir les descripteurs (id, name, size, mimeType, md5Checksum, modifiedTime)
+# de tous les enfants pdfs de mon folder drive (et de ses sous-dossiers si recursive=True)
+def get_pdfs_ids(service, drive_folder_url: str, pdf_only: bool = False, recursive: bool = False,
+                 max_workers: int = LISTING_MAX_WORKERS, service_factory=None, stats: ListingStats = None) -> list[dict]:
+    return list(iter_pdfs_ids(service, drive_folder_url, pdf_only, recursive, max_workers, service_factory, stats))
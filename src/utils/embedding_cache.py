@@ -0,0 +1,225 @@
+import os
+import json
+import time
+import fcntl
+import hashlib
+import threading
+from contextlib import contextmanager
+import numpy as np
+from src.pipeline.config import EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_MAX_BYTES
+
+# À incrémenter si le format de l'index ou des vecteurs change : l'ancien cache est alors ignoré
+EMBEDDING_CACHE_FORMAT = 1
+
+
+class EmbeddingCache:
+    """
+    Cache disque des embeddings des textes, pour un modèle donné.
+    Clé : (nom du modèle, sha1 du texte) : un dossier par modèle, le sha1 dans l'index.
+    Un texte déjà encodé (en-têtes répétés, programmes communs, fichier re-déposé) n'est plus recalculé.
+    Stockage : matrice float32 (emplacements x dimension) lue et écrite via np.memmap (vectors.f32),
+    et index JSON (index.json) donnant l'emplacement et la date de dernier accès de chaque texte.
+    Eviction LRU dès que les vecteurs dépassent max_bytes ; les emplacements libérés sont réutilisés,
+    le fichier des vecteurs ne dépasse donc jamais le budget.
+    Les lectures ne réécrivent pas l'index : les dates d'accès sont gardées en mémoire et enregistrées
+    par put_many ou flush (fin du job).
+    Plusieurs processus peuvent partager le dossier : verrou fcntl (partagé pour lire, exclusif pour écrire)
+    et index relu avant chaque opération s'il a été réécrit par un autre processus.
+    """
+
+    def __init__(self, model_name, cache_dir=EMBEDDING_CACHE_DIR, max_bytes=EMBEDDING_CACHE_MAX_BYTES):
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.cache_dir = os.path.join(cache_dir, hashlib.sha1(model_name.encode("utf-8")).hexdigest()[:16])
+        self.hits = 0
+        self.misses = 0
+        self.dim = None
+        self.entries = {}  # sha1 du texte -> [emplacement, date de dernier accès]
+        self._vectors = None
+        self._touched = {}  # dates d'accès pas encore enregistrées dans l'index
+        self._index_state = None  # index.json tel que chargé ou écrit en dernier (inode, date, taille)
+        self._lock = threading.Lock()
+        with self._locked(exclusive=False):
+            self._refresh()
+
+    @staticmethod
+    def key(text):
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    @property
+    def _index_path(self):
+        return os.path.join(self.cache_dir, "index.json")
+
+    @property
+    def _vectors_path(self):
+        return os.path.join(self.cache_dir, "vectors.f32")
+
+    @property
+    def _lock_path(self):
+        return os.path.join(self.cache_dir, "lock")
+
+    @property
+    def capacity(self):
+        return 0 if self._vectors is None else self._vectors.shape[0]
+
+    @contextmanager
+    def _locked(self, exclusive):
+        """Verrou inter-processus sur le dossier du cache."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self._lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _current_index_state(self):
+        try:
+            st = os.stat(self._index_path)
+        except OSError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _refresh(self):
+        """Relit l'index s'il a changé sur disque (autre processus) ; les dates d'accès en mémoire sont conservées."""
+        state = self._current_index_state()
+        if state == self._index_state:
+            return
+        self.dim = None
+        self.entries = {}
+        self._vectors = None
+        self._load()
+        self._index_state = state
+        for key, last_used in self._touched.items():
+            if key in self.entries:
+                self.entries[key][1] = max(self.entries[key][1], last_used)
+
+    def _load(self):
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return
+        if index.get("format") != EMBEDDING_CACHE_FORMAT or index.get("model_name") != self.model_name:
+            return
+        dim, capacity = index["dim"], index["capacity"]
+        try:
+            size = os.path.getsize(self._vectors_path)
+        except OSError:
+            return
+        if size < capacity * dim * 4:
+            return
+        self.dim = dim
+        self.entries = {key: [slot, last_used] for key, slot, last_used in index["entries"]}
+        if capacity:
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, dim))
+
+    def _save_index(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        index = {
+            "format": EMBEDDING_CACHE_FORMAT, "model_name": self.model_name, "dim": self.dim,
+            "capacity": self.capacity,
+            "entries": [[key, slot, last_used] for key, (slot, last_used) in self.entries.items()],
+        }
+        tmp_path = f"{self._index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self._index_path)  # écriture atomique
+        self._index_state = self._current_index_state()
+        self._touched = {}
+
+    def _resize(self, capacity, reset=False):
+        """Agrandit le fichier des vecteurs à capacity emplacements (vidé si reset)."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        mode = "r+b" if not reset and os.path.exists(self._vectors_path) else "wb"
+        with open(self._vectors_path, mode) as f:
+            f.truncate(capacity * self.dim * 4)
+        if capacity:
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def get_many(self, texts):
+        """Embeddings des textes (dans le même ordre), None pour ceux absents du cache."""
+        with self._lock, self._locked(exclusive=False):
+            self._refresh()
+            now = time.time()
+            results = [None] * len(texts)
+            positions, slots = [], []
+            for i, text in enumerate(texts):
+                key = self.key(text)
+                entry = self.entries.get(key)
+                if entry is not None:
+                    # Entrée récemment utilisée (LRU) : date enregistrée au prochain put_many ou flush
+                    entry[1] = self._touched[key] = now
+                    positions.append(i)
+                    slots.append(entry[0])
+            if slots:
+                for i, vector in zip(positions, np.asarray(self._vectors[slots])):
+                    results[i] = vector
+            self.hits += len(slots)
+            self.misses += len(texts) - len(slots)
+            return results
+
+    def put_many(self, texts, vectors):
+        """Enregistre les embeddings des textes (une ligne par texte) puis applique l'éviction."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(texts):
+            return
+        with self._lock, self._locked(exclusive=True):
+            self._refresh()
+            if self.dim != vectors.shape[1]:
+                # Premier enregistrement, ou dimension différente : cache repris à zéro
+                self.dim = vectors.shape[1]
+                self.entries = {}
+                self._resize(0, reset=True)
+
+            now = time.time()
+            new = {}
+            for i, text in enumerate(texts):
+                key = self.key(text)
+                if key in self.entries:
+                    self.entries[key][1] = now
+                else:
+                    new[key] = i
+            max_entries = max(1, self.max_bytes // (4 * self.dim))
+            new = list(new.items())[-max_entries:]
+            if not new:
+                self._save_index()
+                return
+
+            # LRU : les entrées les moins récemment utilisées laissent leur emplacement aux nouvelles
+            overflow = len(self.entries) + len(new) - max_entries
+            if overflow > 0:
+                for key, _ in sorted(self.entries.items(), key=lambda item: item[1][1])[:overflow]:
+                    del self.entries[key]
+                # Index sans les entrées évincées avant de réécrire leurs emplacements
+                self._save_index()
+
+            used = {slot for slot, _ in self.entries.values()}
+            free = [slot for slot in range(self.capacity) if slot not in used]
+            if len(free) < len(new):
+                old_capacity = self.capacity
+                capacity = max(old_capacity, min(max_entries, max(len(self.entries) + len(new), 2 * old_capacity)))
+                self._resize(capacity)
+                free += range(old_capacity, capacity)
+
+            slots = free[:len(new)]
+            self._vectors[slots] = vectors[[i for _, i in new]]
+            self._vectors.flush()
+            for (key, _), slot in zip(new, slots):
+                self.entries[key] = [slot, now]
+            self._save_index()
+
+    def flush(self):
+        """Enregistre les dates d'accès des lectures (à appeler en fin de job)."""
+        with self._lock:
+            if not self._touched:
+                return
+            with self._locked(exclusive=True):
+                self._refresh()
+                self._save_index()
+
+    def stats(self):
+        return f"cache embeddings hits : {self.hits}, misses : {self.misses}"
@@ -0,0 +1,199 @@
+"""
+Registre des modèles d'embeddings du processus.
+
+Le modèle SentenceTransformer est chargé une seule fois par processus (worker du serveur de pipeline),
+à la première utilisation, puis partagé par tous les jobs : seul le premier paie le chargement.
+Chaque job obtient une vue (get_embedding_model) qui encode par lots avec le modèle partagé
+et mesure son propre débit, lot par lot. La vue s'utilise aussi comme fonction d'embedding de Chroma.
+Les textes déjà encodés lors d'un run précédent sont lus dans le cache disque (src/utils/embedding_cache.py).
+
+Backends d'exécution (EMBEDDING_BACKEND, voir bench_embedding_backends pour le compromis qualité / vitesse) :
+- "torch" : modèle PyTorch fp32 d'origine
+- "torch_int8" : couches linéaires quantifiées dynamiquement en int8 par PyTorch (aucune dépendance en plus)
+- "onnx" : modèle exporté en ONNX, exécuté par onnxruntime (extra sentence-transformers[onnx])
+- "onnx_int8" : export ONNX quantifié dynamiquement en int8, généré une fois dans EMBEDDING_ONNX_DIR
+Les vecteurs d'un backend quantifié diffèrent légèrement de ceux du modèle fp32 : le cache et la base Chroma
+les distinguent (embedding_model_key).
+"""
+import importlib.util
+import os
+import threading
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from sentence_transformers import SentenceTransformer
+
+from src.pipeline.config import EMBEDDING_MODEL_NAME, EMBEDDING_BATCH_SIZE, EMBEDDING_CACHE, \
+    EMBEDDING_BACKEND, EMBEDDING_ONNX_DIR, EMBEDDING_ONNX_QUANTIZATION
+from src.utils.embedding_cache import EmbeddingCache
+
+EMBEDDING_BACKENDS = ("torch", "torch_int8", "onnx", "onnx_int8")
+
+_models = {}
+_load_times = {}
+_lock = threading.Lock()
+
+
+def embedding_model_key(model_name: str, backend: str = EMBEDDING_BACKEND) -> str:
+    """Identifiant des vecteurs produits : nom du modèle, suivi du backend s'il ne s'agit pas du modèle fp32."""
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+
+def _require_onnx(backend: str):
+    """Dépendances des backends ONNX (extra sentence-transformers[onnx]), vérifiées avant tout téléchargement."""
+    missing = [module for module in ("onnxruntime", "optimum") if importlib.util.find_spec(module) is None]
+    if missing:
+        raise ImportError(f"Backend d'embeddings {backend} : modules manquants {', '.join(missing)} "
+                          f"(pip install 'sentence-transformers[onnx]>=3.2', voir requirements/pipeline.txt)")
+
+
+def _load_onnx_int8(model_name: str) -> SentenceTransformer:
+    """Modèle ONNX quantifié en int8, exporté au premier chargement puis relu depuis EMBEDDING_ONNX_DIR."""
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+    local_dir = os.path.join(EMBEDDING_ONNX_DIR, model_name.replace("/", "__"))
+    file_name = f"onnx/model_qint8_{EMBEDDING_ONNX_QUANTIZATION}.onnx"
+    if not os.path.exists(os.path.join(local_dir, file_name)):
+        model = SentenceTransformer(model_name, backend="onnx")
+        model.save(local_dir)
+        export_dynamic_quantized_onnx_model(model, EMBEDDING_ONNX_QUANTIZATION, local_dir)
+    return SentenceTransformer(local_dir, backend="onnx", model_kwargs={"file_name": file_name})
+
+
+def _load(model_name: str, backend: str) -> SentenceTransformer:
+    if backend == "torch":
+        return SentenceTransformer(model_name)
+    if backend == "torch_int8":
+        import torch
+        model = SentenceTransformer(model_name, device="cpu")
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    if backend == "onnx":
+        _require_onnx(backend)
+        return SentenceTransformer(model_name, backend="onnx")
+    if backend == "onnx_int8":
+        _require_onnx(backend)
+        return _load_onnx_int8(model_name)
+    raise ValueError(f"Backend d'embeddings inconnu : {backend} (attendu : {', '.join(EMBEDDING_BACKENDS)})")
+
+
+def load_embedding_model(model_name: str = EMBEDDING_MODEL_NAME, backend: str = EMBEDDING_BACKEND) -> SentenceTransformer:
+    """Modèle d'embeddings, chargé au premier appel puis réutilisé (thread-safe)."""
+    key = embedding_model_key(model_name, backend)
+    model = _models.get(key)
+    if model is None:
+        with _lock:
+            model = _models.get(key)
+            if model is None:
+                start = time.time()
+                model = _load(model_name, backend)
+                _load_times[key] = time.time() - start
+                print(f"Chargement du modèle d'embeddings {key} : {_load_times[key]:.1f} sec")
+                _models[key] = model
+    return model
+
+
+def loaded_embedding_models() -> list[str]:
+    return list(_models)
+
+
+
+class EmbeddingModel(Embeddings):
+    """
+    Vue sur le modèle d'embeddings partagé, propre à un job : encode par lots de batch_size textes
+    et garde la durée de chaque lot. Compatible avec l'interface Embeddings de LangChain (Chroma).
+    cache : EmbeddingCache consulté avant d'encoder ; seuls les textes absents passent dans le modèle.
+    Comme SentenceTransformer.encode (qui ne trie que l'intérieur de chaque appel), les textes sont triés
+    par longueur en caractères avant le découpage en lots : chaque lot n'est complété (padding) que jusqu'à
+    la longueur de textes voisins. L'ordre d'origine est restitué.
+    """
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, batch_size: int = EMBEDDING_BATCH_SIZE,
+                 cache: EmbeddingCache = None, backend: str = EMBEDDING_BACKEND):
+        self.model_name = model_name
+        self.backend = backend
+        self.key = embedding_model_key(model_name, backend)
+        self.batch_size = batch_size
+        self.cache = cache
+        self.was_loaded = None  # modèle déjà chaud au premier encodage de cette vue ?
+        self.batch_sizes = []
+        self.batch_durations = []
+
+    @property
+    def model(self) -> SentenceTransformer:
+        return load_embedding_model(self.model_name, self.backend)
+
+    def encode(self, texts) -> np.ndarray:
+        """Embeddings des textes (une ligne par texte, dans l'ordre), lus en cache ou calculés lot par lot."""
+        texts = list(texts)
+        if self.cache is None or not texts:
+            return self._encode(texts)
+        vectors = self.cache.get_many(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            # Un texte répété n'est encodé qu'une fois
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            encoded = self._encode(unique)
+            self.cache.put_many(unique, encoded)
+            by_text = dict(zip(unique, encoded))
+            for i in missing:
+                vectors[i] = by_text[texts[i]]
+        return np.vstack(vectors)
+
+    def _encode(self, texts) -> np.ndarray:
+        if self.was_loaded is None:
+            self.was_loaded = self.key in _models
+        model = self.model
+        if not texts:
+            return np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+        # Même tri que SentenceTransformer.encode, sans passe de tokenisation supplémentaire
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        vectors = []
+        for first in range(0, len(texts), self.batch_size):
+            batch = [texts[i] for i in order[first:first + self.batch_size]]
+            start = time.perf_counter()
+            vectors.append(model.encode(batch, batch_size=len(batch), show_progress_bar=False, convert_to_numpy=True))
+            self.batch_durations.append(time.perf_counter() - start)
+            self.batch_sizes.append(len(batch))
+        # Retour à l'ordre des textes reçus
+        sorted_vectors = np.vstack(vectors)
+        result = np.empty_like(sorted_vectors)
+        result[order] = sorted_vectors
+        return result
+
+    def embed_documents(self, texts):
+        # Mêmes entrées que HuggingFaceEmbeddings, utilisé auparavant par save_to_chroma
+        return self.encode([text.replace("\n", " ") for text in texts]).tolist()
+
+    def embed_query(self, text):
+        # Requêtes (thèmes) hors cache : elles ne se répètent pas d'un corpus à l'autre
+        return self._encode([text.replace("\n", " ")])[0].tolist()
+
+    def flush(self):
+        """Fin du job : dates d'accès du cache enregistrées sur disque."""
+        if self.cache is not None:
+            self.cache.flush()
+
+    def stats(self) -> str:
+        if self.was_loaded is None:
+            model_stats = "modèle d'embeddings non utilisé"
+        else:
+            load = "déjà chargé" if self.was_loaded else f"chargé en {_load_times.get(self.key, 0):.1f} sec"
+            model_stats = f"modèle d'embeddings {load}"
+        if self.batch_sizes:
+            rates = np.array(self.batch_sizes) / np.maximum(self.batch_durations, 1e-9)
+            total = sum(self.batch_sizes) / max(sum(self.batch_durations), 1e-9)
+            model_stats += (f", {sum(self.batch_sizes)} textes en {len(self.batch_sizes)} lots, {total:.0f} textes/sec "
+                            f"(par lot : min {rates.min():.0f}, max {rates.max():.0f})")
+        if self.cache is not None:
+            model_stats += f", {self.cache.stats()}"
+        return model_stats
+
+
+def get_embedding_model(model_name: str = EMBEDDING_MODEL_NAME, batch_size: int = EMBEDDING_BATCH_SIZE,
+                        use_cache: bool = EMBEDDING_CACHE, backend: str = EMBEDDING_BACKEND) -> EmbeddingModel:
+    """
+    Vue sur le modèle partagé, avec ses propres mesures de débit (et de cache).
+    Ne charge rien avant le premier encodage.
+    """
+    cache = EmbeddingCache(embedding_model_key(model_name, backend)) if use_cache else None
+    return EmbeddingModel(model_name, batch_size, cache, backend)
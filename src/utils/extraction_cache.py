@@ -0,0 +1,136 @@
+import os
+import json
+import hashlib
+import threading
+from src.pipeline.config import EXTRACTION_CACHE_DIR, EXTRACTION_CACHE_MAX_BYTES
+
+# L'éviction redescend à cette part du budget : le dossier n'est pas reparcouru à chaque écriture
+_EVICT_TARGET = 0.9
+
+class ExtractionCache:
+    """
+    Cache disque du texte extrait des PDFs, page par page.
+    Clé : id du fichier Drive + md5Checksum/modifiedTime issus du listing du dossier.
+    Un fichier inchangé depuis le dernier run n'est ni re-téléchargé ni relu par PdfReader.
+    Eviction LRU (date de dernier accès) dès que la taille totale dépasse max_bytes : la taille est tenue
+    à jour en mémoire, le dossier n'est parcouru qu'au premier enregistrement et au dépassement du budget.
+    Une entrée illisible (run interrompu, disque plein) compte comme absente et est supprimée.
+    """
+
+    def __init__(self, cache_dir=EXTRACTION_CACHE_DIR, max_bytes=EXTRACTION_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._total = None  # taille des entrées, calculée au premier put
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(file):
+        """Clé de cache d'un fichier du listing Drive, None si sa version est inconnue (ex : cible de raccourci)."""
+        if not isinstance(file, dict):
+            return None
+        md5, modified = file.get("md5Checksum"), file.get("modifiedTime")
+        if not md5 and not modified:
+            return None
+        return hashlib.sha1(f"{file['id']}:{md5 or ''}:{modified or ''}".encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def contains(self, file):
+        """Indique si la version du fichier est en cache, sans compter de hit/miss."""
+        key = self.key(file)
+        return key is not None and os.path.exists(self._path(key))
+
+    def get(self, file):
+        """Renvoie {"file_name", "pages"} si le fichier est en cache dans cette version, sinon None."""
+        key = self.key(file)
+        entry = None
+        if key:
+            path = self._path(key)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+                if not isinstance(entry, dict) or not isinstance(entry.get("pages"), list):
+                    raise ValueError(f"entrée de cache invalide : {path}")
+                os.utime(path)  # marque l'entrée comme récemment utilisée (LRU)
+            except OSError:
+                entry = None
+            except ValueError:
+                # Entrée corrompue : supprimée, le fichier sera relu puis réenregistré
+                entry = None
+                self._remove(path)
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return entry
+
+    def put(self, file, file_name, pages):
+        """Enregistre le texte des pages (liste de str, dans l'ordre) puis applique l'éviction."""
+        key = self.key(file)
+        if not key:
+            return
+        path = self._path(key)
+        # Fichier temporaire propre au processus et au thread : plusieurs jobs peuvent écrire la même entrée
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"file_name": file_name, "pages": pages}, f, ensure_ascii=False)
+        size = os.path.getsize(tmp_path)
+        with self._lock:
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            os.replace(tmp_path, path)  # écriture atomique : pas d'entrée tronquée si le run est interrompu
+            if self._total is None:
+                self._total = sum(size for _, size, _ in self._scan())
+            else:
+                self._total += size - replaced
+            over_budget = self._total > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _scan(self):
+        """(date de dernier accès, taille, nom) des entrées présentes sur disque."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+        return entries
+
+    def evict(self):
+        """
+        Supprime les entrées les moins récemment utilisées jusqu'à _EVICT_TARGET de max_bytes.
+        Le dossier est reparcouru : la taille tient alors compte des entrées écrites par d'autres processus.
+        """
+        with self._lock:
+            entries = self._scan()
+            total = sum(size for _, size, _ in entries)
+            if total > self.max_bytes:
+                target = int(self.max_bytes * _EVICT_TARGET)
+                for _, size, name in sorted(entries):
+                    if total <= target:
+                        break
+                    self._remove(os.path.join(self.cache_dir, name))
+                    total -= size
+            self._total = total
+
+    def stats(self):
+        return f"cache hits : {self.hits}, misses : {self.misses}"
@@ -1,6 +1,19 @@
 import io
+import os
+import mmap
+import math
+import multiprocessing
+import shutil
+import tempfile
+import threading
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from pypdf import PdfReader
 from googleapiclient.http import MediaIoBaseDownload
+from src.pipeline.config import EXTRACTION_MAX_WORKERS, EXTRACTION_PROCESS_WORKERS, EXTRACTION_PROCESS_MIN_PAGES, \
+    DOWNLOAD_SPILL_THRESHOLD
+from src.utils.drive_import import drive_requests, iter_complete_descriptors
 
 #    Télécharge le PDF Drive dans un buffer mémoire (BytesIO) sans le stocker sur disque.
 def download_to_bytesio(service, file_id: str, chunk_size: int = 1 << 20) -> io.BytesIO:
@@ -9,37 +22,231 @@ def download_to_bytesio(service, file_id: str, chunk_size: int = 1 << 20) -> io.
     downloader = MediaIoBaseDownload(buf, request, chunksize=chunk_size)
     done = False
     while not done:
+        drive_requests.add()
         _, done = downloader.next_chunk()
     buf.seek(0)
     return buf
 
-#    Lit le PDF directement depuis le BytesIO avec pypdf et renvoie le texte concaténé.
-def extract_text_pypdf_in_memory(service, file_id: str, counter: int) -> str:
-    pdf_buf = download_to_bytesio(service, file_id)
-    reader = PdfReader(pdf_buf)
+class MappedPdf:
+    """
+    PDF stocké sur disque et lu via mmap : les pages du fichier sont chargées à la demande par l'OS
+    au lieu d'occuper la RAM du processus. Le fichier temporaire est supprimé à la fermeture (delete=True).
+    """
+
+    def __init__(self, path: str, delete: bool = True):
+        self.path = path
+        self.delete = delete
+        self._file = open(path, "rb")
+        self.mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.mmap.close()
+        self._file.close()
+        if self.delete and os.path.exists(self.path):
+            os.remove(self.path)
+
+#    Télécharge un gros PDF Drive dans un fichier temporaire, par blocs, sans jamais le garder entier en RAM.
+def download_to_tempfile(service, file_id: str, chunk_size: int = 1 << 20) -> MappedPdf:
+    request = service.files().get_media(fileId=file_id)
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            downloader = MediaIoBaseDownload(f, request, chunksize=chunk_size)
+            done = False
+            while not done:
+                drive_requests.add()
+                _, done = downloader.next_chunk()
+        return MappedPdf(path)
+    except BaseException:
+        os.remove(path)
+        raise
+
+# Choisit le mode de téléchargement selon la taille annoncée dans le descripteur
+def download_pdf(service, file: dict):
+    if (file.get("size") or 0) > DOWNLOAD_SPILL_THRESHOLD:
+        return download_to_tempfile(service, file["id"])
+    return download_to_bytesio(service, file["id"])
+
+# Même logique pour un flux déjà ouvert (membre d'archive) : copie sur disque par blocs au-delà du seuil
+def buffer_stream(stream, size: int):
+    if (size or 0) > DOWNLOAD_SPILL_THRESHOLD:
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(fd, "wb") as f:
+            shutil.copyfileobj(stream, f, 1 << 20)
+        return MappedPdf(path)
+    return io.BytesIO(stream.read())
+
+# Lit le texte de chaque page d'un PDF (BytesIO ou MappedPdf), réparti sur plusieurs processus pour les gros documents
+def extract_pages_text(pdf_buf) -> list[str]:
+    stream = pdf_buf.mmap if isinstance(pdf_buf, MappedPdf) else pdf_buf
+    # Le with vide les objets du PdfReader (références cycliques) dès la fin de la lecture,
+    # sans attendre le ramasse-miettes : le buffer du PDF est libéré immédiatement
+    with pdf_buf, PdfReader(stream) as reader:
+        n_pages = len(reader.pages)
+        if EXTRACTION_PROCESS_WORKERS > 1 and n_pages >= EXTRACTION_PROCESS_MIN_PAGES:
+            return extract_pages_text_multiprocess(pdf_buf, n_pages, EXTRACTION_PROCESS_WORKERS)
+        return [page.extract_text() or "" for page in reader.pages]
+
+# Cœur commun à toutes les sources (Drive, dossier local, archive) : consulte le cache,
+# sinon ouvre le PDF avec open_pdf(file) et renvoie un enregistrement par page
+# rss_tracker : PeakRssTracker optionnel, relève la RSS du processus pendant le traitement du fichier
+def extract_pdf_records(file: dict, counter: int, open_pdf, cache=None, rss_tracker=None) -> list[dict]:
+    cached = cache.get(file) if cache is not None else None
+    if cached is not None:
+        file_name = cached["file_name"]
+        texts = cached["pages"]
+    else:
+        file_name = file.get("name")
+        # RSS échantillonnée en continu pendant le téléchargement et la lecture des pages
+        tracking = rss_tracker.track(file["id"], file_name) if rss_tracker is not None else nullcontext()
+        with tracking:
+            pdf_buf = open_pdf(file)
+            texts = extract_pages_text(pdf_buf)
+        if cache is not None:
+            cache.put(file, file_name, texts)
 
     results = []
-    file_name = service.files().get(fileId=file_id, fields="name").execute()
-    for page_num, page in enumerate(reader.pages, start=1):
-        text = page.extract_text() or ""
+    for page_num, text in enumerate(texts, start=1):
         results.append({
             'counter': counter,
-            "file_id": file_id,
-            "file_name": file_name.get("name"),
+            "file_id": file["id"],
+            "file_name": file_name,
             "page": page_num,
             "text": text,
         })
-    print(file_name.get('name'))
+    print(file_name)
     
     return results
 
-# Itrer sur la list des id pour faire un grand tableau avec toutes les informations
-def get_all_pdfs_data(service, file_ids):
+#    Lit le PDF directement depuis le BytesIO avec pypdf et renvoie le texte concaténé.
+#    file : descripteur renvoyé par get_pdfs_ids (id, name, md5Checksum...) ou simple id Drive
+#    (get_all_pdfs_data et iter_all_pdfs_data complètent les descripteurs par lots : aucune requête par fichier ici)
+def extract_text_pypdf_in_memory(service, file, counter: int, cache=None, rss_tracker=None) -> list[dict]:
+    file = {"id": file} if isinstance(file, str) else dict(file)
+    return extract_pdf_records(file, counter, lambda file: download_pdf(service, file), cache, rss_tracker)
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+def get_process_pool(max_workers=EXTRACTION_PROCESS_WORKERS):
+    """Pool de processus partagé par tous les threads d'ingestion, créé au premier gros PDF."""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None and _process_pool._max_workers != max_workers:
+            _process_pool.shutdown()
+            _process_pool = None
+        if _process_pool is None:
+            # "spawn" : un fork depuis le pool de threads d'ingestion pourrait hériter de verrous tenus
+            _process_pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return _process_pool
+
+# Exécuté dans un processus worker : lit une plage de pages depuis le fichier mappé en mémoire
+def extract_pages_range(pdf_path: str, first_page: int, last_page: int) -> list[str]:
+    with open(pdf_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        reader = PdfReader(mm)
+        return [reader.pages[i].extract_text() or "" for i in range(first_page, last_page)]
+
+def extract_pages_text_multiprocess(pdf_buf, n_pages: int, max_workers=EXTRACTION_PROCESS_WORKERS) -> list[str]:
+    """
+    Répartit l'extraction des pages d'un PDF sur un pool de processus.
+    Les octets sont écrits une seule fois dans un fichier temporaire que chaque worker mappe en mémoire (mmap),
+    au lieu de sérialiser tout le buffer vers chaque processus.
+    Renvoie le texte de chaque page, dans l'ordre des pages.
+    """
+    # Plus de plages que de workers pour équilibrer la charge entre pages lourdes et légères
+    range_size = max(1, math.ceil(n_pages / (max_workers * 4)))
+    ranges = [(first, min(first + range_size, n_pages)) for first in range(0, n_pages, range_size)]
+
+    pool = get_process_pool(max_workers)
+    if isinstance(pdf_buf, MappedPdf):
+        # Déjà sur disque : les workers mappent directement ce fichier
+        futures = [pool.submit(extract_pages_range, pdf_buf.path, first, last) for first, last in ranges]
+        return [text for future in futures for text in future.result()]
+
+    fd, pdf_path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(pdf_buf.getbuffer())
+        futures = [pool.submit(extract_pages_range, pdf_path, first, last) for first, last in ranges]
+        return [text for future in futures for text in future.result()]
+    finally:
+        os.remove(pdf_path)
+
+# Itrer sur la list des descripteurs de fichiers pour faire un grand tableau avec toutes les informations
+def get_all_pdfs_data(service, file_ids, max_workers=EXTRACTION_MAX_WORKERS, service_factory=None, cache=None, rss_tracker=None):
     total = len(file_ids)
+    # Ids seuls ou descripteurs sans nom : métadonnées complétées en batch
+    file_ids = iter_complete_descriptors(service, file_ids)
+
+    # Sans fabrique de services, le service unique (httplib2, non thread-safe) impose le mode séquentiel
+    if service_factory is not None and max_workers and max_workers > 1 and total > 1:
+        return get_all_pdfs_data_concurrent(service, file_ids, max_workers, service_factory, cache, rss_tracker)
 
     all_pdf_datas = []
     for i, file_id in enumerate(file_ids):
-        pdf_data = extract_text_pypdf_in_memory(service, file_id, i)
+        pdf_data = extract_text_pypdf_in_memory(service, file_id, i, cache, rss_tracker)
         all_pdf_datas.append(pdf_data)
         print(f"{i}/{total}")
     return all_pdf_datas
+
+def get_all_pdfs_data_concurrent(service, file_ids, max_workers=EXTRACTION_MAX_WORKERS, service_factory=None, cache=None, rss_tracker=None):
+    """
+    Télécharge et lit les PDFs avec un pool borné de max_workers threads.
+    Pendant qu'un thread attend le réseau (GIL relâché), les autres lisent leur PDF avec PdfReader.
+    Les résultats sont renvoyés dans l'ordre de file_ids.
+    service_factory : fonction qui crée un service Drive par thread (httplib2 n'est pas thread-safe).
+    Sans factory, les PDFs sont lus un par un avec le service unique.
+    """
+    return list(iter_all_pdfs_data(service, file_ids, max_workers, service_factory, cache, rss_tracker))
+
+def iter_all_pdfs_data(service, file_ids, max_workers=EXTRACTION_MAX_WORKERS, service_factory=None, cache=None, rss_tracker=None):
+    """
+    Version générateur de get_all_pdfs_data : produit les pages de chaque PDF, dans l'ordre de file_ids,
+    dès qu'elles sont disponibles. Au plus max_workers PDFs sont lus ou en attente de consommation,
+    la mémoire reste donc bornée quelle que soit la taille du dossier.
+    file_ids peut être un générateur (ex : iter_pdfs_ids) : les téléchargements démarrent pendant le listing.
+    """
+    total = len(file_ids) if hasattr(file_ids, "__len__") else "?"
+    # Ids seuls ou descripteurs sans nom : métadonnées complétées en batch
+    file_ids = iter_complete_descriptors(service, file_ids)
+    if service_factory is None or not max_workers or max_workers <= 1:
+        for i, file_id in enumerate(file_ids):
+            yield extract_text_pypdf_in_memory(service, file_id, i, cache, rss_tracker)
+            print(f"{i + 1}/{total}")
+        return
+
+    local = threading.local()
+    lock = threading.Lock()
+    progress = {"done": 0}
+
+    def worker_service():
+        if not hasattr(local, "service"):
+            local.service = service_factory()
+        return local.service
+
+    def task(i, file_id):
+        pdf_data = extract_text_pypdf_in_memory(worker_service(), file_id, i, cache, rss_tracker)
+        with lock:
+            progress["done"] += 1
+            print(f"{progress['done']}/{total}")
+        return pdf_data
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        files = enumerate(file_ids)
+        for i, file_id in files:
+            pending.append(executor.submit(task, i, file_id))
+            if len(pending) >= max_workers:
+                break
+        while pending:
+            pdf_data = pending.popleft().result()
+            next_file = next(files, None)
+            if next_file is not None:
+                pending.append(executor.submit(task, *next_file))
+            yield pdf_data
@@ -0,0 +1,84 @@
+import os
+import resource
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from src.pipeline.config import RSS_SAMPLE_INTERVAL
+
+
+def current_rss_mb() -> float:
+    """Mémoire résidente (RSS) actuelle du processus, en Mo."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        # Hors Linux : à défaut de RSS courante, pic RSS du processus (Ko sous Linux, octets sous macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class PeakRssTracker:
+    """
+    Relève, pour chaque fichier traité, la RSS max du processus observée pendant son traitement, clé : id du fichier.
+    Pendant qu'au moins un fichier est suivi (track), un thread de fond échantillonne la RSS toutes les
+    interval secondes : le pic atteint en cours de téléchargement ou de lecture des pages est relevé,
+    pas seulement la RSS aux bornes du traitement. Thread-safe.
+    La RSS est celle de tout le processus : avec plusieurs fichiers lus en parallèle, elle inclut leurs buffers
+    et le reste du pipeline, ce n'est pas la mémoire propre au fichier. Les processus d'extraction des gros PDFs
+    (extract_pages_text_multiprocess) ne sont pas comptés.
+    """
+
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peaks = {}
+        self.names = {}
+        self._active = Counter()  # fichiers en cours de traitement (nombre de traitements simultanés)
+        self._sampler = None
+        self._lock = threading.Lock()
+
+    def sample(self, file_id: str, name: str = None):
+        rss = current_rss_mb()
+        with self._lock:
+            self.peaks[file_id] = max(self.peaks.get(file_id, 0.0), rss)
+            if name is not None or file_id not in self.names:
+                self.names[file_id] = name or file_id
+
+    @contextmanager
+    def track(self, file_id: str, name: str = None):
+        """Suit la RSS pendant le bloc (téléchargement et lecture d'un fichier)."""
+        with self._lock:
+            self._active[file_id] += 1
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+                self._sampler.start()
+        self.sample(file_id, name)
+        try:
+            yield
+        finally:
+            self.sample(file_id)
+            with self._lock:
+                self._active[file_id] -= 1
+                if not self._active[file_id]:
+                    del self._active[file_id]
+
+    def _run(self):
+        # S'arrête dès qu'aucun fichier n'est suivi ; le prochain track en relance un
+        while True:
+            with self._lock:
+                if not self._active:
+                    self._sampler = None
+                    return
+            rss = current_rss_mb()
+            with self._lock:
+                for file_id in self._active:
+                    self.peaks[file_id] = max(self.peaks.get(file_id, 0.0), rss)
+            time.sleep(self.interval)
+
+    def stats(self, top: int = 3) -> str:
+        """Fichiers dont la RSS max est la plus élevée (top=None : tous les fichiers)."""
+        if not self.peaks:
+            return ""
+        worst = sorted(self.peaks.items(), key=lambda x: x[1], reverse=True)[:top]
+        return "RSS du processus max pendant le traitement du fichier : " + ", ".join(
+            f"{self.names[file_id]} {rss:.0f} Mo" for file_id, rss in worst)
@@ -1,10 +1,10 @@
 import re
 import unicodedata
-import spacy
 from collections import Counter
+from src.utils.spacy_models import get_nlp
 
-# Charger le modèle français de spaCy
-nlp = spacy.load("fr_core_news_lg")
+# Modèle français de spaCy partagé, chargé à la première utilisation : seule la lemmatisation est utile ici
+nlp = get_nlp(["tok2vec", "morphologizer", "attribute_ruler", "lemmatizer"])
 
 # def normalize_text(text: str) -> str:
 #     text = re.sub(r"([ﬁﬂﬃﬄﬀﬅﬆ])\b\s+([a-zàâçéèêëîïôûùüÿñæœ])", r"\1\2", text, flags=re.IGNORECASE)
@@ -27,7 +27,66 @@ nlp = spacy.load("fr_core_news_lg")
 
 #     return text
 
+# --- Moteur de normalisation : motifs compilés une seule fois, au chargement du module ---
+# Les étapes de normalize_text_reference rendues inopérantes par le filtrage des caractères
+# (sauts de ligne, symboles ©®™..., ligatures ﬁﬂ...) ne sont plus exécutées : après ce filtrage,
+# le texte ne contient plus aucun de ces caractères.
+_UNI_RE = re.compile(r"/uni[0-9A-Fa-f]{4}\s*")
+_TAG_RE = re.compile(r"<[^>]+>")
+_ELLIPSIS_RE = re.compile(r"\[\s*\.\.\.\s*\]")
+# Filtrage des caractères hors alphabet latin étendu et regroupement des espaces en une seule passe
+# (l'espace est exclu de la classe autorisée : une suite d'espaces et de caractères filtrés devient un espace)
+_DISALLOWED_OR_SPACES_RE = re.compile(r"[^\x21-\x7EÀ-ÖØ-öø-ÿœŒšŠžŽ]+")
+_URL_RE = re.compile(r"http\S+|www\S+|@\S+")
+_SPACES_RE = re.compile(r" {2,}")
+_PAGE_RE = re.compile(r"\bpage\s*\d+\b")
+_PUNCT_RE = re.compile(r"([!?.,;:])\1+")
+# \w++ possessif : le mot capturé s'arrête forcément sur un espace, inutile de revenir en arrière
+_DUPLICATE_RE = re.compile(r"\b(\w++)( \1\b)+")
+
+_REPLACEMENTS = (("’", "'"), ("‘", "'"), ("“", '"'), ("”", '"'), ("œ", "oe"), ("æ", "ae"))
+
+
 def normalize_text(text: str) -> str:
+    """
+    Normalise le texte d'une page. Même résultat que normalize_text_reference, en quelques passes :
+    les motifs rares ne sont appliqués que si le texte contient leur préfixe.
+    """
+    text = unicodedata.normalize("NFKC", text)  # normalise le texte Unicode (unification des caractères équivalents)
+    if "/uni" in text:
+        text = _UNI_RE.sub(" ", text)  # supprime les séquences comme /uniXXXX (où XXXX est hexadécimal)
+    if "<" in text:
+        text = _TAG_RE.sub(" ", text)  # supprime les balises HTML/XML
+    if "[" in text:
+        text = _ELLIPSIS_RE.sub("", text)  # retrait de [...]
+    for old, new in _REPLACEMENTS:  # apostrophes, guillemets typographiques et œ/æ
+        if old in text:
+            text = text.replace(old, new)
+    text = _DISALLOWED_OR_SPACES_RE.sub(" ", text)  # caractères non imprimables ou hors alphabet, espaces multiples
+    if "http" in text or "www" in text or "@" in text:
+        text = _SPACES_RE.sub(" ", _URL_RE.sub(" ", text))  # supprime les URLs et les mentions Twitter
+    text = text.strip()
+    has_page = "page" in text
+    if has_page:
+        text = _PAGE_RE.sub(" ", text)  # supprime les mentions de pages
+    text = _PUNCT_RE.sub(r"\1", text)  # réduit les ponctuations répétées
+    # supprime les doublons consécutifs d'un même mot (avant le nettoyage des espaces, comme la référence)
+    text = _DUPLICATE_RE.sub(r"\1", text)
+    if has_page:
+        text = " ".join(text.split())  # seule la suppression des pages a pu laisser des espaces en trop
+    return text
+
+
+def normalize_texts(texts: list[str]) -> list[str]:
+    """Version par lot de normalize_text : normalise une liste de textes de pages."""
+    return [normalize_text(text) for text in texts]
+
+
+def normalize_text_reference(text: str) -> str:
+    """
+    Ancienne implémentation (une vingtaine de passes re.sub successives), conservée comme référence
+    pour le test d'équivalence et le benchmark de normalize_text.
+    """
     text = unicodedata.normalize("NFKC", text)  # normalise le texte Unicode (unification des caractères équivalents)
     text = re.sub(r"/uni[0-9A-Fa-f]{4}\s*", " ", text) # supprime les séquences comme /uniXXXX (où XXXX est hexadécimal).
     text = re.sub(r"<[^>]+>", " ", text)  # supprime les balises HTML/XML
@@ -53,16 +112,39 @@ def normalize_text(text: str) -> str:
 
     return text
 
+def normalize_pages(pages):
+    """
+    Normalise le texte d'un flux de pages (dictionnaires issus de l'extracteur) à la demande.
+    Générateur : une page n'est normalisée qu'au moment où le chunker la consomme.
+    """
+    for page in pages:
+        page["text"] = normalize_text(page["text"])
+        yield page
+
 def normalize_keywords(keywords):
     """
     Supprime les redondances de mots, dans une liste de mots, en fonction de leur forme lemmatisée
     Input : keywords (liste)
     Ouput : liste de keywords sans redondance
     """
-    keywords_clean = {}
-    for word in keywords:
-        token = nlp(word)
-        lemma = token[0].lemma_  # la forme lemmatisée du token
-        if lemma not in keywords_clean:
-            keywords_clean[lemma] = word  # ajouter le mot si c'est la première fois qu'on rencontre sa forme lemmatisée
-    return list(keywords_clean.values())
\ No newline at end of file
+    return normalize_keywords_batch([keywords])[0]
+
+def normalize_keywords_batch(keyword_lists, batch_size=256):
+    """
+    normalize_keywords appliqué à plusieurs listes (une par cluster) : tous les mots candidats distincts
+    sont lemmatisés ensemble par un seul nlp.pipe, au lieu d'un appel au modèle par mot.
+    Input : keyword_lists (liste de listes de mots)
+    Ouput : liste de listes de keywords sans redondance, dans le même ordre
+    """
+    words = list(dict.fromkeys(word for keywords in keyword_lists for word in keywords))
+    lemmas = {word: doc[0].lemma_ for word, doc in zip(words, nlp.pipe(words, batch_size=batch_size))}
+
+    results = []
+    for keywords in keyword_lists:
+        keywords_clean = {}
+        for word in keywords:
+            lemma = lemmas[word]  # la forme lemmatisée du token
+            if lemma not in keywords_clean:
+                keywords_clean[lemma] = word  # ajouter le mot si c'est la première fois qu'on rencontre sa forme lemmatisée
+        results.append(list(keywords_clean.values()))
+    return results
@@ -0,0 +1,225 @@
+"""
+Sources de PDFs du pipeline : dossier Google Drive, dossier local, archive zip/tar.
+
+Chaque source expose la même interface, utilisée par run.main :
+- connect() : authentification / ouverture (étape 1)
+- list_files(streaming) : descripteurs des PDFs (id, name, size, md5Checksum, modifiedTime)
+- iter_pdfs_data(files, cache, rss_tracker) : pour chaque PDF, la liste de ses pages {counter, file_id, file_name, page, text}
+- stats() : compteurs propres à la source, affichés dans les timings
+- location : emplacement de la source (lien Drive, chemin), identifie ses données d'un run à l'autre
+"""
+import io
+import os
+import tarfile
+import zipfile
+from datetime import datetime, timezone
+
+from src.pipeline.config import EXTRACTION_MAX_WORKERS, DRIVE_RECURSIVE, LISTING_MAX_WORKERS, DOWNLOAD_SPILL_THRESHOLD
+from src.utils.drive_import import get_drive_credentials, build_drive_service, drive_service_factory, get_pdfs_ids, \
+    iter_pdfs_ids, drive_requests, ListingStats
+from src.utils.extractor import iter_all_pdfs_data, extract_pdf_records, buffer_stream, MappedPdf
+
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+
+def _iso_mtime(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat()
+
+
+class DriveSource:
+    """Dossier Google Drive (comportement historique du pipeline)."""
+
+    label = "Authentification Google Drive"
+
+    def __init__(self, drive_url: str):
+        self.drive_url = drive_url
+        self.location = drive_url
+        self.service = None
+        self.service_factory = None
+        self.listing = None
+        self._requests_start = drive_requests.count
+
+    def connect(self):
+        # Authentification unique ; chaque thread construit ensuite son service sur ces identifiants
+        credentials = get_drive_credentials()
+        self.service = build_drive_service(credentials)
+        self.service_factory = drive_service_factory(credentials)
+
+    def list_files(self, streaming: bool = False):
+        # Un service Drive par thread : le client httplib2 n'est pas thread-safe
+        self.listing = ListingStats()
+        if streaming:
+            # Générateur : le listing des sous-dossiers se poursuit pendant les téléchargements,
+            # sa durée et ses requêtes sont relevées dans self.listing
+            return iter_pdfs_ids(self.service, self.drive_url, pdf_only=True, recursive=DRIVE_RECURSIVE,
+                                 max_workers=LISTING_MAX_WORKERS, service_factory=self.service_factory,
+                                 stats=self.listing)
+        return get_pdfs_ids(self.service, self.drive_url, pdf_only=True, recursive=DRIVE_RECURSIVE,
+                            max_workers=LISTING_MAX_WORKERS, service_factory=self.service_factory, stats=self.listing)
+
+    def iter_pdfs_data(self, files, cache=None, rss_tracker=None):
+        return iter_all_pdfs_data(self.service, files, max_workers=EXTRACTION_MAX_WORKERS,
+                                  service_factory=self.service_factory, cache=cache, rss_tracker=rss_tracker)
+
+    def stats(self) -> str:
+        details = f"requêtes Drive cumulées : {drive_requests.count - self._requests_start}"
+        if self.listing is not None:
+            details += f", {self.listing}"
+        return details
+
+
+class LocalFolderSource:
+    """Dossier local (parcours récursif), sans authentification ni réseau."""
+
+    label = "Ouverture du dossier local"
+
+    def __init__(self, folder_path: str):
+        self.folder_path = os.path.abspath(folder_path)
+        self.location = self.folder_path
+
+    def connect(self):
+        if not os.path.isdir(self.folder_path):
+            raise ValueError(f"Le dossier {self.folder_path} n'existe pas.")
+
+    def list_files(self, streaming: bool = False):
+        files = []
+        for root, dirs, names in os.walk(self.folder_path):
+            dirs.sort()  # ordre de parcours déterministe
+            for name in sorted(names):
+                if not name.lower().endswith(".pdf"):
+                    continue
+                path = os.path.join(root, name)
+                st = os.stat(path)
+                files.append({
+                    "id": os.path.relpath(path, self.folder_path),
+                    "name": name,
+                    "size": st.st_size,
+                    "mimeType": "application/pdf",
+                    "md5Checksum": None,
+                    "modifiedTime": _iso_mtime(st.st_mtime),
+                })
+        return files
+
+    def open_pdf(self, file):
+        path = os.path.join(self.folder_path, file["id"])
+        if file["size"] > DOWNLOAD_SPILL_THRESHOLD:
+            # Gros fichier : mappé directement, sans copie en RAM (et jamais supprimé)
+            return MappedPdf(path, delete=False)
+        with open(path, "rb") as f:
+            return io.BytesIO(f.read())
+
+    def iter_pdfs_data(self, files, cache=None, rss_tracker=None):
+        for i, file in enumerate(files):
+            yield extract_pdf_records(file, i, self.open_pdf, cache, rss_tracker)
+
+    def stats(self) -> str:
+        return ""
+
+
+class ArchiveSource:
+    """
+    Archive zip ou tar (éventuellement compressée) de PDFs.
+    Les membres sont lus un par un en mémoire (sur disque temporaire au-delà de DOWNLOAD_SPILL_THRESHOLD) ;
+    les tar sont lus en flux (mode "r|*"), sans retour en arrière dans l'archive.
+    """
+
+    label = "Ouverture de l'archive"
+
+    def __init__(self, archive_path: str):
+        self.archive_path = os.path.abspath(archive_path)
+        self.location = self.archive_path
+        self.is_zip = zipfile.is_zipfile(self.archive_path) if os.path.isfile(self.archive_path) else False
+
+    def connect(self):
+        if not os.path.isfile(self.archive_path):
+            raise ValueError(f"L'archive {self.archive_path} n'existe pas.")
+        if not self.is_zip and not tarfile.is_tarfile(self.archive_path):
+            raise ValueError(f"{self.archive_path} n'est ni une archive zip ni une archive tar.")
+
+    def _descriptor(self, member_name: str, size: int, mtime: float) -> dict:
+        return {
+            # L'id inclut le chemin de l'archive : deux archives peuvent contenir le même nom de membre
+            "id": f"{os.path.basename(self.archive_path)}!{member_name}",
+            "name": os.path.basename(member_name),
+            "size": size,
+            "mimeType": "application/pdf",
+            "md5Checksum": None,
+            "modifiedTime": _iso_mtime(mtime),
+        }
+
+    def list_files(self, streaming: bool = False):
+        files = []
+        if self.is_zip:
+            with zipfile.ZipFile(self.archive_path) as zf:
+                for info in zf.infolist():
+                    if not info.is_dir() and info.filename.lower().endswith(".pdf"):
+                        mtime = datetime(*info.date_time, tzinfo=timezone.utc).timestamp()
+                        files.append(self._descriptor(info.filename, info.file_size, mtime))
+        else:
+            with tarfile.open(self.archive_path, mode="r|*") as tf:
+                for member in tf:
+                    if member.isfile() and member.name.lower().endswith(".pdf"):
+                        files.append(self._descriptor(member.name, member.size, member.mtime))
+        return files
+
+    def _iter_members(self, wanted: set):
+        """Produit (id, buffer du PDF) pour chaque membre demandé, dans l'ordre de l'archive."""
+        if self.is_zip:
+            with zipfile.ZipFile(self.archive_path) as zf:
+                for info in zf.infolist():
+                    file_id = f"{os.path.basename(self.archive_path)}!{info.filename}"
+                    if file_id in wanted:
+                        with zf.open(info) as member:
+                            pdf_buf = buffer_stream(member, info.file_size)
+                        yield file_id, pdf_buf
+        else:
+            with tarfile.open(self.archive_path, mode="r|*") as tf:
+                for member in tf:
+                    file_id = f"{os.path.basename(self.archive_path)}!{member.name}"
+                    if member.isfile() and file_id in wanted:
+                        yield file_id, buffer_stream(tf.extractfile(member), member.size)
+
+    def _read_member(self, file):
+        """Lecture isolée d'un membre (entrée de cache évincée entre-temps)."""
+        for _, pdf_buf in self._iter_members({file["id"]}):
+            return pdf_buf
+        raise ValueError(f"Membre {file['id']} introuvable dans l'archive.")
+
+    def iter_pdfs_data(self, files, cache=None, rss_tracker=None):
+        files = list(files)
+        counters = {file["id"]: i for i, file in enumerate(files)}
+        by_id = {file["id"]: file for file in files}
+
+        # Fichiers déjà en cache : leur membre n'est pas relu dans l'archive
+        cached_ids = {file["id"] for file in files if cache is not None and cache.contains(file)}
+        for file in files:
+            if file["id"] in cached_ids:
+                yield extract_pdf_records(file, counters[file["id"]], self._read_member, cache, rss_tracker)
+
+        # Un seul passage séquentiel sur l'archive pour tous les autres membres
+        to_read = set(by_id) - cached_ids
+        for file_id, pdf_buf in self._iter_members(to_read):
+            yield extract_pdf_records(by_id[file_id], counters[file_id], lambda f: pdf_buf, cache, rss_tracker)
+
+    def stats(self) -> str:
+        return ""
+
+
+def looks_like_local_path(location: str) -> bool:
+    """Chemin local plutôt que lien ou id Drive (un id Drive ne contient ni séparateur ni extension d'archive)."""
+    if "://" in location:
+        return False
+    return (os.sep in location or "/" in location or location.startswith((".", "~"))
+            or location.lower().endswith(ARCHIVE_EXTENSIONS))
+
+
+def make_source(location: str):
+    """Choisit la source selon l'emplacement : archive, dossier local, sinon lien ou id Google Drive."""
+    if location.lower().endswith(ARCHIVE_EXTENSIONS) and os.path.isfile(location):
+        return ArchiveSource(location)
+    if os.path.isdir(location):
+        return LocalFolderSource(location)
+    if looks_like_local_path(location):
+        # Chemin mal saisi ou absent du volume : ne pas l'envoyer à Drive comme un id de dossier
+        raise ValueError(f"Le chemin local {location} n'existe pas (ni dossier, ni archive zip/tar).")
+    return DriveSource(location)
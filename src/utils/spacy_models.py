@@ -0,0 +1,94 @@
+"""
+Registre des modèles spaCy du processus.
+
+Le modèle est chargé une seule fois, à la première analyse réelle, puis partagé par tous les modules.
+L'import d'un module (normalizer, clustering_theme...) ne charge donc plus rien. Chaque appelant obtient
+une vue du modèle (get_nlp) limitée aux composants dont il a besoin : les autres sont désactivés
+le temps de ses appels, sans copie du modèle.
+"""
+import threading
+import time
+
+import spacy
+
+from src.pipeline.config import SPACY_MODEL_NAME
+
+_models = {}
+_lock = threading.Lock()
+
+
+def load_model(model_name: str = SPACY_MODEL_NAME):
+    """Modèle spaCy complet, chargé au premier appel puis réutilisé (thread-safe)."""
+    nlp = _models.get(model_name)
+    if nlp is None:
+        with _lock:
+            nlp = _models.get(model_name)
+            if nlp is None:
+                start = time.time()
+                nlp = spacy.load(model_name)
+                print(f"Chargement du modèle spaCy {model_name} : {time.time() - start:.1f} sec")
+                _models[model_name] = nlp
+    return nlp
+
+
+def loaded_models() -> list[str]:
+    return list(_models)
+
+
+def model_version(model_name: str = SPACY_MODEL_NAME) -> str:
+    """
+    Identifiant "nom-version" du modèle, sans le charger s'il est installé comme package
+    (un cache consulté avant toute analyse n'impose donc pas le chargement du modèle).
+    """
+    if model_name not in _models:
+        version = spacy.util.get_package_version(model_name)
+        if version is not None:
+            return f"{model_name}-{version}"
+    meta = load_model(model_name).meta
+    return f"{meta.get('lang', '')}_{meta.get('name', model_name)}-{meta.get('version', '')}"
+
+
+class SpacyPipeline:
+    """
+    Vue paresseuse sur le modèle partagé, restreinte à une liste de composants.
+    S'utilise comme un objet Language : nlp(text), nlp.pipe(texts, ...).
+    components : noms des composants nécessaires (ex : ["tok2vec", "morphologizer", "lemmatizer"]),
+    None pour tout le pipeline.
+    """
+
+    def __init__(self, components=None, model_name: str = SPACY_MODEL_NAME):
+        self.components = None if components is None else list(components)
+        self.model_name = model_name
+        self._disable = None
+
+    @property
+    def model(self):
+        return load_model(self.model_name)
+
+    @property
+    def disable(self) -> list[str]:
+        if self._disable is None:
+            pipe_names = self.model.pipe_names
+            if self.components is None:
+                self._disable = []
+            else:
+                unknown = set(self.components) - set(pipe_names)
+                if unknown:
+                    raise ValueError(f"Composants absents du modèle {self.model_name} : {sorted(unknown)}")
+                self._disable = [name for name in pipe_names if name not in self.components]
+        return self._disable
+
+    def __call__(self, text):
+        return self.model(text, disable=self.disable)
+
+    def pipe(self, texts, **kwargs):
+        return self.model.pipe(texts, disable=self.disable, **kwargs)
+
+    def make_doc(self, text):
+        """Tokenisation seule, sans aucun composant (attributs lexicaux : is_punct, is_alpha...)."""
+        return self.model.make_doc(text)
+
+
+def get_nlp(components=None, model_name: str = SPACY_MODEL_NAME) -> SpacyPipeline:
+    """Vue sur le modèle partagé limitée aux composants demandés. Ne charge rien avant la première analyse."""
+    return SpacyPipeline(components, model_name)